@@ -0,0 +1,72 @@
+# background_janitor.py
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from config import logger
+
+
+class BackgroundJanitor:
+    """
+    LIMPIEZA EN SEGUNDO PLANO
+    Borra temporales sin bloquear el flujo principal. Los archivos bloqueados
+    (ej: antivirus / indexador de Windows) se reintentan con espera progresiva.
+    Si el archivo cambió desde que se pidió el borrado (se recreó), se respeta.
+    """
+
+    def __init__(self, max_retries: int = 10, base_delay: float = 0.5):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="janitor", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _stamp(path: Path) -> Optional[float]:
+        try:
+            return path.stat().st_mtime
+        except OSError:
+            return None
+
+    def discard(self, path: Path):
+        """Encola un archivo o carpeta para borrado (no bloquea)."""
+        path = Path(path)
+        if path.exists():
+            self._queue.put((path, self._stamp(path), 0))
+
+    def _remove(self, path: Path):
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            path, stamp, attempt = item
+            try:
+                if path.exists() and self._stamp(path) == stamp:
+                    self._remove(path)
+            except PermissionError:
+                if attempt + 1 < self.max_retries:
+                    # Reencolar con espera progresiva sin frenar al resto de la cola
+                    delay = self.base_delay + attempt * 0.2
+                    threading.Timer(delay, self._queue.put, args=((path, stamp, attempt + 1),)).start()
+                else:
+                    logger.warning(f"⚠️ No se pudo borrar {path.name} (bloqueado). Quedará para la próxima limpieza.")
+            except Exception as e:
+                logger.error(f"Error borrando {path.name}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def drain(self, timeout: float = 5.0):
+        """Espera (con tope) a que se vacíe la cola, ej: antes de salir."""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.1)
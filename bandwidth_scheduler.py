@@ -0,0 +1,328 @@
+# bandwidth_scheduler.py
+import json
+import secrets
+import socket
+import subprocess
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    logger, BW_SCHEDULE, BW_DEFAULT_LIMIT, BW_BURST_SECONDS,
+    BW_REBALANCE_INTERVAL, BW_RC_BASE_PORT
+)
+
+MB = 1024 * 1024
+RC_PORT_ATTEMPTS = 64  # Puertos a probar (desde el siguiente libre) antes de lanzar sin rc
+
+
+def parse_rate(value: str) -> Optional[float]:
+    """Convierte '4', '4.5' u 'off' a MB/s. None = sin límite."""
+    value = (value or "").strip().lower()
+    if value in ("", "off", "0", "none"):
+        return None
+    return float(value.rstrip("m"))
+
+
+def parse_schedule(schedule: str) -> List[Tuple[int, int, Optional[float]]]:
+    """
+    Parsea 'HH:MM-HH:MM=RATE;...' a una lista de (inicio_min, fin_min, MB/s).
+    Las ventanas pueden cruzar la medianoche (ej: 19:00-08:00).
+    """
+    windows = []
+    for chunk in filter(None, (c.strip() for c in schedule.split(";"))):
+        try:
+            span, rate = chunk.split("=")
+            start, end = span.split("-")
+            h1, m1 = (int(x) for x in start.split(":"))
+            h2, m2 = (int(x) for x in end.split(":"))
+            windows.append((h1 * 60 + m1, h2 * 60 + m2, parse_rate(rate)))
+        except ValueError:
+            logger.warning(f"⚠️ Ventana de ancho de banda inválida ignorada: '{chunk}'")
+    return windows
+
+
+class TokenBucket:
+    """
+    Cubo de tokens (en bytes) compartido por todas las transferencias.
+    Se recarga a 'rate' bytes/s hasta 'capacity'. Los consumos pueden dejarlo en negativo:
+    esa deuda indica que el conjunto de transferencias se pasó del presupuesto.
+    """
+
+    def __init__(self, rate_bps: Optional[float], capacity: float):
+        self.rate = rate_bps
+        self.capacity = capacity
+        self.tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def set_rate(self, rate_bps: Optional[float], capacity: float):
+        with self._lock:
+            self._refill()
+            self.rate = rate_bps
+            self.capacity = capacity
+            self.tokens = min(self.tokens, capacity)
+
+    def consume(self, nbytes: int):
+        with self._lock:
+            self._refill()
+            if self.rate:
+                self.tokens -= nbytes
+
+    def debt(self) -> float:
+        """Bytes consumidos por encima del presupuesto (0 si estamos dentro)."""
+        with self._lock:
+            self._refill()
+            return max(0.0, -self.tokens) if self.rate else 0.0
+
+
+class BandwidthScheduler:
+    """
+    PLANIFICADOR GLOBAL DE ANCHO DE BANDA
+    Un único presupuesto (token bucket) repartido entre todos los procesos rclone activos.
+    - Cada proceso arranca con '--bwlimit' = su cuota y un servidor rc propio en 127.0.0.1,
+      con usuario y contraseña aleatorios (otro proceso local no puede controlarlo).
+    - Al entrar/salir transferencias, cambiar la ventana horaria o detectar exceso
+      de consumo, las cuotas se reajustan en caliente vía 'rclone rc core/bwlimit'.
+    - El cubo se alimenta con los bytes de cada proceso: los que informa el llamador
+      (account / unregister) y los que reporta 'rclone rc core/stats' en cada reajuste.
+    """
+
+    def __init__(self, rclone_exe: str):
+        self.rclone_exe = rclone_exe
+        self.windows = parse_schedule(BW_SCHEDULE)
+        # CORRECCIÓN: un valor inválido no debe impedir crear el CloudManager
+        try:
+            self.default_limit = parse_rate(BW_DEFAULT_LIMIT)
+        except ValueError:
+            logger.warning(f"⚠️ BW_DEFAULT_LIMIT inválido ('{BW_DEFAULT_LIMIT}'). Se usa sin límite.")
+            self.default_limit = None
+        # Solo activamos rc si hay alguna limitación configurada (sin costo en el caso por defecto)
+        self.enabled = bool(self.windows) or self.default_limit is not None
+
+        self._lock = threading.Lock()
+        self._transfers: Dict[str, Dict] = {}
+        self._next_port = BW_RC_BASE_PORT
+        self._counter = 0
+        self._applied_limit = self.current_limit_mb()
+        self.bucket = TokenBucket(self._to_bps(self._applied_limit), self._capacity(self._applied_limit))
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._hold_until = 0.0  # Pausa impuesta por el gobernador de throttling
+
+    # --- CÁLCULO DE LÍMITES ---
+
+    @staticmethod
+    def _to_bps(limit_mb: Optional[float]) -> Optional[float]:
+        return limit_mb * MB if limit_mb else None
+
+    @staticmethod
+    def _capacity(limit_mb: Optional[float]) -> float:
+        return (limit_mb or 0) * MB * BW_BURST_SECONDS
+
+    def current_limit_mb(self, now: datetime = None) -> Optional[float]:
+        """Límite global (MB/s) vigente según la ventana horaria. None = sin límite."""
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        for start, end, rate in self.windows:
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                return rate
+        return self.default_limit
+
+    def _share_mb(self) -> Optional[float]:
+        """Cuota por transferencia, descontando la deuda acumulada del cubo."""
+        limit = self._applied_limit
+        active = len(self._transfers)
+        if limit is None or active == 0:
+            return None
+        # Corrección: si el conjunto se pasó del presupuesto, lo devolvemos en el próximo intervalo
+        debt_mb = self.bucket.debt() / MB
+        corrected = max(limit * 0.1, limit - debt_mb / BW_REBALANCE_INTERVAL)
+        return corrected / active
+
+    @staticmethod
+    def _format_rate(rate_mb: Optional[float]) -> str:
+        return "off" if rate_mb is None else f"{max(rate_mb, 0.01):.2f}M"
+
+    @staticmethod
+    def _port_is_free(port: int) -> bool:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            try:
+                sock.bind(("127.0.0.1", port))
+                return True
+            except OSError:
+                return False
+
+    def _take_port(self) -> Optional[int]:
+        """Siguiente puerto libre (bind de prueba). Llamar con self._lock tomado."""
+        in_use = {t['port'] for t in self._transfers.values()}
+        for _ in range(RC_PORT_ATTEMPTS):
+            port = self._next_port
+            self._next_port += 1
+            if port not in in_use and self._port_is_free(port):
+                return port
+        return None
+
+    # --- REGISTRO DE TRANSFERENCIAS ---
+
+    def register(self, kind: str = "transfer") -> Tuple[str, List[str]]:
+        """
+        Registra una transferencia y devuelve (id, flags extra para rclone).
+        Si el planificador está inactivo, devuelve flags vacíos.
+        Durante una pausa por throttling, bloquea hasta que termine.
+        """
+        self._wait_hold()
+
+        if not self.enabled:
+            return "", []
+
+        with self._lock:
+            self._counter += 1
+            transfer_id = f"{kind}-{self._counter}"
+            # CORRECCIÓN: el puerto se prueba antes de usarlo y el rc exige credenciales propias
+            port = self._take_port()
+            user, password = secrets.token_hex(8), secrets.token_hex(16)
+            self._transfers[transfer_id] = {'port': port, 'user': user, 'pass': password, 'bytes': 0}
+            share = self._share_mb()
+            self._transfers[transfer_id]['share'] = share
+
+        self._ensure_thread()
+        # Los demás procesos ceden parte de su cuota al recién llegado
+        self.rebalance(exclude=transfer_id)
+
+        flags = ["--bwlimit", self._format_rate(share)]
+        if port is None:
+            logger.warning(f"⚠️ Sin puerto rc libre desde {BW_RC_BASE_PORT}: la cuota de {transfer_id} queda fija.")
+        else:
+            flags += ["--rc", "--rc-addr", f"127.0.0.1:{port}", "--rc-user", user, "--rc-pass", password]
+        return transfer_id, flags
+
+    def unregister(self, transfer_id: str, total_bytes: int = None):
+        """'total_bytes': bytes reales de la transferencia, si el llamador los conoce al terminar."""
+        if not transfer_id:
+            return
+        if total_bytes:
+            self.settle(transfer_id, total_bytes)
+        with self._lock:
+            self._transfers.pop(transfer_id, None)
+            if not self._transfers:
+                self._next_port = BW_RC_BASE_PORT  # Reciclar puertos cuando no hay nadie activo
+        self.rebalance()
+
+    def account(self, transfer_id: str, delta_bytes: int):
+        """Contabiliza bytes transferidos contra el presupuesto global."""
+        if not transfer_id or delta_bytes <= 0:
+            return
+        self.bucket.consume(delta_bytes)
+        with self._lock:
+            if transfer_id in self._transfers:
+                self._transfers[transfer_id]['bytes'] += delta_bytes
+
+    def transfer_limit_mb(self, transfer_id: str) -> Optional[float]:
+        """Cuota (MB/s) aplicada hoy a una transferencia. None = sin límite."""
+        with self._lock:
+            transfer = self._transfers.get(transfer_id)
+            return transfer.get('share') if transfer else None
+
+    def settle(self, transfer_id: str, total_bytes: int):
+        """Iguala lo contabilizado de una transferencia a su total acumulado (sin contar dos veces)."""
+        with self._lock:
+            transfer = self._transfers.get(transfer_id)
+            if transfer is None or total_bytes <= transfer['bytes']:
+                return
+            delta = total_bytes - transfer['bytes']
+            transfer['bytes'] = total_bytes
+        self.bucket.consume(delta)
+
+    def _poll_stats(self):
+        """CORRECCIÓN: bytes acumulados de cada proceso con rc ('core/stats'), informe o no su progreso."""
+        with self._lock:
+            targets = {tid: dict(t) for tid, t in self._transfers.items() if t['port']}
+        for transfer_id, target in targets.items():
+            try:
+                result = subprocess.run(self._rc_command(target, "core/stats"),
+                                        capture_output=True, text=True, timeout=5)
+                if result.returncode != 0:
+                    continue  # rc aún no escucha o el proceso ya terminó
+                self.settle(transfer_id, int(json.loads(result.stdout).get('bytes', 0)))
+            except Exception as e:
+                logger.debug(f"rc core/stats en puerto {target['port']} falló: {e}")
+
+    # --- PAUSAS POR THROTTLING ---
+
+    def hold(self, until: float):
+        """Retiene nuevas transferencias hasta 'until' (timestamp). Lo invoca el gobernador."""
+        with self._lock:
+            self._hold_until = max(self._hold_until, until)
+
+    def _wait_hold(self):
+        while True:
+            with self._lock:
+                pending = self._hold_until - time.time()
+            if pending <= 0:
+                return
+            time.sleep(min(pending, 1.0))
+
+    # --- REAJUSTE EN CALIENTE ---
+
+    def rebalance(self, exclude: str = None):
+        """Recalcula la cuota de cada proceso y la aplica vía rc (core/bwlimit)."""
+        if not self.enabled:
+            return
+
+        # La deuda del cubo (y con ella la cuota) se calcula con el consumo real más reciente
+        self._poll_stats()
+        limit = self.current_limit_mb()
+        if limit != self._applied_limit:
+            logger.info(f"🕒 Ventana de ancho de banda: {self._format_rate(limit)} (antes {self._format_rate(self._applied_limit)})")
+            self._applied_limit = limit
+            self.bucket.set_rate(self._to_bps(limit), self._capacity(limit))
+
+        with self._lock:
+            share = self._share_mb()
+            targets = [dict(t) for tid, t in self._transfers.items() if tid != exclude and t['port']]
+            for transfer in self._transfers.values():
+                if transfer['port']:  # Sin rc la cuota inicial queda fija
+                    transfer['share'] = share
+
+        for target in targets:
+            self._apply_rc_limit(target, share)
+
+    def _rc_command(self, target: Dict, *args: str) -> List[str]:
+        return [
+            self.rclone_exe, "rc", "--url", f"http://127.0.0.1:{target['port']}/",
+            "--user", target['user'], "--pass", target['pass'], *args
+        ]
+
+    def _apply_rc_limit(self, target: Dict, share_mb: Optional[float]):
+        cmd = self._rc_command(target, "core/bwlimit", f"rate={self._format_rate(share_mb)}")
+        try:
+            subprocess.run(cmd, capture_output=True, timeout=5)
+        except Exception as e:
+            # El proceso puede estar terminando; el próximo ciclo lo vuelve a intentar
+            logger.debug(f"rc core/bwlimit en puerto {target['port']} falló: {e}")
+
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="bw-scheduler", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(BW_REBALANCE_INTERVAL):
+            with self._lock:
+                idle = not self._transfers
+            if not idle:
+                self.rebalance()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""Benchmarks del gestor (se ejecutan con 'python -m benchmarks.<nombre>' desde la raíz del proyecto)."""
@@ -0,0 +1,343 @@
+# benchmarks/bench_e2e.py
+"""
+BENCHMARK DE EXTREMO A EXTREMO (subida + restauración)
+Genera un dataset sintético, arranca el AppOrchestrator real contra una nube local y
+mide tiempo de pared y MB/s por etapa: scan, hash, encrypt, transfer, commit, restore
+(más download / extract dentro de restore). Todo corre en una carpeta de trabajo aislada
+(GESTOR_DATA_DIR): no toca data/ ni el remoto configurado.
+
+    python -m benchmarks.bench_e2e --profile mixed --scale 0.1
+    python -m benchmarks.bench_e2e --backend rclone          # rclone real, remoto alias local
+    python -m benchmarks.bench_e2e --compare benchmarks/results/base.json --max-regression 0.2
+
+Backends: 'fake' (benchmarks/fake_rclone.py, no requiere rclone) o 'rclone' (rclone real
+con un remoto 'alias' definido por variables RCLONE_CONFIG_*). 7-Zip es obligatorio.
+El resultado se guarda en benchmarks/results/<perfil>_<fecha>_<commit>.json.
+Exit: 0 OK | 1 restauración fallida o regresión sobre --compare | 2 error de entorno.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(PROJECT_DIR))  # También como script: python benchmarks/bench_e2e.py
+
+from benchmarks.synthetic import build_tree  # noqa: E402  (no importa config)
+
+RESULTS_DIR = BENCH_DIR / "results"
+MB = 1024 * 1024
+
+EXIT_OK, EXIT_FAIL, EXIT_ERROR = 0, 1, 2
+STAGES = ['scan', 'hash', 'encrypt', 'transfer', 'commit', 'restore', 'download', 'extract']
+MASTER_PASSWORD = "bench-master-password"
+CSV_PASSWORD = "bench-csv-password"
+
+
+class StageTimer:
+    """
+    Acumula por etapa: llamadas, segundos ocupados (suma de las llamadas, que en paralelo se
+    solapan), intervalo de pared (primer inicio -> último fin) y MB procesados.
+    Envuelve métodos de instancia sin cambiar su comportamiento.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Dict] = {}
+
+    def add(self, stage: str, start: float, end: float, nbytes: int = 0):
+        with self._lock:
+            s = self.stages.setdefault(stage, {'calls': 0, 'busy_s': 0.0, 'first': start, 'last': end, 'bytes': 0})
+            s['calls'] += 1
+            s['busy_s'] += end - start
+            s['first'], s['last'] = min(s['first'], start), max(s['last'], end)
+            s['bytes'] += nbytes
+
+    def wrap(self, obj, name: str, stage_of: Callable, size_of: Callable = None):
+        """
+        Reemplaza obj.name por una versión medida. 'stage_of(args, kwargs)' elige la etapa
+        (None = no medir); 'size_of(args, kwargs, result)' da los bytes (fuera del tiempo medido).
+        """
+        original = getattr(obj, name)
+
+        def timed(*args, **kwargs):
+            stage = stage_of(args, kwargs)
+            start = time.perf_counter()
+            try:
+                result = original(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+            if stage:
+                self.add(stage, start, end, size_of(args, kwargs, result) if size_of else 0)
+            return result
+
+        setattr(obj, name, timed)
+
+    def wrap_iter(self, obj, name: str, stage: str):
+        """Igual que wrap, para métodos que retornan un generador: mide cada next()."""
+        original = getattr(obj, name)
+
+        def timed(*args, **kwargs):
+            it = iter(original(*args, **kwargs))
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    self.add(stage, start, time.perf_counter())
+                    return
+                self.add(stage, start, time.perf_counter())
+                yield item
+
+        setattr(obj, name, timed)
+
+    def report(self) -> Dict[str, Dict]:
+        out = {}
+        for stage in STAGES:
+            s = self.stages.get(stage)
+            if not s:
+                continue
+            mb = s['bytes'] / MB
+            out[stage] = {
+                'calls': s['calls'], 'busy_s': round(s['busy_s'], 3),
+                'wall_s': round(s['last'] - s['first'], 3), 'mb': round(mb, 2),
+                'mb_s': round(mb / s['busy_s'], 2) if mb and s['busy_s'] > 0 else None,
+            }
+        return out
+
+
+# --- ENTORNO AISLADO ---
+
+def _file_bytes(paths) -> int:
+    total = 0
+    for p in paths:
+        try:
+            total += Path(p).stat().st_size
+        except OSError:
+            pass
+    return total
+
+
+def _tree_bytes(folder) -> int:
+    return sum(p.stat().st_size for p in Path(folder).rglob("*") if p.is_file())
+
+
+def prepare_env(work: Path, backend: str, mbps: float) -> Optional[str]:
+    """Variables del proceso para una corrida aislada. Retorna un error o None."""
+    remote_root = work / "remote"
+    remote_root.mkdir(parents=True, exist_ok=True)
+    os.environ.update({
+        'GESTOR_DATA_DIR': str(work / "data"),
+        'RCLONE_REMOTE_NAME': "bench",
+        'RCLONE_REMOTE_PATH': "gestor",
+    })
+    if backend == 'fake':
+        # Envoltorio ejecutable: CloudManager invoca RCLONE_PATH directamente
+        shim = work / "rclone"
+        shim.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{BENCH_DIR / "fake_rclone.py"}" "$@"\n')
+        shim.chmod(0o755)
+        os.environ.update({'RCLONE_PATH': str(shim), 'FAKE_RCLONE_ROOT': str(remote_root)})
+        if mbps > 0:
+            os.environ['FAKE_RCLONE_MBPS'] = str(mbps)
+    else:
+        if not shutil.which("rclone") and not os.environ.get("RCLONE_PATH"):
+            return "rclone no está instalado (use --backend fake)."
+        # Remoto 'bench' = alias a una carpeta local, sin tocar rclone.conf
+        os.environ.update({'RCLONE_CONFIG_BENCH_TYPE': "alias", 'RCLONE_CONFIG_BENCH_REMOTE': str(remote_root)})
+        if mbps > 0:
+            os.environ['RCLONE_BWLIMIT'] = f"{mbps}M"
+    seven_zip = os.environ.get("SEVEN_ZIP_PATH", "7za.exe" if os.name == 'nt' else "7z")
+    if not shutil.which(seven_zip):
+        return f"No se encontró 7-Zip ('{seven_zip}'). Configure SEVEN_ZIP_PATH."
+    return None
+
+
+def instrument(app, timer: StageTimer):
+    """Etapas del modo subida y de la restauración sobre los managers reales."""
+    from config import INDEX_REMOTE_PATH
+
+    def always(stage):
+        return lambda a, k: stage
+
+    # upload_volumes no se envuelve: cada volumen pasa por upload_file y se cuenta ahí
+    timer.wrap_iter(app.cloud, 'iter_local_folders', 'scan')
+    timer.wrap(app.security, 'hash_folder_files', always('hash'),
+               lambda a, k, r: sum(e.get('size', 0) for e in r or []))
+    timer.wrap(app.security, 'compress_encrypt_7z', always('encrypt'), lambda a, k, r: _tree_bytes(a[0]))
+    # El índice viaja por upload_file pero es parte del commit, no de la transferencia de datos
+    timer.wrap(app.cloud, 'upload_file',
+               lambda a, k: 'commit' if str(a[1]) == INDEX_REMOTE_PATH else 'transfer',
+               lambda a, k, r: _file_bytes([a[0]]))
+    timer.wrap(app.cloud, 'upload_batch', always('transfer'),
+               lambda a, k, r: _file_bytes(Path(a[0]) / n for n in a[1]))
+    timer.wrap(app, '_commit_record', always('commit'))
+    timer.wrap(app.inventory, 'save_encrypted_backup', always('commit'))
+    timer.wrap(app.partial, 'sync_manifests', always('commit'))
+    timer.wrap(app.cloud, 'download_file', always('download'), lambda a, k, r: _file_bytes([a[1]]) if r else 0)
+    timer.wrap(app.cloud, 'download_batch', always('download'),
+               lambda a, k, r: _file_bytes(p for p in (r or {}).values() if p))
+    timer.wrap(app.security, 'decrypt_extract_7z', always('extract'),
+               lambda a, k, r: _tree_bytes(a[1]) if r and Path(a[1]).exists() else 0)
+
+
+def git_revision() -> str:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+                             capture_output=True, text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=PROJECT_DIR,
+                               capture_output=True, text=True, timeout=30).stdout.strip()
+        return f"{rev}{'-dirty' if dirty else ''}" if rev else "desconocido"
+    except Exception:
+        return "desconocido"
+
+
+# --- CORRIDA ---
+
+def run(args) -> Dict:
+    work = Path(args.workdir or tempfile.mkdtemp(prefix="gestor_bench_")).resolve()
+    error = prepare_env(work, args.backend, args.mbps)
+    if error:
+        raise RuntimeError(error)
+
+    dataset_dir = work / "dataset"
+    t0 = time.perf_counter()
+    dataset = build_tree(dataset_dir, args.profile, args.scale, args.seed)
+    dataset['mb'] = round(dataset.pop('bytes') / MB, 2)
+    print(f"🧪 Dataset '{args.profile}': {dataset['units']} unidades, {dataset['files']} archivos, "
+          f"{dataset['mb']} MB ({time.perf_counter() - t0:.1f}s)")
+
+    # Recién ahora: config lee GESTOR_DATA_DIR / RCLONE_* al importarse
+    from config import init_directories
+    from main import AppOrchestrator
+
+    init_directories()
+    app = AppOrchestrator()
+    boot_start = time.perf_counter()
+    if not app.initialize(MASTER_PASSWORD, CSV_PASSWORD, interactive=False):
+        raise RuntimeError("No se pudo inicializar el orquestador contra la nube local.")
+    boot_s = time.perf_counter() - boot_start
+
+    timer = StageTimer()
+    instrument(app, timer)
+
+    start = time.perf_counter()
+    uploaded = app.run_upload_mode(dataset_dir, assume_yes=True)
+    upload_s = time.perf_counter() - start
+
+    # Restauración de todo lo subido (destino vacío: mide el camino completo)
+    rows = app.inventory.df
+    restored_mb = float(rows['tamaño_mb'].fillna(0).astype(float).sum())
+    start = time.perf_counter()
+    result = app.restore_rows(rows)
+    end = time.perf_counter()
+    timer.add('restore', start, end, int(restored_mb * MB))
+    app.janitor.drain()
+
+    report = {
+        'version': 1,
+        'commit': git_revision(),
+        'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'params': {'profile': args.profile, 'scale': args.scale, 'seed': args.seed,
+                   'backend': args.backend, 'mbps': args.mbps or None},
+        'dataset': dataset,
+        'boot_s': round(boot_s, 3),
+        'phases': {
+            'upload': {'wall_s': round(upload_s, 3), 'units': uploaded or 0,
+                       'mb_s': round(dataset['mb'] / upload_s, 2) if upload_s > 0 else None},
+            'restore': {'wall_s': round(end - start, 3), 'units': len(result['restored']),
+                        'failed': len(result['failed']),
+                        'mb_s': round(restored_mb / (end - start), 2) if end > start else None},
+        },
+        'stages': timer.report(),
+    }
+    if not args.keep:
+        shutil.rmtree(work, ignore_errors=True)
+    else:
+        report['workdir'] = str(work)
+    return report
+
+
+# --- REPORTE Y COMPARACIÓN ---
+
+def print_report(report: Dict):
+    print(f"\n⏱️  {report['params']['profile']} @ {report['commit']} (arranque {report['boot_s']}s)")
+    for name, phase in report['phases'].items():
+        print(f"   {name:<8} {phase['wall_s']:>9.2f}s  {phase['mb_s'] or '-':>9} MB/s")
+    print(f"   {'etapa':<9}{'llamadas':>9}{'ocupado s':>11}{'pared s':>10}{'MB':>10}{'MB/s':>10}")
+    for stage, s in report['stages'].items():
+        print(f"   {stage:<9}{s['calls']:>9}{s['busy_s']:>11.2f}{s['wall_s']:>10.2f}{s['mb']:>10.2f}{s['mb_s'] or '-':>10}")
+
+
+def compare(report: Dict, base: Dict, max_regression: float) -> list:
+    """Regresiones frente a 'base': MB/s que bajan o tiempos de pared que suben más de 'max_regression'."""
+    regressions = []
+    print(f"\n📊 Comparación contra {base.get('commit')} ({base.get('date')}):")
+    for name in ('upload', 'restore'):
+        old, new = base.get('phases', {}).get(name), report['phases'][name]
+        if old and old.get('wall_s'):
+            delta = new['wall_s'] / old['wall_s'] - 1
+            print(f"   {name:<9} pared {old['wall_s']:.2f}s -> {new['wall_s']:.2f}s ({delta:+.0%})")
+            if delta > max_regression:
+                regressions.append(f"{name}: pared {delta:+.0%}")
+    for stage, new in report['stages'].items():
+        old = base.get('stages', {}).get(stage)
+        if old and old.get('mb_s') and new.get('mb_s'):
+            delta = new['mb_s'] / old['mb_s'] - 1
+            print(f"   {stage:<9} {old['mb_s']:.2f} -> {new['mb_s']:.2f} MB/s ({delta:+.0%})")
+            if -delta > max_regression:
+                regressions.append(f"{stage}: {delta:+.0%} MB/s")
+    if base.get('params') != report['params']:
+        print("   ⚠️  Parámetros distintos a la base: la comparación es orientativa.")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_e2e",
+                                     description="Benchmark de subida y restauración de extremo a extremo")
+    parser.add_argument("--profile", choices=['small', 'huge', 'mixed'], default='mixed')
+    parser.add_argument("--scale", type=float, default=0.1, help="Tamaño del dataset (1 = perfil completo)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=['fake', 'rclone'], default='fake')
+    parser.add_argument("--mbps", type=float, default=0, help="Limitar la 'red' a N MB/s (0 = sin límite)")
+    parser.add_argument("--workdir", help="Carpeta de trabajo (por defecto, una temporal)")
+    parser.add_argument("--keep", action="store_true", help="No borrar la carpeta de trabajo al terminar")
+    parser.add_argument("--output", help="Ruta del JSON de resultado")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Con --compare, fracción de empeoramiento tolerada (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    try:
+        report = run(args)
+    except RuntimeError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    print_report(report)
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"{args.profile}_{time.strftime('%Y%m%d-%H%M%S')}_{report['commit']}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"\n💾 Resultado: {output}")
+
+    status = EXIT_OK if not report['phases']['restore']['failed'] else EXIT_FAIL
+    if args.compare:
+        regressions = compare(report, json.loads(Path(args.compare).read_text(encoding='utf-8')), args.max_regression)
+        if regressions:
+            print(f"❌ Regresiones: {', '.join(regressions)}", file=sys.stderr)
+            status = EXIT_FAIL
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+# benchmarks/bench_index.py
+"""
+MICRO-BENCHMARKS DEL ÍNDICE (InventoryManager) Y DE LOS PARSERS CALIENTES
+Construye índices sintéticos de 10k / 100k / 1M filas, mide cada operación (mediana de
+varias llamadas) y su pico de memoria (tracemalloc, en una llamada aparte), y ajusta una
+curva t = c * n^k por mínimos cuadrados en escala log-log: k ~ 0 es O(1), k ~ 1 es O(n).
+Falla si se supera un presupuesto de benchmarks/index_budgets.json:
+- max_exponent: complejidad ajustada (necesita al menos dos tamaños).
+- max_ms / max_peak_mb: latencia y memoria por tamaño de índice.
+- max_us: latencia por línea de los parsers de salida de rclone.
+
+    python -m benchmarks.bench_index
+    python -m benchmarks.bench_index --sizes 10000,100000 --ops check_exists,find_name,_parse
+
+Corre en una carpeta temporal aislada (GESTOR_DATA_DIR): save_local no pisa el índice real.
+Exit: 0 dentro del presupuesto | 1 presupuesto superado.
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from benchmarks.bench_e2e import RESULTS_DIR, git_revision  # noqa: E402
+from benchmarks.synthetic import build_index  # noqa: E402
+
+BUDGETS_PATH = BENCH_DIR / "index_budgets.json"
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+INDEX_OPS = ['check_exists', 'check_exists_miss', 'add_record', 'get_next_ids', 'get_files_by_category',
+             'find_name', 'find_hash', 'save_local', 'load']
+EXIT_OK, EXIT_FAIL = 0, 1
+MB = 1024 * 1024
+
+# Salida típica de rclone (--progress / --stats) y del log JSON de un lote
+SPEED_LINES = [
+    "Transferred:   200 MiB / 2.991 GiB, 7%, 18.182 MiB/s, ETA 2m37s",
+    "Transferred:   512.004 KiB / 1.000 MiB, 50%, 256.001 KiB/s, ETA 2s",
+    "Checks:                 0 / 0, -, Listed 3",
+]
+BATCH_LOG_LINE = '{"level":"info","msg":"Copied (new)","object":"DOC/%012x.7z","size":1024}'
+
+
+def fit_exponent(sizes: List[int], seconds: List[float]) -> float:
+    """Pendiente de log(t) contra log(n) (mínimos cuadrados)."""
+    xs = [math.log(n) for n in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in seconds]
+    mx, my = statistics.fmean(xs), statistics.fmean(ys)
+    den = sum((x - mx) ** 2 for x in xs)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / den if den else 0.0
+
+
+def measure(fn: Callable[[], object], repeat: int, reset: Callable[[], None] = None) -> Dict:
+    """Mediana de 'repeat' llamadas (tras una de calentamiento) y pico de memoria de otra."""
+    def once() -> float:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if reset:
+            reset()  # Fuera del tiempo medido (ej: deshacer un add_record)
+        return elapsed
+
+    once()
+    times = [once() for _ in range(max(1, repeat))]
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        if reset:
+            reset()
+    return {'median_ms': round(statistics.median(times) * 1000, 3), 'min_ms': round(min(times) * 1000, 3),
+            'peak_mb': round(peak / MB, 2)}
+
+
+# --- OPERACIONES ---
+
+def index_operations(inv, df) -> Dict[str, Dict]:
+    """Operaciones de InventoryManager sobre el índice 'df' (ya asignado a inv.df)."""
+    sample = df.iloc[len(df) // 2]
+    prefix, category, name = sample['prefijo'], sample['categoria'], sample['nombre_original']
+    record = {col: sample[col] for col in df.columns if col not in ('id_global', 'id_prefix')}
+    record.update({'nombre_original': "unidad_nueva", 'nombre_encriptado': "ffffffffffff"})
+
+    def restore():
+        inv.df = df
+
+    def load():
+        inv._load_or_create_db()
+
+    return {
+        'check_exists': {'fn': lambda: inv.check_exists(prefix, name)},
+        'check_exists_miss': {'fn': lambda: inv.check_exists(prefix, "no_existe")},
+        'add_record': {'fn': lambda: inv.add_record(record), 'reset': restore},
+        'get_next_ids': {'fn': lambda: inv.get_next_ids(prefix)},
+        'get_files_by_category': {'fn': lambda: inv.get_files_by_category(prefix, category)},
+        'find_name': {'fn': lambda: inv.find_file('nombre_original', name[-5:])},
+        'find_hash': {'fn': lambda: inv.find_file('nombre_encriptado', sample['nombre_encriptado'])},
+        'save_local': {'fn': inv.save_local, 'heavy': True},
+        'load': {'fn': load, 'heavy': True},
+    }
+
+
+def run_index(sizes: List[int], ops: List[str], repeat: int, seed: int) -> Dict[str, Dict]:
+    from inventory_manager import InventoryManager
+
+    inv = InventoryManager("bench-csv-password")
+    results: Dict[str, Dict] = {}
+    for n in sizes:
+        t0 = time.perf_counter()
+        df = build_index(n, seed).reindex(columns=list(inv.df.columns))
+        inv.df = df
+        inv.save_local()  # 'load' lee este CSV
+        print(f"🧪 Índice de {n:,} filas ({time.perf_counter() - t0:.1f}s)")
+        operations = index_operations(inv, df)
+        for name in ops:
+            op = operations.get(name)
+            if op is None:
+                continue
+            r = measure(op['fn'], 1 if op.get('heavy') and n >= 100_000 else repeat, op.get('reset'))
+            results.setdefault(name, {'sizes': {}})['sizes'][str(n)] = r
+            print(f"   {name:<24}{r['median_ms']:>12.3f} ms{r['peak_mb']:>10.2f} MB")
+            inv.df = df
+    return results
+
+
+def run_parsers(sizes: List[int]) -> Dict[str, Dict]:
+    from cloud_manager import CloudManager
+
+    # Los parsers no usan estado: sin __init__ no se busca rclone ni se arma el planificador
+    cloud = CloudManager.__new__(CloudManager)
+    calls = 100_000
+    results = {}
+    for name, fn in (('_parse_speed', cloud._parse_speed), ('_parse_progress', cloud._parse_progress)):
+        lines = SPEED_LINES * (calls // len(SPEED_LINES))
+        start = time.perf_counter()
+        for line in lines:
+            fn(line)
+        results[name] = {'us_per_call': round((time.perf_counter() - start) / len(lines) * 1e6, 3)}
+        print(f"   {name:<24}{results[name]['us_per_call']:>12.3f} µs/línea")
+
+    # El log de un lote crece con la cantidad de archivos: se mide su escalamiento
+    entry = {'sizes': {}}
+    for n in sizes:
+        output = "\n".join(BATCH_LOG_LINE % i for i in range(n))
+        r = measure(lambda: cloud._parse_batch_log(output), 1 if n >= 100_000 else 3)
+        entry['sizes'][str(n)] = r
+        print(f"   {'_parse_batch_log':<24}{r['median_ms']:>12.3f} ms ({n:,} líneas)")
+    results['_parse_batch_log'] = entry
+    return results
+
+
+# --- PRESUPUESTOS ---
+
+def check_budgets(results: Dict[str, Dict], budgets: Dict[str, Dict]) -> List[str]:
+    """Agrega el exponente ajustado a cada resultado y retorna las violaciones."""
+    violations = []
+    for name, res in results.items():
+        budget = budgets.get(name, {})
+        sizes = res.get('sizes')
+        if sizes and len(sizes) >= 2:
+            ns = sorted(sizes, key=int)
+            res['exponent'] = round(fit_exponent([int(n) for n in ns], [sizes[n]['median_ms'] for n in ns]), 3)
+            if 'max_exponent' in budget and res['exponent'] > budget['max_exponent']:
+                violations.append(f"{name}: O(n^{res['exponent']}) > n^{budget['max_exponent']}")
+        for n, r in (sizes or {}).items():
+            limit = budget.get('max_ms', {}).get(n)
+            if limit is not None and r['median_ms'] > limit:
+                violations.append(f"{name}@{n}: {r['median_ms']} ms > {limit} ms")
+            limit = budget.get('max_peak_mb', {}).get(n)
+            if limit is not None and r['peak_mb'] > limit:
+                violations.append(f"{name}@{n}: {r['peak_mb']} MB > {limit} MB")
+        if 'us_per_call' in res and 'max_us' in budget and res['us_per_call'] > budget['max_us']:
+            violations.append(f"{name}: {res['us_per_call']} µs > {budget['max_us']} µs")
+    return violations
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_index",
+                                     description="Micro-benchmarks y escalamiento de las operaciones del índice")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Filas por índice, separadas por coma")
+    parser.add_argument("--ops", help="Solo estas operaciones (coma). Por defecto, todas")
+    parser.add_argument("--repeat", type=int, default=5, help="Llamadas medidas por operación y tamaño")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--budgets", default=str(BUDGETS_PATH), help="JSON de presupuestos")
+    parser.add_argument("--no-budgets", action="store_true", help="Solo medir, sin fallar")
+    parser.add_argument("--output", help="Ruta del JSON de resultado")
+    args = parser.parse_args(argv)
+
+    sizes = sorted(int(s) for s in args.sizes.split(",") if s.strip())
+    # Aislado antes de importar config: save_local escribe en INDEX_DIR
+    data_dir = tempfile.mkdtemp(prefix="gestor_bench_index_")
+    os.environ['GESTOR_DATA_DIR'] = data_dir
+    from config import init_directories
+    init_directories()
+
+    ops = [o.strip() for o in args.ops.split(",")] if args.ops else INDEX_OPS + ['_parse']
+    try:
+        results = run_index(sizes, [o for o in ops if o in INDEX_OPS], args.repeat, args.seed)
+        if any(o.startswith("_parse") for o in ops):
+            print("🧪 Parsers de rclone")
+            results.update(run_parsers(sizes))
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    budgets = {} if args.no_budgets else json.loads(Path(args.budgets).read_text(encoding='utf-8'))
+    violations = check_budgets(results, budgets)
+
+    print("\n📈 Escalamiento (t ∝ n^k):")
+    for name, res in results.items():
+        if 'exponent' in res:
+            print(f"   {name:<24} k = {res['exponent']:.2f}")
+
+    report = {
+        'version': 1, 'commit': git_revision(), 'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'params': {'sizes': sizes, 'repeat': args.repeat, 'seed': args.seed},
+        'results': results, 'violations': violations,
+    }
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"index_{time.strftime('%Y%m%d-%H%M%S')}_{report['commit']}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"\n💾 Resultado: {output}")
+
+    if violations:
+        print("❌ Presupuesto superado:\n   " + "\n   ".join(violations), file=sys.stderr)
+        return EXIT_FAIL
+    print("✅ Dentro del presupuesto.")
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# benchmarks/fake_rclone.py
+"""
+RCLONE SIMULADO PARA BENCHMARKS
+Implementa el subconjunto de comandos que usa CloudManager sobre una carpeta local
+(FAKE_RCLONE_ROOT). Cualquier 'remote:ruta' se resuelve como FAKE_RCLONE_ROOT/ruta.
+
+    copy, copyto, sync, cat --offset --count, lsjson (--stat, -R, --hash), lsd,
+    hashsum, backend features, delete (--include / --files-from), rc (sin efecto)
+
+FAKE_RCLONE_MBPS limita la velocidad de copia (MB/s) para simular la red; sin ella,
+las transferencias corren a velocidad de disco. La salida imita a rclone en lo que
+CloudManager parsea: líneas 'Transferred: ... MiB/s' y el log JSON de --use-json-log.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(os.environ.get("FAKE_RCLONE_ROOT", "fake_remote")).resolve()
+MBPS = float(os.environ.get("FAKE_RCLONE_MBPS", 0) or 0)
+CHUNK = 1024 * 1024
+
+# Flags que llevan valor en el argumento siguiente (el resto son booleanos)
+VALUE_FLAGS = {
+    "--offset", "--count", "--files-from", "--include", "--hash-type", "--max-age",
+    "--transfers", "--checkers", "--onedrive-chunk-size", "--buffer-size", "--stats",
+    "--rc-addr", "--rc-user", "--rc-pass", "--url", "--user", "--pass", "--bwlimit",
+    "--multi-thread-streams", "--multi-thread-cutoff", "--multi-thread-write-buffer-size",
+}
+
+
+def parse_args(argv):
+    positional, flags = [], {}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg.startswith("-"):
+            name, eq, value = arg.partition("=")
+            if eq:
+                flags[name] = value
+            elif name in VALUE_FLAGS and i + 1 < len(argv):
+                flags[name] = argv[i + 1]
+                i += 1
+            else:
+                flags[name] = True
+        else:
+            positional.append(arg)
+        i += 1
+    return positional, flags
+
+
+def is_remote(spec: str) -> bool:
+    # 'C:\\...' (Windows) no es un remoto
+    return ":" in spec and not re.match(r"^[A-Za-z]:[\\/]", spec)
+
+
+def resolve(spec: str) -> Path:
+    if is_remote(spec):
+        return ROOT / spec.split(":", 1)[1].strip("/")
+    return Path(spec)
+
+
+def fail(message: str, code: int = 1):
+    sys.stderr.write(f"ERROR : {message}\n")
+    sys.exit(code)
+
+
+# --- TRANSFERENCIAS ---
+
+class Stats:
+    def __init__(self, flags):
+        self.json_log = "--use-json-log" in flags
+        self.progress = "--progress" in flags or "--stats" in flags or "--stats-one-line" in flags
+        self.bytes = 0
+        self.start = time.perf_counter()
+
+    def copied(self, obj: str, size: int):
+        self.bytes += size
+        if self.json_log:
+            print(json.dumps({"level": "info", "msg": "Copied (new)", "object": obj}), flush=True)
+
+    def error(self, obj: str, message: str):
+        if self.json_log:
+            print(json.dumps({"level": "error", "msg": message, "object": obj}), flush=True)
+        else:
+            sys.stderr.write(f"ERROR : {obj}: {message}\n")
+
+    def line(self, done: int, total: int):
+        if not self.progress:
+            return
+        elapsed = max(time.perf_counter() - self.start, 1e-6)
+        mib = 1024 * 1024
+        pct = int(done * 100 / total) if total else 100
+        print(f"Transferred:   {done / mib:.3f} MiB / {total / mib:.3f} MiB, {pct}%, "
+              f"{done / mib / elapsed:.3f} MiB/s, ETA 0s", flush=True)
+
+
+def copy_file(src: Path, dst: Path, stats: Stats):
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    total = src.stat().st_size
+    tmp = dst.with_name(f".{dst.name}.partial")
+    done = 0
+    with open(src, "rb") as fin, open(tmp, "wb") as fout:
+        for chunk in iter(lambda: fin.read(CHUNK), b""):
+            fout.write(chunk)
+            done += len(chunk)
+            if MBPS > 0:
+                # Simulación de red: no adelantarse a la velocidad configurada
+                ahead = done / (MBPS * 1024 * 1024) - (time.perf_counter() - stats.start)
+                if ahead > 0:
+                    time.sleep(ahead)
+    os.replace(tmp, dst)
+    shutil.copystat(src, dst)
+    stats.line(stats.bytes + total, stats.bytes + total)
+
+
+def cmd_copy(pos, flags, to_exact: bool = False):
+    if len(pos) < 2:
+        fail("copy: faltan origen y destino")
+    src, dst = resolve(pos[0]), resolve(pos[1])
+    stats = Stats(flags)
+    if "--files-from" in flags:
+        entries = [l.strip() for l in Path(flags["--files-from"]).read_text(encoding="utf-8").splitlines() if l.strip()]
+        errors = 0
+        for rel in entries:
+            source = src / rel
+            if not source.is_file():
+                stats.error(rel, "file not found")
+                errors += 1
+                continue
+            copy_file(source, dst / rel, stats)
+            stats.copied(rel, source.stat().st_size)
+        sys.exit(1 if errors else 0)
+
+    if not src.exists():
+        fail(f"{pos[0]}: directory not found", 3)
+    if src.is_file():
+        target = dst if to_exact else dst / src.name
+        copy_file(src, target, stats)
+        stats.copied(target.name, src.stat().st_size)
+        return
+    for path in sorted(p for p in src.rglob("*") if p.is_file()):
+        rel = path.relative_to(src).as_posix()
+        copy_file(path, dst / rel, stats)
+        stats.copied(rel, path.stat().st_size)
+
+
+def cmd_sync(pos, flags):
+    src, dst = resolve(pos[0]), resolve(pos[1])
+    source_files = {p.relative_to(src).as_posix() for p in src.rglob("*") if p.is_file()}
+    if dst.exists():
+        for path in [p for p in dst.rglob("*") if p.is_file()]:
+            if path.relative_to(dst).as_posix() not in source_files:
+                path.unlink()
+    cmd_copy(pos, flags)
+
+
+def cmd_cat(pos, flags):
+    path = resolve(pos[0])
+    if not path.is_file():
+        fail(f"{pos[0]}: object not found", 3)
+    offset = int(flags.get("--offset", 0))
+    count = int(flags.get("--count", -1))
+    out = sys.stdout.buffer
+    with open(path, "rb") as f:
+        f.seek(offset)
+        remaining = count if count >= 0 else None
+        while remaining is None or remaining > 0:
+            chunk = f.read(CHUNK if remaining is None else min(CHUNK, remaining))
+            if not chunk:
+                break
+            out.write(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    out.flush()
+
+
+# --- LISTADOS Y HASHES ---
+
+def md5_of(path: Path) -> str:
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def parse_age(value: str) -> float:
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd]?)", value)
+    if not match:
+        return float("inf")
+    return float(match.group(1)) * units[match.group(2) or "s"]
+
+
+def entry(path: Path, base: Path, with_hash: bool) -> dict:
+    st = path.stat()
+    item = {
+        "Path": path.relative_to(base).as_posix() if path != base else path.name,
+        "Name": path.name, "Size": st.st_size if path.is_file() else -1,
+        "ModTime": datetime.fromtimestamp(st.st_mtime, timezone.utc).isoformat().replace("+00:00", "Z"),
+        "IsDir": path.is_dir(),
+    }
+    if with_hash and path.is_file():
+        item["Hashes"] = {"md5": md5_of(path)}
+    return item
+
+
+def cmd_lsjson(pos, flags):
+    target = resolve(pos[0])
+    with_hash = "--hash" in flags
+    if "--stat" in flags:
+        if not target.exists():
+            fail(f"{pos[0]}: object not found", 3)
+        print(json.dumps(entry(target, target.parent, with_hash)))
+        return
+    if not target.is_dir():
+        fail(f"{pos[0]}: directory not found", 3)
+    paths = target.rglob("*") if "-R" in flags else target.iterdir()
+    min_mtime = time.time() - parse_age(flags["--max-age"]) if "--max-age" in flags else None
+    items = []
+    for path in sorted(paths):
+        if path.name.endswith(".partial"):
+            continue
+        if "--files-only" in flags and not path.is_file():
+            continue
+        if min_mtime is not None and path.stat().st_mtime < min_mtime:
+            continue
+        items.append(entry(path, target, with_hash))
+    print(json.dumps(items))
+
+
+def cmd_hashsum(pos, flags):
+    if pos[0].lower() != "md5":
+        fail(f"hash type {pos[0]} not supported")
+    path = resolve(pos[1])
+    print(f"{md5_of(path)}  {path.name}")
+
+
+def cmd_backend(pos, flags):
+    if pos and pos[0] == "features":
+        print(json.dumps({"Name": "fake", "Root": str(ROOT), "Hashes": ["md5"]}))
+        return
+    fail("backend: solo 'features'")
+
+
+def cmd_delete(pos, flags):
+    base = resolve(pos[0])
+    if "--files-from" in flags:
+        names = [l.strip() for l in Path(flags["--files-from"]).read_text(encoding="utf-8").splitlines() if l.strip()]
+        targets = [base / n for n in names]
+    elif "--include" in flags:
+        targets = list(base.glob(flags["--include"])) if base.is_dir() else []
+    else:
+        targets = [p for p in base.rglob("*") if p.is_file()] if base.is_dir() else [base]
+    for path in targets:
+        if path.is_file():
+            path.unlink()
+
+
+def cmd_lsd(pos, flags):
+    base = resolve(pos[0]) if pos else ROOT
+    base.mkdir(parents=True, exist_ok=True)
+    for path in sorted(p for p in base.iterdir() if p.is_dir()):
+        print(f"          -1 2000-01-01 00:00:00        -1 {path.name}")
+
+
+COMMANDS = {
+    "copy": cmd_copy, "copyto": lambda p, f: cmd_copy(p, f, to_exact=True), "sync": cmd_sync,
+    "cat": cmd_cat, "lsjson": cmd_lsjson, "hashsum": cmd_hashsum, "backend": cmd_backend,
+    "delete": cmd_delete, "lsd": cmd_lsd, "rc": lambda p, f: None,
+}
+
+
+def main(argv):
+    if not argv or argv[0] not in COMMANDS:
+        fail(f"comando no soportado por fake_rclone: {argv[:1]}")
+    pos, flags = parse_args(argv[1:])
+    COMMANDS[argv[0]](pos, flags)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,185 @@
+# blob_cache.py
+import json
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import logger, DATA_DIR, BLOB_CACHE_MAX_MB
+
+CACHE_DIR = DATA_DIR / "cache"
+CACHE_INDEX_NAME = "cache_index.json"
+
+MB = 1024 * 1024
+
+
+class BlobCache:
+    """
+    CACHÉ LOCAL DE ARCHIVOS CIFRADOS (LRU)
+    Guarda los .7z descargados (siguen cifrados, así que es seguro dejarlos en disco).
+    - Clave: 'nombre_encriptado'; se valida contra el tamaño/hash remoto (lsjson) antes de usarse.
+    - Presupuesto de disco BLOB_CACHE_MAX_MB con expulsión del menos usado recientemente.
+    - Las entradas en uso (extracción en curso) nunca se expulsan.
+    """
+
+    def __init__(self, cloud, max_mb: float = None, cache_dir: Path = None):
+        self.cloud = cloud
+        self.max_bytes = int((BLOB_CACHE_MAX_MB if max_mb is None else max_mb) * MB)
+        self.enabled = self.max_bytes > 0
+        self.cache_dir = Path(cache_dir or CACHE_DIR)
+        self._index_path = self.cache_dir / CACHE_INDEX_NAME
+        self._lock = threading.Lock()
+        self._pins: Counter = Counter()
+        self._entries: Dict[str, Dict] = self._load_index() if self.enabled else {}
+
+    # --- ÍNDICE PERSISTENTE ---
+
+    def _load_index(self) -> Dict[str, Dict]:
+        try:
+            entries = json.loads(self._index_path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"⚠️ Índice de caché ilegible, se reinicia: {e}")
+            return {}
+        # Descartar entradas cuyos archivos ya no están en disco
+        return {
+            name: entry for name, entry in entries.items()
+            if all((self.cache_dir / name / f).exists() for f in entry['files'])
+        }
+
+    def _save_index(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._entries, indent=1), encoding='utf-8')
+        os.replace(tmp, self._index_path)  # Escritura atómica
+
+    def _paths(self, name: str) -> List[Path]:
+        return [self.cache_dir / name / f for f in self._entries[name]['files']]
+
+    # --- CONSULTA ---
+
+    @staticmethod
+    def _same_remote(stored: Dict, current: Optional[Dict]) -> bool:
+        """Compara metadatos remotos: tamaño siempre; hash si el proveedor lo da, si no modtime."""
+        if not current or current['size'] != stored['size']:
+            return False
+        if stored.get('hash') and current.get('hash'):
+            return stored['hash'] == current['hash']
+        return stored.get('modtime') == current.get('modtime')
+
+    def lookup(self, name: str, remote_paths: List[str]) -> Optional[List[Path]]:
+        """
+        Retorna las rutas locales cacheadas de 'name' si siguen coincidiendo con la nube.
+        La entrada queda reservada (pin) hasta llamar a release().
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(name)
+            if not entry or len(entry['remote']) != len(remote_paths):
+                return None
+            self._pins[name] += 1  # Reservar antes de soltar el lock (evita expulsión concurrente)
+
+        current = [self.cloud.stat_remote(p) for p in remote_paths]
+        with self._lock:
+            valid = name in self._entries and all(
+                self._same_remote(stored, meta) for stored, meta in zip(self._entries[name]['remote'], current)
+            )
+            if not valid:
+                self._release_locked(name)
+                if name in self._entries:
+                    logger.info(f"♻️ Caché obsoleta para {name} (cambió en la nube). Se descarta.")
+                    self._drop_locked(name)
+                    self._save_index()
+                return None
+            self._entries[name]['last_used'] = time.time()
+            self._save_index()
+            logger.info(f"💾 {name} servido desde caché local (sin descargar).")
+            return self._paths(name)
+
+    # --- ADMISIÓN ---
+
+    def admit(self, name: str, remote_paths: List[str], local_files: List[Path]) -> Optional[List[Path]]:
+        """
+        Mueve archivos recién descargados a la caché y retorna sus nuevas rutas (reservadas).
+        Retorna None si no se pudieron cachear (los archivos quedan donde estaban).
+        """
+        if not self.enabled:
+            return None
+        local_files = [Path(p) for p in local_files]
+        total = sum(p.stat().st_size for p in local_files if p.exists())
+        if total > self.max_bytes:
+            return None
+
+        metas = [self.cloud.stat_remote(p) for p in remote_paths]
+        if any(m is None for m in metas):
+            return None
+        if any(m['size'] != p.stat().st_size for m, p in zip(metas, local_files)):
+            logger.warning(f"⚠️ Tamaño local distinto al remoto para {name}. No se cachea.")
+            return None
+
+        with self._lock:
+            if name in self._entries and self._pins[name]:
+                return None  # Otra copia en uso: no la pisamos
+            self._drop_locked(name)
+            target_dir = self.cache_dir / name
+            target_dir.mkdir(parents=True, exist_ok=True)
+            for p in local_files:
+                os.replace(p, target_dir / p.name)
+            self._entries[name] = {
+                'files': [p.name for p in local_files],
+                'remote': metas,
+                'size': total,
+                'last_used': time.time()
+            }
+            self._pins[name] += 1
+            self._evict_locked()
+            self._save_index()
+            return self._paths(name)
+
+    def release(self, name: str):
+        """Libera la reserva tomada por lookup()/admit()."""
+        with self._lock:
+            self._release_locked(name)
+            self._evict_locked()  # Lo que quedó fuera de presupuesto por estar en uso
+            self._save_index()
+
+    # --- EXPULSIÓN ---
+
+    def _release_locked(self, name: str):
+        if self._pins[name] > 0:
+            self._pins[name] -= 1
+        if self._pins[name] <= 0:
+            del self._pins[name]
+
+    def _drop_locked(self, name: str):
+        self._entries.pop(name, None)
+        shutil.rmtree(self.cache_dir / name, ignore_errors=True)
+
+    def _evict_locked(self):
+        used = sum(e['size'] for e in self._entries.values())
+        for name in sorted(self._entries, key=lambda n: self._entries[n]['last_used']):
+            if used <= self.max_bytes:
+                break
+            if self._pins[name]:
+                continue
+            used -= self._entries[name]['size']
+            logger.info(f"🧹 Caché llena: se expulsa {name}.")
+            self._drop_locked(name)
+
+    # --- MANTENIMIENTO ---
+
+    def stats(self) -> Dict:
+        with self._lock:
+            used = sum(e['size'] for e in self._entries.values())
+            return {'entries': len(self._entries), 'used_mb': used / MB, 'max_mb': self.max_bytes / MB}
+
+    def clear(self):
+        with self._lock:
+            for name in [n for n in self._entries if not self._pins[n]]:
+                self._drop_locked(name)
+            self._save_index()
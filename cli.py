@@ -0,0 +1,368 @@
+# cli.py
+"""
+CLI HEADLESS (cron / scripts), sin menús ni getpass obligatorio.
+
+    python cli.py stats                      # Resumen del índice local
+    python cli.py search <texto> [-p DOC]    # Buscar por nombre real
+    python cli.py verify                     # ¿Índice local == nube? (exit 0 = sincronizado)
+    python cli.py upload <carpeta_padre>     # Subida sin confirmaciones
+    python cli.py restore <PREFIJO> <IDS|TODO> [--mirror [--keep-extra]]  # --mirror: solo lo que difiere localmente
+    python cli.py watch <carpeta_padre>      # Vigilar y subir unidades nuevas (larga duración)
+    python cli.py scrub [--max-prefixes N]   # Verificar la nube con hashes del proveedor (exit 0 = sin problemas)
+    python cli.py reconcile [--full]         # Huérfanos / faltantes entre índice y nube (exit 0 = conciliado)
+    python cli.py rebuild [--fresh] [--upload]  # Reconstruir el índice desde los .7z de la nube (reanudable)
+    python cli.py audit [--workers N]        # Desencriptar todos los tokens del índice (exit 0 = consistente)
+    python cli.py rotate-key [--max-rows N]  # Re-cifrar con la clave de GESTOR_NEW_MASTER_PASSWORD (reanudable)
+
+Contraseñas (upload/restore, o verify cuando la nube cambió): variables de entorno
+GESTOR_MASTER_PASSWORD / GESTOR_CSV_PASSWORD, llavero del sistema (keyring) o
+'--password-stdin' (dos líneas: maestra y CSV).
+
+MEJORA: pandas, cryptography, colorama y tabulate solo se importan en los subcomandos
+que los necesitan. stats/search leen el CSV local con el módulo csv.
+"""
+import time
+_T0 = time.perf_counter()
+
+import argparse
+import csv
+import os
+import sys
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import (
+    logger, INDEX_DIR, INDEX_REMOTE_PATH, INDEX_CLOUD_STATE,
+    CLI_IMPORT_BUDGET_MS, KEYRING_SERVICE
+)
+
+HEAVY_MODULES = ("pandas", "cryptography", "colorama", "tabulate", "tqdm")
+LOCAL_CSV = INDEX_DIR / "index_main.csv"
+
+# Códigos de salida
+EXIT_OK, EXIT_FAIL, EXIT_ERROR = 0, 1, 2
+
+
+# --- MEDICIÓN DE ARRANQUE ---
+
+def _report_startup(args, command: str):
+    """Mide el tiempo hasta tener el comando listo y avisa si supera el presupuesto."""
+    elapsed_ms = (time.perf_counter() - _T0) * 1000
+    heavy = [m for m in HEAVY_MODULES if m in sys.modules]
+    if args.timing:
+        print(f"⏱️  {command}: listo en {elapsed_ms:.0f} ms | módulos pesados: {', '.join(heavy) or 'ninguno'}",
+              file=sys.stderr)
+    if elapsed_ms > CLI_IMPORT_BUDGET_MS:
+        logger.warning(f"⚠️ Arranque de '{command}' ({elapsed_ms:.0f} ms) supera el presupuesto de {CLI_IMPORT_BUDGET_MS} ms.")
+
+
+# --- LECTURA RÁPIDA DEL ÍNDICE LOCAL (sin pandas) ---
+
+def _iter_local_rows() -> Iterator[Dict[str, str]]:
+    if not LOCAL_CSV.exists():
+        return
+    with open(LOCAL_CSV, newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+
+def _to_float(value: str) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# --- CONTRASEÑAS ---
+
+def _read_passwords(args) -> Tuple[Optional[str], Optional[str]]:
+    """Entorno -> llavero del sistema -> stdin (--password-stdin) -> getpass si hay terminal."""
+    master = os.getenv("GESTOR_MASTER_PASSWORD")
+    csv_pass = os.getenv("GESTOR_CSV_PASSWORD")
+
+    if not (master and csv_pass):
+        try:
+            import keyring  # Opcional: solo si está instalado
+            master = master or keyring.get_password(KEYRING_SERVICE, "master")
+            csv_pass = csv_pass or keyring.get_password(KEYRING_SERVICE, "csv")
+        except ImportError:
+            pass
+        except Exception as e:
+            logger.debug(f"Llavero no disponible: {e}")
+
+    if not (master and csv_pass) and args.password_stdin:
+        lines = sys.stdin.read().splitlines() + ["", ""]
+        master = master or lines[0]
+        csv_pass = csv_pass or lines[1]
+
+    if not (master and csv_pass) and sys.stdin.isatty():
+        import getpass
+        master = master or getpass.getpass("🔑 Contraseña MAESTRA: ")
+        csv_pass = csv_pass or getpass.getpass("🔑 Contraseña CSV: ")
+
+    return master or None, csv_pass or None
+
+
+def _boot_app(args):
+    """Inicializa el orquestador completo (importa los managers pesados). None si falla."""
+    master, csv_pass = _read_passwords(args)
+    if not (master and csv_pass):
+        print("❌ Faltan contraseñas (GESTOR_MASTER_PASSWORD / GESTOR_CSV_PASSWORD, keyring o --password-stdin).",
+              file=sys.stderr)
+        return None
+
+    from config import init_directories
+    from main import AppOrchestrator
+    init_directories()
+    app = AppOrchestrator()
+    if not app.initialize(master, csv_pass, interactive=False):
+        return None
+    return app
+
+
+# --- SUBCOMANDOS ---
+
+def cmd_stats(args) -> int:
+    _report_startup(args, "stats")
+    count, total_mb, by_prefix = 0, 0.0, Counter()
+    for row in _iter_local_rows():
+        count += 1
+        total_mb += _to_float(row.get('tamaño_mb'))
+        by_prefix[row.get('prefijo', '')] += 1
+
+    if not count:
+        print("La base de datos está vacía.")
+        return EXIT_OK
+    print(f"Total Archivos: {count} | Tamaño Total: {total_mb:.2f} MB")
+    for prefix, n in sorted(by_prefix.items()):
+        print(f"  {prefix}\t{n}")
+    return EXIT_OK
+
+
+def cmd_search(args) -> int:
+    _report_startup(args, "search")
+    needle = args.text.lower()
+    hits = 0
+    for row in _iter_local_rows():
+        if args.prefix and row.get('prefijo') != args.prefix.upper():
+            continue
+        if needle in (row.get('nombre_original') or '').lower():
+            hits += 1
+            print("\t".join([
+                row.get('prefijo', ''), row.get('id_prefix', ''), row.get('categoria', ''),
+                row.get('nombre_original', ''), row.get('tamaño_mb', '')
+            ]))
+    if not hits:
+        print(f"Sin resultados para '{args.text}'.", file=sys.stderr)
+    return EXIT_OK if hits else EXIT_FAIL
+
+
+def _local_record_count() -> int:
+    return sum(1 for _ in _iter_local_rows())
+
+
+def cmd_verify(args) -> int:
+    """
+    Camino rápido: si el índice remoto no cambió desde la última descarga (lsjson),
+    compara contra la cantidad de registros guardada, sin contraseñas ni desencriptar.
+    """
+    import json
+    from cloud_manager import CloudManager
+
+    _report_startup(args, "verify")
+    meta = CloudManager().stat_remote(INDEX_REMOTE_PATH)
+    if meta is None:
+        print("❌ No existe índice en la nube (o error de conexión).")
+        return EXIT_ERROR
+
+    try:
+        state = json.loads(INDEX_CLOUD_STATE.read_text(encoding='utf-8'))
+    except Exception:
+        state = None
+
+    if state and 'records' in state and all(state.get(k) == meta[k] for k in ('size', 'modtime', 'hash')):
+        local, cloud = _local_record_count(), state['records']
+        status = 'EQUAL' if local == cloud else ('LOCAL_NEWER' if local > cloud else 'CLOUD_NEWER')
+    else:
+        # La nube cambió: hay que descargar y desencriptar (requiere contraseñas)
+        app = _boot_app(args)
+        if app is None:
+            return EXIT_ERROR
+        status = app.index_status
+
+    print(status)
+    return EXIT_OK if status == 'EQUAL' else (EXIT_ERROR if status == 'ERROR' else EXIT_FAIL)
+
+
+def cmd_upload(args) -> int:
+    from pathlib import Path
+    app = _boot_app(args)
+    if app is None:
+        return EXIT_ERROR
+    processed = app.run_upload_mode(Path(args.folder), assume_yes=True)
+    app.janitor.drain()
+    return EXIT_OK if processed is not None else EXIT_FAIL
+
+
+def cmd_restore(args) -> int:
+    app = _boot_app(args)
+    if app is None:
+        return EXIT_ERROR
+
+    cloud_df = app.index_sync.get()
+    if cloud_df is not None:
+        app.inventory.df = cloud_df
+    files_df = app.inventory.get_files_by_prefix(args.prefix.upper())
+    if args.ids.upper() != 'TODO':
+        try:
+            ids: List[int] = [int(x.strip()) for x in args.ids.split(',')]
+        except ValueError:
+            print("❌ Formato de IDs inválido (ej: 3,4,5 o TODO).", file=sys.stderr)
+            return EXIT_ERROR
+        files_df = files_df[files_df['id_prefix'].isin(ids)]
+    if files_df.empty:
+        print("❌ Ningún archivo seleccionado.", file=sys.stderr)
+        return EXIT_FAIL
+
+    if args.mirror:
+        result = app.mirror_rows(files_df, prune=not args.keep_extra)
+    else:
+        result = app.restore_rows(files_df)
+    app.janitor.drain()
+    return EXIT_OK if not result['failed'] else EXIT_FAIL
+
+
+def cmd_scrub(args) -> int:
+    app = _boot_app(args)
+    if app is None:
+        return EXIT_ERROR
+    state = app.run_scrub(max_prefixes=args.max_prefixes)
+    app.janitor.drain()
+    return EXIT_FAIL if state['problems'] else EXIT_OK
+
+
+def cmd_reconcile(args) -> int:
+    app = _boot_app(args)
+    if app is None:
+        return EXIT_ERROR
+    report = app.run_reconcile(force_full=args.full)
+    if report is None:
+        return EXIT_ERROR
+    return EXIT_FAIL if report['missing'] or report['mismatch'] or report['orphans'] else EXIT_OK
+
+
+def cmd_rebuild(args) -> int:
+    app = _boot_app(args)
+    if app is None:
+        return EXIT_ERROR
+    df = app.run_rebuild(fresh=args.fresh, upload=args.upload)
+    app.janitor.drain()
+    if df is None:
+        return EXIT_ERROR
+    return EXIT_FAIL if df['notas'].ne("Reconstruido").any() else EXIT_OK
+
+
+def cmd_audit(args) -> int:
+    app = _boot_app(args)
+    if app is None:
+        return EXIT_ERROR
+    report = app.run_audit(workers=args.workers)
+    app.janitor.drain()
+    return EXIT_FAIL if report['corrupt'] or report['mismatch'] or report['hash_mismatch'] else EXIT_OK
+
+
+def cmd_rotate_key(args) -> int:
+    new_password = os.getenv("GESTOR_NEW_MASTER_PASSWORD")
+    if not new_password and sys.stdin.isatty():
+        import getpass
+        new_password = getpass.getpass("🔑 Contraseña MAESTRA nueva: ")
+    if not new_password:
+        print("❌ Falta la contraseña nueva (GESTOR_NEW_MASTER_PASSWORD).", file=sys.stderr)
+        return EXIT_ERROR
+    app = _boot_app(args)
+    if app is None:
+        return EXIT_ERROR
+    state = app.run_key_rotation(new_password, max_rows=args.max_rows)
+    app.janitor.drain()
+    if state is None:
+        return EXIT_ERROR
+    return EXIT_OK if state['complete'] else EXIT_FAIL
+
+
+def cmd_watch(args) -> int:
+    from pathlib import Path
+    app = _boot_app(args)
+    if app is None:
+        return EXIT_ERROR
+    app.run_watch_mode(Path(args.folder), initial_scan=not args.no_initial_scan)
+    app.janitor.drain()
+    return EXIT_OK
+
+
+# --- PARSER ---
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Gestor de archivos encriptados (modo headless).")
+    parser.add_argument("--timing", action="store_true", help="Mostrar tiempo de arranque y módulos cargados")
+    parser.add_argument("--password-stdin", action="store_true", help="Leer contraseñas de stdin (maestra y CSV, una por línea)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("stats", help="Resumen del índice local").set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("search", help="Buscar por nombre real en el índice local")
+    p.add_argument("text")
+    p.add_argument("-p", "--prefix", help="Limitar a un prefijo (ej: DOC)")
+    p.set_defaults(func=cmd_search)
+
+    sub.add_parser("verify", help="Verificar si el índice local y el de la nube coinciden").set_defaults(func=cmd_verify)
+
+    p = sub.add_parser("upload", help="Subir las subcarpetas con prefijo válido de una carpeta padre")
+    p.add_argument("folder")
+    p.set_defaults(func=cmd_upload)
+
+    p = sub.add_parser("restore", help="Restaurar archivos por prefijo e IDs")
+    p.add_argument("prefix")
+    p.add_argument("ids", help="IDs separados por coma (id_prefix) o TODO")
+    p.add_argument("--mirror", action="store_true",
+                   help="Espejo incremental: omite carpetas idénticas y solo restaura los archivos distintos")
+    p.add_argument("--keep-extra", action="store_true",
+                   help="Con --mirror, no borrar archivos locales que no están en el archivo remoto")
+    p.set_defaults(func=cmd_restore)
+
+    p = sub.add_parser("scrub", help="Verificar archivos en la nube contra los hashes del proveedor (reanudable)")
+    p.add_argument("--max-prefixes", type=int, help="Procesar como máximo N prefijos en esta ejecución")
+    p.set_defaults(func=cmd_scrub)
+
+    p = sub.add_parser("reconcile", help="Cruzar índice y nube: huérfanos, faltantes y tamaños distintos")
+    p.add_argument("--full", action="store_true", help="Ignorar la caché y listar la nube completa")
+    p.set_defaults(func=cmd_reconcile)
+
+    p = sub.add_parser("rebuild", help="Reconstruir el índice leyendo los metadatos de cada .7z en la nube")
+    p.add_argument("--fresh", action="store_true", help="Descartar el avance de una reconstrucción anterior")
+    p.add_argument("--upload", action="store_true", help="Subir el índice reconstruido a la nube")
+    p.set_defaults(func=cmd_rebuild)
+
+    p = sub.add_parser("audit", help="Auditar los tokens de nombres del índice local (paralelo)")
+    p.add_argument("--workers", type=int, help="Procesos a usar (por defecto FERNET_WORKERS o uno por núcleo)")
+    p.set_defaults(func=cmd_audit)
+
+    p = sub.add_parser("rotate-key", help="Rotar la clave maestra re-cifrando cada archivo (reanudable)")
+    p.add_argument("--max-rows", type=int, help="Re-cifrar como máximo N archivos en esta ejecución")
+    p.set_defaults(func=cmd_rotate_key)
+
+    p = sub.add_parser("watch", help="Vigilar una carpeta padre y subir unidades nuevas automáticamente")
+    p.add_argument("folder")
+    p.add_argument("--no-initial-scan", action="store_true", help="No procesar lo existente al arrancar")
+    p.set_defaults(func=cmd_watch)
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,54 @@
 # cloud_manager.py
 import os
+import json
 import subprocess
 import shutil
 import re
 import time
 import sys
 import signal
+import uuid
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional, Union
+from typing import Iterator, List, Dict, Optional, Union
 from tqdm import tqdm  # Importamos la librería para la barra de progreso
 
+from bandwidth_scheduler import BandwidthScheduler
+from throttle_governor import ThrottleGovernor
+from local_scanner import LocalScanner
+
 # Configuración
 # AGREGADO: Importamos RCLONE_REMOTE_PATH y configuraciones Smart
 from config import (
-    logger, RCLONE_REMOTE, RCLONE_REMOTE_PATH, VALID_PREFIXES, DATA_DIR,
+    logger, RCLONE_REMOTE, RCLONE_REMOTE_PATH, DATA_DIR,
     # Variables Smart Upload
     SMART_MAX_RETRIES,
     SMART_T1_MIN, SMART_T1_MAX, SMART_T1_LIMIT,
     SMART_T2_MIN, SMART_T2_MAX, SMART_T2_LIMIT,
     SMART_T3_MIN, SMART_T3_MAX, SMART_T3_LIMIT,
     # Variables Stall Detection
-    SMART_STALL_MIN_TIME, SMART_STALL_LIMIT,
+    SMART_STALL_MIN_TIME, SMART_STALL_LIMIT, SMART_CAP_MARGIN,
+    # Variables Pre-flight Probe
+    SMART_PROBE_ENABLED, SMART_PROBE_MIN_FILE_MB, SMART_PROBE_COUNT,
+    SMART_PROBE_SIZE_MB, SMART_PROBE_MIN_SPEED, SMART_PROBE_MAX_TTFB,
+    SMART_PROBE_MAX_ROUNDS, SMART_HISTORY_SIZE, SMART_PROBE_FRESH_SECONDS,
     # Variables Download Optimization
     DL_TRANSFERS, DL_CHECKERS, DL_MULTI_THREAD_STREAMS, 
     DL_MULTI_THREAD_CUTOFF, DL_BUFFER_SIZE, DL_WRITE_BUFFER_SIZE,
-    DL_DISABLE_HTTP2
+    DL_DISABLE_HTTP2,
+    # Variables Throttling
+    GOV_MAX_THROTTLE_RETRIES,
+    # Variables Lotes
+    UPLOAD_BATCH_TRANSFERS,
+    # Variables Multi-volumen
+    SMART_PARALLEL_VOLUMES
 )
 
+# Carpeta remota (bajo la ruta base) para objetos de sondeo desechables
+PROBE_REMOTE_DIR = "_probes"
+
 class CloudManager:
     """
     FACHADA DE INFRAESTRUCTURA
@@ -39,6 +61,18 @@ class CloudManager:
         self.rclone_path_env = os.getenv("RCLONE_PATH") 
         self.rclone_exe = self._find_rclone()
 
+        # NUEVO: Historial de velocidades (sondas + subidas reales), protegido por lock
+        self.throughput_history = deque(maxlen=SMART_HISTORY_SIZE)
+        self._history_lock = threading.Lock()
+
+        # NUEVO: Presupuesto global de ancho de banda compartido por todas las transferencias
+        self.bandwidth = BandwidthScheduler(self.rclone_exe)
+        # NUEVO: Backoff compartido ante 429/503 (alimenta las pausas del planificador)
+        self.governor = ThrottleGovernor(scheduler=self.bandwidth)
+        # NUEVO: Tipo de hash nativo del remoto (se consulta una vez, ver remote_hash_type)
+        self._hash_type: Optional[str] = None
+        self._hash_type_known = False
+
     def _find_rclone(self) -> str:
         """Busca el ejecutable rclone.exe."""
         
@@ -151,12 +185,15 @@ class CloudManager:
         MEJORA: 'show_progress=True' permite que rclone muestre su barra nativa en consola.
         """
         cmd = [self.rclone_exe] + args
+        # Respetar una pausa global por throttling antes de abrir otro proceso
+        self.governor.wait()
         try:
             if show_progress:
                 # NUEVO: Si queremos ver progreso, NO capturamos el output, dejamos que salga a consola
                 # Usamos run normal heredando stdout/stderr
                 logger.debug(f"Ejecutando Rclone (Visible): {' '.join(cmd)}")
                 result = subprocess.run(cmd, timeout=timeout)
+                # Sin salida capturada no hay señal de throttling: un error sigue el camino normal
                 return result.returncode == 0
             else:
                 # Comportamiento original (Silencioso / Capturado)
@@ -173,6 +210,9 @@ class CloudManager:
                     # Filtramos errores que no son críticos (ej: avisos de 'directory not found' al listar)
                     if "directory not found" not in result.stderr.lower():
                         logger.error(f"❌ Error Rclone: {result.stderr.strip()}")
+                    retry_after = self.governor.detect(result.stderr)
+                    if retry_after is not None:
+                        self.governor.report_throttle(retry_after)
                     return False
                 return True
 
@@ -183,7 +223,103 @@ class CloudManager:
             logger.error(f"❌ Excepción Rclone: {e}")
             return False
 
-    def _smart_upload(self, local_path: str, remote_full_path: str) -> bool:
+    def _run_rclone_scheduled(self, args: List[str], kind: str, timeout: int = 3600, show_progress: bool = False,
+                              local_file: Path = None) -> bool:
+        """
+        Igual que _run_rclone, pero registrando la transferencia en el planificador de ancho de banda.
+        'local_file': archivo subido/descargado; si termina bien, su tamaño se contabiliza en el cubo
+        (el sondeo rc de core/stats no alcanza a ver el tramo final del proceso).
+        """
+        transfer_id, bw_flags = self.bandwidth.register(kind)
+        transferred = None
+        try:
+            ok = self._run_rclone(args + bw_flags, timeout=timeout, show_progress=show_progress)
+            if ok and local_file is not None and Path(local_file).is_file():
+                transferred = Path(local_file).stat().st_size
+            return ok
+        finally:
+            self.bandwidth.unregister(transfer_id, transferred)
+
+    def _run_rclone_capture(self, args: List[str], kind: str, timeout: int = 3600) -> tuple[int, str]:
+        """
+        Ejecuta rclone capturando la salida completa (stdout+stderr) bajo el planificador.
+        Retorna (returncode, salida). returncode -1 si no se pudo ejecutar.
+        """
+        self.governor.wait()
+        transfer_id, bw_flags = self.bandwidth.register(kind)
+        cmd = [self.rclone_exe] + args + bw_flags
+        transferred = None
+        try:
+            logger.debug(f"Ejecutando Rclone (Lote): {' '.join(cmd)}")
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding='utf-8',
+                timeout=timeout
+            )
+            output = result.stdout or ""
+            transferred = self._batch_log_bytes(output)
+            if result.returncode != 0:
+                retry_after = self.governor.detect(output)
+                if retry_after is not None:
+                    self.governor.report_throttle(retry_after)
+            return result.returncode, output
+        except subprocess.TimeoutExpired:
+            logger.error("❌ Rclone excedió el tiempo límite.")
+            return -1, ""
+        except Exception as e:
+            logger.error(f"❌ Excepción Rclone: {e}")
+            return -1, ""
+        finally:
+            self.bandwidth.unregister(transfer_id, transferred)
+
+    @staticmethod
+    def _batch_log_bytes(output: str) -> int:
+        """Bytes copiados según el log JSON de rclone (campo 'size' de cada 'Copied ...')."""
+        total = 0
+        for line in output.splitlines():
+            if '"Copied' not in line:
+                continue
+            try:
+                total += int(json.loads(line).get("size") or 0)
+            except (ValueError, TypeError, AttributeError):
+                continue
+        return total
+
+    def _parse_batch_log(self, output: str) -> Dict[str, bool]:
+        """
+        Traduce el log JSON de rclone (--use-json-log) a un resultado por objeto.
+        El último evento gana: un 'Copied' tras un reintento anula un error previo.
+        """
+        results = {}
+        for line in output.splitlines():
+            line = line.strip()
+            if not line.startswith("{"):
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            obj = entry.get("object")
+            if not obj:
+                continue
+            msg = entry.get("msg", "")
+            if entry.get("level") == "error":
+                results[obj] = False
+            elif msg.startswith("Copied") or msg.startswith("Unchanged skipping"):
+                results[obj] = True
+        return results
+
+    def _write_files_from(self, entries: List[str]) -> Path:
+        """Escribe la lista para --files-from en temp/ (una ruta relativa por línea)."""
+        list_path = DATA_DIR / "temp" / f"files_from_{uuid.uuid4().hex[:8]}.txt"
+        list_path.parent.mkdir(parents=True, exist_ok=True)
+        list_path.write_text("\n".join(entries) + "\n", encoding='utf-8')
+        return list_path
+
+    def _smart_upload(self, local_path: str, remote_full_path: str, label: str = "") -> bool:
         """
         Lógica de subida inteligente unificada (archivos grandes y pequeños).
         - Maneja reintentos infinitos para cortes T10/T20.
@@ -206,6 +342,7 @@ class CloudManager:
         max_critical_retries = SMART_MAX_RETRIES
         critical_failures = 0
         total_attempts = 0
+        throttled_attempts = 0  # Intentos frenados por el proveedor (no cuentan como críticos)
         
         try:
             total_size = os.path.getsize(local_path)
@@ -217,9 +354,15 @@ class CloudManager:
             total_attempts += 1
             if total_attempts > 1:
                 logger.info(f"🔄 Reintentando subida (Global: {total_attempts} | Críticos: {critical_failures}/{max_critical_retries})...")
+
+            # NUEVO: Si algún worker detectó throttling, esperamos la pausa global
+            self.governor.wait()
             
+            # NUEVO: Cada intento se registra en el presupuesto global (cuota + rc para reajustes)
+            transfer_id, bw_flags = self.bandwidth.register("upload")
+
             process = subprocess.Popen(
-                base_cmd,
+                base_cmd + bw_flags,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 text=True,
@@ -230,8 +373,9 @@ class CloudManager:
             start_time = time.time()
             killed = False
             critical_error = False # Flag para saber si el error cuenta como "vida perdida"
+            throttle_hint = None   # Retry-After (o 0.0) si el proveedor nos limitó en este intento
             
-            pbar = tqdm(total=total_size, unit='B', unit_scale=True, unit_divisor=1024, desc=f"Subiendo (Intento {total_attempts}) [Avg]", leave=False)
+            pbar = tqdm(total=total_size, unit='B', unit_scale=True, unit_divisor=1024, desc=f"Subiendo{label} (Intento {total_attempts}) [Avg]", leave=False)
             last_bytes = 0
             
             # Variables para Stall Detection (Promedio)
@@ -245,6 +389,12 @@ class CloudManager:
                         break
                     
                     if line:
+                        # NUEVO: Señales de throttling (429/503) en la salida de rclone
+                        if throttle_hint is None or throttle_hint == 0.0:
+                            signal_after = self.governor.detect(line)
+                            if signal_after is not None:
+                                throttle_hint = signal_after
+
                         # Parseo de Progreso
                         if "Transferred:" in line and "%" in line:
                             curr_bytes, tot_bytes = self._parse_progress(line)
@@ -252,6 +402,7 @@ class CloudManager:
                                 delta = curr_bytes - last_bytes
                                 if delta > 0:
                                     pbar.update(delta)
+                                    self.bandwidth.account(transfer_id, delta)
                                     last_bytes = curr_bytes
                         
                         elapsed = time.time() - start_time
@@ -266,48 +417,23 @@ class CloudManager:
                             speed_samples += 1
                             avg_speed_session = accumulated_speed / speed_samples if speed_samples > 0 else 0
 
-                            # --- 1. DETECCIÓN DE ESTANCAMIENTO (STALL) ---
-                            if elapsed > SMART_STALL_MIN_TIME and avg_speed_session < SMART_STALL_LIMIT:
-                                pbar.close()
-                                logger.warning(f"⚠️ ESTANCAMIENTO DETECTADO (Avg: {avg_speed_session:.2f} MB/s en {elapsed:.0f}s). Reiniciando...")
-                                process.terminate()
-                                killed = True
-                                critical_error = True # Un estancamiento largo cuenta como falla crítica
-                                break
-
-                            # --- 2. CORTES TEMPRANOS (GRATUITOS) ---
-                            # T10
-                            if 10 <= elapsed <= 12 and speed < SMART_T1_LIMIT:
-                                pbar.close()
-                                logger.warning(f"⚠️ Velocidad baja ({speed:.2f} MB/s) a los 10s. Reinicio RÁPIDO (No consume intento)...")
-                                process.terminate()
-                                killed = True
-                                critical_error = False # No cuenta
-                                break
-                            
-                            # T20
-                            if 20 <= elapsed <= 22 and speed < SMART_T2_LIMIT:
-                                pbar.close()
-                                logger.warning(f"⚠️ Velocidad baja ({speed:.2f} MB/s) a los 20s. Reinicio RÁPIDO (No consume intento)...")
-                                process.terminate()
-                                killed = True
-                                critical_error = False # No cuenta
-                                break
-
-                            # --- 3. CORTE TARDÍO (CRÍTICO) ---
-                            # T30
-                            if 30 <= elapsed <= 32 and speed < SMART_T3_LIMIT:
+                            # CORRECCIÓN: umbrales acotados a la cuota del planificador (ventana BW_SCHEDULE
+                            # o volúmenes en paralelo que se reparten el límite)
+                            verdict = self._speed_verdict(elapsed, speed, avg_speed_session,
+                                                          self.bandwidth.transfer_limit_mb(transfer_id))
+                            if verdict:
+                                message, critical_error = verdict
                                 pbar.close()
-                                logger.warning(f"⚠️ Velocidad insuficiente ({speed:.2f} MB/s) a los 30s. Falla CRÍTICA...")
+                                logger.warning(message)
                                 process.terminate()
                                 killed = True
-                                critical_error = True # SÍ cuenta
                                 break
 
             except KeyboardInterrupt:
                 pbar.close()
                 logger.warning("\n🛑 Cancelación manual detectada.")
                 process.terminate()
+                self.bandwidth.unregister(transfer_id)
                 return False # Abortar todo el archivo
 
             except Exception as e:
@@ -318,6 +444,24 @@ class CloudManager:
                 critical_error = True
             
             pbar.close()
+            self.bandwidth.unregister(transfer_id)
+
+            # NUEVO: Alimentar el historial compartido con el promedio de esta sesión
+            if speed_samples > 0:
+                self._record_throughput("upload", accumulated_speed / speed_samples)
+
+            # NUEVO: Un intento frenado por el proveedor no consume vidas: backoff compartido
+            if (killed or process.returncode != 0) and throttle_hint is not None:
+                throttled_attempts += 1
+                if killed:
+                    try: process.wait(timeout=5)
+                    except: process.kill()
+                if throttled_attempts > GOV_MAX_THROTTLE_RETRIES:
+                    logger.error(f"❌ Throttling persistente ({throttled_attempts} intentos). Cuenta como falla crítica.")
+                    critical_failures += 1
+                    throttled_attempts = 0
+                self.governor.report_throttle(throttle_hint)
+                continue # governor.wait() al inicio del while respeta la pausa
 
             if killed:
                 try: process.wait(timeout=5)
@@ -332,6 +476,7 @@ class CloudManager:
             else:
                 # Terminó sin killed
                 if process.returncode == 0:
+                    self.governor.report_success()
                     return True
                 else:
                     logger.error("❌ Rclone terminó con error no controlado.")
@@ -342,59 +487,217 @@ class CloudManager:
         logger.error(f"❌ Se agotaron los {max_critical_retries} intentos CRÍTICOS de subida.")
         return False
 
+    @staticmethod
+    def _speed_verdict(elapsed: float, speed: float, avg_speed: float,
+                       cap_mb: Optional[float] = None) -> Optional[tuple[str, bool]]:
+        """
+        Cortes de Smart Upload. Retorna None para seguir, o (mensaje, cuenta_como_critico).
+        'cap_mb': cuota del planificador para esta transferencia; ningún umbral la supera.
+        """
+        def limit(threshold: float) -> float:
+            return min(threshold, cap_mb * SMART_CAP_MARGIN) if cap_mb else threshold
+
+        # --- 1. DETECCIÓN DE ESTANCAMIENTO (STALL) ---
+        if elapsed > SMART_STALL_MIN_TIME and avg_speed < limit(SMART_STALL_LIMIT):
+            return f"⚠️ ESTANCAMIENTO DETECTADO (Avg: {avg_speed:.2f} MB/s en {elapsed:.0f}s). Reiniciando...", True
+
+        # --- 2. CORTES TEMPRANOS (GRATUITOS) ---
+        if SMART_T1_MIN <= elapsed <= SMART_T1_MAX and speed < limit(SMART_T1_LIMIT):
+            return f"⚠️ Velocidad baja ({speed:.2f} MB/s) a los {SMART_T1_MIN}s. Reinicio RÁPIDO (No consume intento)...", False
+        if SMART_T2_MIN <= elapsed <= SMART_T2_MAX and speed < limit(SMART_T2_LIMIT):
+            return f"⚠️ Velocidad baja ({speed:.2f} MB/s) a los {SMART_T2_MIN}s. Reinicio RÁPIDO (No consume intento)...", False
+
+        # --- 3. CORTE TARDÍO (CRÍTICO) ---
+        if SMART_T3_MIN <= elapsed <= SMART_T3_MAX and speed < limit(SMART_T3_LIMIT):
+            return f"⚠️ Velocidad insuficiente ({speed:.2f} MB/s) a los {SMART_T3_MIN}s. Falla CRÍTICA...", True
+        return None
+
+    # --- HISTORIAL DE VELOCIDAD Y SONDEO PREVIO (PRE-FLIGHT) ---
+
+    def _record_throughput(self, source: str, speed_mb: float, ttfb: Optional[float] = None):
+        """Registra una muestra de velocidad (MB/s) en el historial compartido."""
+        with self._history_lock:
+            self.throughput_history.append({
+                'ts': time.time(),
+                'source': source,          # 'probe' | 'upload'
+                'speed_mb': round(speed_mb, 2),
+                'ttfb': ttfb
+            })
+
+    def get_recent_throughput(self, samples: int = 10, source: str = None, max_age: float = None) -> float:
+        """
+        Promedio (MB/s) de las últimas N muestras del historial. 0.0 si no hay datos.
+        'source' filtra por origen ('probe' | 'upload'); 'max_age' descarta muestras más viejas (segundos).
+        """
+        cutoff = time.time() - max_age if max_age is not None else 0.0
+        with self._history_lock:
+            recent = [s for s in self.throughput_history
+                      if (source is None or s['source'] == source) and s['ts'] >= cutoff][-samples:]
+        if not recent:
+            return 0.0
+        return sum(s['speed_mb'] for s in recent) / len(recent)
+
+    def _get_probe_file(self) -> Path:
+        """Crea (o reutiliza) el archivo local de sondeo en temp/."""
+        probe_path = DATA_DIR / "temp" / f"probe_{SMART_PROBE_SIZE_MB}M.bin"
+        expected_size = SMART_PROBE_SIZE_MB * 1024 * 1024
+        if not probe_path.exists() or probe_path.stat().st_size != expected_size:
+            probe_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(probe_path, 'wb') as f:
+                # Datos aleatorios: evita que una compresión en tránsito falsee la medición
+                for _ in range(SMART_PROBE_SIZE_MB):
+                    f.write(os.urandom(1024 * 1024))
+        return probe_path
+
+    def _probe_once(self, probe_path: Path) -> Dict:
+        """
+        Sube una sonda desechable midiendo TTFB y caudal.
+        Retorna {'ok': bool, 'ttfb': float, 'speed_mb': float, 'min_speed': float}. El objeto remoto se borra siempre.
+        CORRECCIÓN: pasa por el gobernador y el planificador como cualquier subida; 'min_speed' es
+        SMART_PROBE_MIN_SPEED acotado a la cuota que recibió la sonda.
+        """
+        probe_name = f"probe_{uuid.uuid4().hex[:8]}.bin"
+        remote_dir = self._build_remote_path(PROBE_REMOTE_DIR)
+        cmd = [
+            self.rclone_exe, "copyto", str(probe_path), f"{remote_dir}/{probe_name}",
+            "--transfers", "1",
+            "--progress",
+            "--stats", "500ms",
+            "-v"
+        ]
+
+        size_mb = probe_path.stat().st_size / (1024 * 1024)
+        self.governor.wait()
+        transfer_id, bw_flags = self.bandwidth.register("probe")
+        cap = self.bandwidth.transfer_limit_mb(transfer_id)
+        min_speed = min(SMART_PROBE_MIN_SPEED, cap * SMART_CAP_MARGIN) if cap else SMART_PROBE_MIN_SPEED
+        start_time = time.time()
+        first_byte_time = None
+        throttle_hint = None
+        last_bytes = 0
+        ok = False
+
+        try:
+            process = subprocess.Popen(
+                cmd + bw_flags,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding='utf-8',
+                bufsize=1
+            )
+            while True:
+                line = process.stdout.readline()
+                if not line and process.poll() is not None:
+                    break
+
+                if line and throttle_hint is None:
+                    throttle_hint = self.governor.detect(line)
+                if "Transferred:" in line and "%" in line:
+                    curr_bytes, _ = self._parse_progress(line)
+                    if curr_bytes > last_bytes:
+                        self.bandwidth.account(transfer_id, curr_bytes - last_bytes)
+                        last_bytes = curr_bytes
+                    if first_byte_time is None and curr_bytes > 0:
+                        first_byte_time = time.time()
+
+                # Sin un solo byte en el doble del TTFB permitido: ruta descartada
+                if first_byte_time is None and time.time() - start_time > SMART_PROBE_MAX_TTFB * 2:
+                    process.terminate()
+                    break
+
+            try: process.wait(timeout=10)
+            except: process.kill()
+            ok = process.returncode == 0
+        except Exception as e:
+            logger.debug(f"Sonda {probe_name} falló: {e}")
+        finally:
+            end_time = time.time()  # Antes de unregister: el reajuste rc no cuenta en la medición
+            self.bandwidth.unregister(transfer_id, probe_path.stat().st_size if ok else None)
+
+        if throttle_hint is not None:
+            self.governor.report_throttle(throttle_hint)
+
+        # Limpieza remota ('delete' con filtro no falla si el objeto nunca llegó)
+        self._run_rclone(["delete", remote_dir, "--include", probe_name], timeout=60)
+
+        if not ok:
+            return {'ok': False, 'ttfb': None, 'speed_mb': 0.0, 'min_speed': min_speed}
+
+        if first_byte_time is None:
+            # Sonda tan rápida que no hubo estadística intermedia: usamos el tiempo total (cota conservadora)
+            ttfb = end_time - start_time
+            speed = size_mb / max(end_time - start_time, 0.001)
+        else:
+            ttfb = first_byte_time - start_time
+            speed = size_mb / max(end_time - first_byte_time, 0.001)
+
+        return {'ok': True, 'ttfb': round(ttfb, 2), 'speed_mb': speed, 'min_speed': min_speed}
+
+    def preflight_probe(self) -> bool:
+        """
+        NUEVO: Sondeo previo de ruta antes de comprometer una subida grande.
+        Lanza SMART_PROBE_COUNT sondas en paralelo por ronda y reintenta hasta que alguna
+        alcance SMART_PROBE_MIN_SPEED con TTFB <= SMART_PROBE_MAX_TTFB.
+        Los resultados alimentan el mismo historial que Smart Upload.
+        CORRECCIÓN: no sondea si las subidas recientes ya superan el umbral, ni bajo una cuota
+        de ancho de banda menor al umbral (las sondas solo gastarían presupuesto y fallarían).
+        """
+        recent = self.get_recent_throughput(SMART_PROBE_COUNT, source="upload", max_age=SMART_PROBE_FRESH_SECONDS)
+        if recent >= SMART_PROBE_MIN_SPEED:
+            logger.info(f"🛰️ Ruta validada por subidas recientes ({recent:.2f} MB/s). Sin sondeo.")
+            return True
+        limit = self.bandwidth.current_limit_mb() if self.bandwidth.enabled else None
+        if limit is not None and limit < SMART_PROBE_MIN_SPEED:
+            logger.info(f"🛰️ Cuota activa de {limit:.2f} MB/s (< {SMART_PROBE_MIN_SPEED} MB/s). Sin sondeo.")
+            return True
+
+        probe_path = self._get_probe_file()
+
+        for round_n in range(1, SMART_PROBE_MAX_ROUNDS + 1):
+            with ThreadPoolExecutor(max_workers=SMART_PROBE_COUNT) as pool:
+                results = list(pool.map(lambda _: self._probe_once(probe_path), range(SMART_PROBE_COUNT)))
+
+            for r in results:
+                if r['ok']:
+                    self._record_throughput("probe", r['speed_mb'], r['ttfb'])
+
+            best = max(results, key=lambda r: r['speed_mb'])
+            passed = [
+                r for r in results
+                if r['ok'] and r['speed_mb'] >= r['min_speed'] and r['ttfb'] <= SMART_PROBE_MAX_TTFB
+            ]
+
+            if passed:
+                winner = max(passed, key=lambda r: r['speed_mb'])
+                logger.info(f"🛰️ Ruta validada (Ronda {round_n}): {winner['speed_mb']:.2f} MB/s | TTFB {winner['ttfb']}s")
+                return True
+
+            logger.warning(
+                f"⚠️ Sondeo {round_n}/{SMART_PROBE_MAX_ROUNDS}: mejor {best['speed_mb']:.2f} MB/s "
+                f"(mínimo {best['min_speed']:.2f} MB/s). Reintentando..."
+            )
+            time.sleep(1)
+
+        logger.warning("⚠️ Ninguna sonda alcanzó el umbral. Se continúa con Smart Upload (monitoreo activo).")
+        return False
+
     # --- OPERACIONES LOCALES ---
 
     def scan_local_folders(self, parent_path: Path) -> List[Dict]:
         """
         MEJORA: Escaneo inteligente de 2 niveles para soportar Categorías.
         Devuelve una lista de diccionarios: {'path': Path, 'prefix': str, 'category': str}
+        ordenada por prefijo y categoría. Para procesar mientras se escanea, usar iter_local_folders().
         """
-        parent_path = Path(parent_path)
-        if not parent_path.exists():
-            logger.error(f"Ruta no existe: {parent_path}")
-            return []
-
-        valid_items = []
-        logger.info(f"Explorando: {parent_path}")
+        return sorted(self.iter_local_folders(parent_path), key=lambda x: (x['prefix'], x['category']))
 
-        for item in parent_path.iterdir():
-            if item.is_dir():
-                # 1. Verificar si el nombre es un Prefijo (Nivel 1: Contenedor de Categorías)
-                # Ej: C:/.../DOC
-                possible_prefix = item.name.upper()
-                
-                if possible_prefix in VALID_PREFIXES:
-                    # Estamos en una carpeta PREFIJO (DOC). Exploramos sus hijos (Categorías).
-                    # Ej: C:/.../DOC/Universidad
-                    for subitem in item.iterdir():
-                        if subitem.is_dir():
-                            category_name = subitem.name # "Universidad"
-                            
-                            # Ahora exploramos los archivos dentro de la categoría
-                            # Ej: C:/.../DOC/Universidad/Tesis
-                            for final_item in subitem.iterdir():
-                                if final_item.is_dir(): # Solo procesamos carpetas como unidades
-                                    valid_items.append({
-                                        'path': final_item,
-                                        'prefix': possible_prefix,
-                                        'category': category_name
-                                    })
-                else:
-                    # 2. Verificar si es una carpeta directa con prefijo (Legacy/Simple)
-                    # Ej: C:/.../DOC_Contrato
-                    if any(possible_prefix.startswith(p) for p in VALID_PREFIXES):
-                        # Intentamos deducir el prefijo
-                        prefix_found = next((p for p in VALID_PREFIXES if possible_prefix.startswith(p)), None)
-                        if prefix_found:
-                            valid_items.append({
-                                'path': item,
-                                'prefix': prefix_found,
-                                'category': 'General' # Categoría por defecto
-                            })
-
-        logger.info(f"✅ Encontradas {len(valid_items)} carpetas para procesar.")
-        # Ordenamos por prefijo y luego categoría
-        return sorted(valid_items, key=lambda x: (x['prefix'], x['category']))
+    def iter_local_folders(self, parent_path: Path) -> Iterator[Dict]:
+        """
+        NUEVO: Generador sobre LocalScanner (scandir en paralelo por PREFIJO + snapshot de mtimes).
+        Entrega las unidades a medida que aparecen, sin esperar el escaneo completo.
+        """
+        return LocalScanner(parent_path).scan()
 
     def clean_temp(self):
         """Limpia la carpeta temporal."""
@@ -415,11 +718,12 @@ class CloudManager:
         # Probamos listar la raíz del remote, independiente de la carpeta base
         return self._run_rclone(["lsd", f"{self.remote}:/"], timeout=10)
 
-    def upload_file(self, local_path: Path, remote_path: str) -> bool:
+    def upload_file(self, local_path: Path, remote_path: str, probe: bool = True, label: str = "") -> bool:
         """
         Sube un archivo específico con barra de progreso.
         MEJORA: UNIFICACIÓN. Todos los archivos (grandes o chicos) pasan por _smart_upload.
         Esto arregla el error 'is a directory' porque _smart_upload usa 'copy', y nos da robustez siempre.
+        'probe=False' omite el sondeo previo (ej: volúmenes de un set ya sondeado).
         """
         local_path = Path(local_path)
         # MEJORA: Usar constructor de ruta inteligente
@@ -433,18 +737,23 @@ class CloudManager:
         # SIEMPRE USAR SMART UPLOAD (Incluso para archivos chicos)
         # Cambiado umbral > 500 a >= 0
         if size_mb >= 10:
+            # NUEVO: Archivos muy grandes validan la ruta con sondas antes de abrir la sesión real
+            if probe and SMART_PROBE_ENABLED and size_mb >= SMART_PROBE_MIN_FILE_MB:
+                logger.info(f"🛰️ Archivo grande ({size_mb:.2f} MB). Sondeando ruta antes de subir...")
+                self.preflight_probe()
+
             logger.info(f"⚡ Archivo detectado ({size_mb:.2f} MB). Iniciando transferencia Smart...")
             # Pasamos rutas como string para el comando Popen
-            return self._smart_upload(str(local_path), full_dest)
+            return self._smart_upload(str(local_path), full_dest, label=label)
         else:
             # Este bloque técnicamente es inalcanzable ahora, pero se deja por seguridad
-            return self._run_rclone([
+            return self._run_rclone_scheduled([
                 "copyto", 
                 str(local_path), 
                 full_dest,
                 "--progress",       
                 "--stats-one-line" 
-            ], show_progress=True)
+            ], kind="upload", show_progress=True, local_file=local_path)
 
     def download_file(self, remote_path: str, local_dest: Path, silent: bool = False) -> bool:
         """
@@ -469,17 +778,294 @@ class CloudManager:
             "--stats-one-line"
         ] + opt_flags # <-- Añadimos los flags extra aquí
         
-        return self._run_rclone(cmd, show_progress=not silent)
+        return self._run_rclone_scheduled(cmd, kind="download", show_progress=not silent, local_file=local_dest)
+
+    def upload_volumes(self, volume_paths: List[Path], remote_dir: str) -> bool:
+        """
+        NUEVO: Sube un set de volúmenes (.7z.001, .002...) en paralelo.
+        Cada volumen tiene su propio monitoreo Smart Upload y sus reintentos; un volumen lento
+        ya no frena el set completo. Retorna True solo si TODOS los volúmenes llegaron.
+        """
+        if not volume_paths:
+            return False
+
+        total_mb = sum(Path(v).stat().st_size for v in volume_paths) / (1024 * 1024)
+        if SMART_PROBE_ENABLED and total_mb >= SMART_PROBE_MIN_FILE_MB:
+            logger.info(f"🛰️ Set de {len(volume_paths)} volúmenes ({total_mb:.2f} MB). Sondeando ruta...")
+            self.preflight_probe()
+
+        def _upload(indexed):
+            i, vol = indexed
+            return self.upload_file(vol, remote_dir, probe=False, label=f" Vol {i}/{len(volume_paths)}")
+
+        with ThreadPoolExecutor(max_workers=max(1, SMART_PARALLEL_VOLUMES)) as pool:
+            results = list(pool.map(_upload, enumerate(volume_paths, 1)))
+
+        failed = [Path(v).name for v, ok in zip(volume_paths, results) if not ok]
+        if failed:
+            logger.error(f"❌ Volúmenes con falla: {', '.join(failed)}")
+            return False
+        logger.info(f"✅ Set de {len(volume_paths)} volúmenes subido.")
+        return True
+
+    def download_range(self, remote_path: str, offset: int, count: int, dest_file: Path, dest_offset: int) -> bool:
+        """
+        NUEVO: Descarga solo un rango de bytes de un objeto ('rclone cat --offset --count')
+        y lo escribe en 'dest_file' a partir de 'dest_offset' (archivo disperso preexistente).
+        """
+        self.governor.wait()
+        transfer_id, bw_flags = self.bandwidth.register("download")
+        cmd = [
+            self.rclone_exe, "cat", self._build_remote_path(remote_path),
+            "--offset", str(offset), "--count", str(count)
+        ] + bw_flags
+        written = 0
+        try:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            with open(dest_file, "r+b") as f:
+                f.seek(dest_offset)
+                for chunk in iter(lambda: process.stdout.read(1024 * 1024), b""):
+                    f.write(chunk)
+                    written += len(chunk)
+            stderr = process.stderr.read().decode('utf-8', errors='replace')
+            process.wait()
+            if process.returncode != 0:
+                retry_after = self.governor.detect(stderr)
+                if retry_after is not None:
+                    self.governor.report_throttle(retry_after)
+                logger.error(f"❌ Error leyendo rango de {remote_path}: {stderr.strip()}")
+                return False
+            if written != count:
+                logger.error(f"❌ Rango incompleto de {remote_path}: {written}/{count} bytes.")
+                return False
+            self.bandwidth.account(transfer_id, written)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Excepción leyendo rango: {e}")
+            return False
+        finally:
+            self.bandwidth.unregister(transfer_id)
+
+    def stat_remote(self, remote_path: str) -> Optional[Dict]:
+        """
+        NUEVO: Metadatos baratos de un objeto remoto ('rclone lsjson --stat --hash').
+        Retorna {'size', 'modtime', 'hash'} o None si no existe / no se pudo consultar.
+        'hash' es el primero que informe el proveedor (MD5, SHA1, QuickXor...) o "".
+        """
+        cmd = [self.rclone_exe, "lsjson", "--stat", "--hash", self._build_remote_path(remote_path)]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', timeout=60)
+            if result.returncode != 0:
+                return None
+            info = json.loads(result.stdout or "{}")
+        except Exception as e:
+            logger.debug(f"lsjson --stat falló para {remote_path}: {e}")
+            return None
+        hashes = info.get("Hashes") or {}
+        return {
+            'size': int(info.get("Size", -1)),
+            'modtime': info.get("ModTime", ""),
+            'hash': next((f"{k}:{v}" for k, v in sorted(hashes.items()) if v), "")
+        }
+
+    # --- HASHES NATIVOS DEL PROVEEDOR (SCRUB) ---
+
+    def remote_hash_type(self) -> Optional[str]:
+        """
+        NUEVO: Hash nativo del remoto ('quickxor' en OneDrive, 'md5'/'sha1' en otros), vía
+        'rclone backend features'. None si el proveedor no informa hashes (ej: crypt).
+        """
+        if self._hash_type_known:
+            return self._hash_type
+        cmd = [self.rclone_exe, "backend", "features", f"{self.remote}:"]
+        hash_type = None
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', timeout=60)
+            if result.returncode == 0:
+                hashes = [h for h in json.loads(result.stdout or "{}").get("Hashes") or [] if h != "none"]
+                hash_type = hashes[0] if hashes else None
+        except Exception as e:
+            logger.debug(f"backend features falló: {e}")
+            return None  # No se cachea: se reintenta en la próxima consulta
+        self._hash_type, self._hash_type_known = hash_type, True
+        return hash_type
+
+    def local_hash(self, local_path: Path, hash_type: str) -> Optional[str]:
+        """NUEVO: Calcula localmente el hash del proveedor ('rclone hashsum <tipo> <archivo>')."""
+        cmd = [self.rclone_exe, "hashsum", hash_type, str(local_path)]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', timeout=3600)
+            if result.returncode != 0 or not result.stdout.strip():
+                return None
+            return result.stdout.split()[0].lower()
+        except Exception as e:
+            logger.debug(f"hashsum falló para {local_path}: {e}")
+            return None
+
+    def list_remote_hashes(self, remote_dir: str, hash_type: str = None) -> Optional[Dict[str, Dict]]:
+        """
+        NUEVO: Lista en UNA llamada los archivos de 'remote_dir' con tamaño y hash del proveedor.
+        Retorna {nombre: {'size', 'hash'}} ({} si la carpeta no existe) o None si falló.
+        """
+        cmd = [self.rclone_exe, "lsjson", "--files-only", self._build_remote_path(remote_dir)]
+        if hash_type:
+            cmd[2:2] = ["--hash", "--hash-type", hash_type]
+        self.governor.wait()
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', timeout=600)
+        except Exception as e:
+            logger.error(f"❌ Excepción listando {remote_dir}: {e}")
+            return None
+        if result.returncode != 0:
+            if "directory not found" in result.stderr.lower():
+                return {}
+            retry_after = self.governor.detect(result.stderr)
+            if retry_after is not None:
+                self.governor.report_throttle(retry_after)
+            logger.error(f"❌ Error listando {remote_dir}: {result.stderr.strip()}")
+            return None
+        listing = {}
+        for item in json.loads(result.stdout or "[]"):
+            hashes = item.get("Hashes") or {}
+            listing[item["Name"]] = {
+                'size': int(item.get("Size", -1)),
+                'hash': (hashes.get(hash_type) or "").lower() if hash_type else ""
+            }
+        return listing
+
+    def list_remote_tree(self, remote_dir: str = "", hash_type: str = None, max_age: str = None) -> Optional[List[Dict]]:
+        """
+        NUEVO: Listado recursivo de archivos ('lsjson -R --fast-list') bajo 'remote_dir'.
+        'max_age' (ej: "90m") limita a objetos modificados recientemente (refresco incremental).
+        Retorna [{'path', 'size', 'modtime', 'hash'}] con rutas relativas a la carpeta base, o None si falló.
+        """
+        cmd = [self.rclone_exe, "lsjson", "-R", "--files-only", "--fast-list", "--no-mimetype"]
+        if hash_type:
+            cmd += ["--hash", "--hash-type", hash_type]
+        if max_age:
+            cmd += ["--max-age", max_age]
+        cmd.append(self._build_remote_path(remote_dir))
+        self.governor.wait()
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', timeout=3600)
+        except Exception as e:
+            logger.error(f"❌ Excepción en listado recursivo: {e}")
+            return None
+        if result.returncode != 0:
+            retry_after = self.governor.detect(result.stderr)
+            if retry_after is not None:
+                self.governor.report_throttle(retry_after)
+            logger.error(f"❌ Error en listado recursivo: {result.stderr.strip()}")
+            return None
+
+        prefix = f"{remote_dir.strip('/')}/" if remote_dir.strip('/') else ""
+        entries = []
+        for item in json.loads(result.stdout or "[]"):
+            hashes = item.get("Hashes") or {}
+            entries.append({
+                'path': prefix + item["Path"],
+                'size': int(item.get("Size", -1)),
+                'modtime': item.get("ModTime", ""),
+                'hash': (hashes.get(hash_type) or "").lower() if hash_type else ""
+            })
+        return entries
+
+    # --- TRANSFERENCIAS EN LOTE (--files-from) ---
+
+    def upload_batch(self, local_dir: Path, filenames: List[str], remote_dir: str) -> Dict[str, bool]:
+        """
+        NUEVO: Sube muchos archivos de 'local_dir' a 'remote_dir' en UNA invocación 'rclone copy'.
+        Aprovecha --transfers/--checkers de rclone. Retorna {nombre: éxito} por archivo,
+        para que cada fila del índice pueda confirmarse o revertirse de forma atómica.
+        """
+        if not filenames:
+            return {}
+        local_dir = Path(local_dir)
+        list_path = self._write_files_from(filenames)
+        full_dest = self._build_remote_path(remote_dir)
+
+        try:
+            returncode, output = self._run_rclone_capture([
+                "copy", str(local_dir), full_dest,
+                "--files-from", str(list_path),
+                "--transfers", UPLOAD_BATCH_TRANSFERS,
+                "--checkers", DL_CHECKERS,
+                "--onedrive-chunk-size", "200M",
+                "--use-json-log",
+                "-v"
+            ], kind="upload")
+        finally:
+            list_path.unlink(missing_ok=True)
+
+        per_file = self._parse_batch_log(output)
+        results = {}
+        for name in filenames:
+            if name in per_file:
+                results[name] = per_file[name]
+            else:
+                # Sin evento propio: ya existía idéntico en destino (OK) solo si rclone terminó bien
+                results[name] = returncode == 0
+        ok_count = sum(results.values())
+        logger.info(f"📦 Lote de subida: {ok_count}/{len(filenames)} archivos OK en '{remote_dir}'.")
+        return results
+
+    def download_batch(self, remote_paths: List[str], local_dir: Path) -> Dict[str, Optional[Path]]:
+        """
+        NUEVO: Descarga muchos objetos en UNA invocación 'rclone copy --files-from'.
+        'remote_paths' son relativos a la ruta base (ej: 'DOC/abc123.7z') y se replican
+        bajo 'local_dir'. Retorna {ruta_remota: Path local, o None si falló}.
+        """
+        if not remote_paths:
+            return {}
+        local_dir = Path(local_dir)
+        local_dir.mkdir(parents=True, exist_ok=True)
+        entries = [p.replace("\\", "/").strip("/") for p in remote_paths]
+        list_path = self._write_files_from(entries)
+
+        try:
+            returncode, output = self._run_rclone_capture([
+                "copy", self._build_remote_path(""), str(local_dir),
+                "--files-from", str(list_path),
+                "--use-json-log",
+                "-v"
+            ] + self._get_download_flags(), kind="download")
+        finally:
+            list_path.unlink(missing_ok=True)
+
+        per_file = self._parse_batch_log(output)
+        results = {}
+        for original, entry in zip(remote_paths, entries):
+            local_file = local_dir / entry
+            ok = per_file.get(entry, returncode == 0) and local_file.is_file()
+            results[original] = local_file if ok else None
+        ok_count = sum(1 for v in results.values() if v)
+        logger.info(f"📦 Lote de descarga: {ok_count}/{len(remote_paths)} archivos OK.")
+        return results
+
+    def delete_remote_files(self, remote_paths: List[str]) -> bool:
+        """
+        NUEVO: Borra objetos puntuales (rutas relativas a la base) en UNA invocación
+        'rclone delete --files-from'. Los que ya no existen no cuentan como error.
+        """
+        if not remote_paths:
+            return True
+        list_path = self._write_files_from([p.replace("\\", "/").strip("/") for p in remote_paths])
+        try:
+            return self._run_rclone([
+                "delete", self._build_remote_path(""), "--files-from", str(list_path)
+            ], timeout=600)
+        finally:
+            list_path.unlink(missing_ok=True)
 
     def sync_up(self, local_dir: Path, remote_dir: str) -> bool:
         """Sincroniza una carpeta local hacia la nube (Unidireccional)."""
         # MEJORA: Usar constructor de ruta inteligente
         full_dest = self._build_remote_path(remote_dir)
         
-        return self._run_rclone([
+        return self._run_rclone_scheduled([
             "sync",
             str(local_dir),
             full_dest,
             "--progress",
             "--create-empty-src-dirs"
-        ], show_progress=True)
\ No newline at end of file
+        ], kind="sync", show_progress=True)
\ No newline at end of file
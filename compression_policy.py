@@ -0,0 +1,179 @@
+# compression_policy.py
+import json
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from config import (
+    logger, INDEX_DIR,
+    COMPRESSION_MODE, COMPRESSION_STORE_PREFIXES, COMPRESSION_LEVEL,
+    COMPRESSION_SAMPLE_FILES, COMPRESSION_SAMPLE_BLOCKS, COMPRESSION_SPEED_MBPS,
+    COMPRESSION_UPLINK_MBPS, COMPRESSION_MIN_GAIN
+)
+
+STATS_PATH = INDEX_DIR / "compression_stats.json"
+SAMPLE_BLOCK_BYTES = 64 * 1024
+EWMA_ALPHA = 0.3  # Peso de la última medición en las velocidades estimadas
+
+# Formatos ya comprimidos: no vale la pena leerlos para saber que no comprimen
+INCOMPRESSIBLE_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.avif',
+    '.mp4', '.mkv', '.avi', '.mov', '.webm', '.m4v', '.wmv',
+    '.mp3', '.aac', '.flac', '.ogg', '.opus', '.m4a',
+    '.zip', '.7z', '.rar', '.gz', '.bz2', '.xz', '.zst', '.cab',
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.epub', '.jar', '.apk',
+}
+
+
+def sample_ratio(path: Path, blocks: int = None) -> float:
+    """Ratio estimado (comprimido/original) de un archivo comprimiendo con zlib unos bloques repartidos."""
+    if path.suffix.lower() in INCOMPRESSIBLE_EXTENSIONS:
+        return 1.0
+    blocks = max(1, blocks or COMPRESSION_SAMPLE_BLOCKS)
+    try:
+        size = path.stat().st_size
+        if size == 0:
+            return 1.0
+        span = max(0, size - SAMPLE_BLOCK_BYTES)
+        offsets = sorted({span * i // max(1, blocks - 1) for i in range(blocks)})
+        raw_total, packed_total = 0, 0
+        with open(path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                chunk = f.read(SAMPLE_BLOCK_BYTES)
+                if not chunk:
+                    continue
+                raw_total += len(chunk)
+                packed_total += len(zlib.compress(chunk, 1))
+        return min(1.0, packed_total / raw_total) if raw_total else 1.0
+    except OSError:
+        return 1.0
+
+
+class CompressionPolicy:
+    """
+    POLÍTICA DE COMPRESIÓN ADAPTATIVA
+    Decide por carpeta entre Store (-mx=0) y compresión rápida multihilo (-mx=N -mmt)
+    minimizando el tiempo total (compresión + subida):
+    - Prefijos de COMPRESSION_STORE_PREFIXES (VID/IMG/GAM...) van siempre en Store.
+    - El resto se muestrea: los archivos más grandes, unos bloques de cada uno, comprimidos con zlib.
+    - Las velocidades de compresión y de subida se refinan con cada ejecución real
+      y los resultados por prefijo se guardan en data/index/compression_stats.json.
+    """
+
+    def __init__(self, bandwidth=None):
+        self.bandwidth = bandwidth  # BandwidthScheduler (opcional): respeta el límite horario vigente
+        self._lock = threading.Lock()
+        self.stats = self._load()
+
+    # --- ESTADÍSTICAS PERSISTENTES ---
+
+    @staticmethod
+    def _load() -> Dict:
+        try:
+            return json.loads(STATS_PATH.read_text(encoding='utf-8'))
+        except Exception:
+            return {'speeds': {}, 'prefixes': {}}
+
+    def _save(self):
+        try:
+            STATS_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp = STATS_PATH.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.stats, indent=2), encoding='utf-8')
+            os.replace(tmp, STATS_PATH)
+        except OSError as e:
+            logger.debug(f"No se pudieron guardar estadísticas de compresión: {e}")
+
+    def _ewma(self, key: str, value: float):
+        speeds = self.stats.setdefault('speeds', {})
+        old = speeds.get(key)
+        speeds[key] = value if old is None else old + EWMA_ALPHA * (value - old)
+
+    def uplink_mbps(self) -> float:
+        measured = self.stats.get('speeds', {}).get('upload_mbps') or COMPRESSION_UPLINK_MBPS
+        limit = self.bandwidth.current_limit_mb() if self.bandwidth else None
+        return min(measured, limit) if limit else measured
+
+    def compress_mbps(self) -> float:
+        return self.stats.get('speeds', {}).get('compress_mbps') or COMPRESSION_SPEED_MBPS
+
+    # --- DECISIÓN ---
+
+    @staticmethod
+    def _largest_files(folder: Path, limit: int) -> Tuple[List[Tuple[int, Path]], int]:
+        """(los 'limit' archivos más grandes, bytes totales) de la carpeta."""
+        files, total = [], 0
+        for root, _dirs, names in os.walk(folder):
+            for name in names:
+                path = Path(root) / name
+                try:
+                    size = path.stat().st_size
+                except OSError:
+                    continue
+                total += size
+                files.append((size, path))
+        files.sort(key=lambda x: x[0], reverse=True)
+        return files[:limit], total
+
+    def estimate_ratio(self, folder: Path) -> float:
+        """Ratio estimado ponderado por bytes (lo no muestreado se asume como el promedio de la muestra)."""
+        sample, total = self._largest_files(Path(folder), max(1, COMPRESSION_SAMPLE_FILES))
+        sampled_bytes = sum(size for size, _ in sample)
+        if not sampled_bytes:
+            return 1.0
+        weighted = sum(size * sample_ratio(path) for size, path in sample)
+        return weighted / sampled_bytes
+
+    def decide(self, folder: Path, prefix: str, size_mb: float) -> Dict:
+        """Retorna {'level', 'ratio_est', 'reason'}. level 0 = Store."""
+        mode = (COMPRESSION_MODE or "auto").lower()
+        if mode == "store":
+            return {'level': 0, 'ratio_est': 1.0, 'reason': "modo store"}
+        if mode == "auto" and prefix.upper() in COMPRESSION_STORE_PREFIXES:
+            return {'level': 0, 'ratio_est': 1.0, 'reason': f"prefijo {prefix} (contenido ya comprimido)"}
+        if mode == "compress":
+            return {'level': COMPRESSION_LEVEL, 'ratio_est': None, 'reason': "modo compress"}
+
+        ratio = self.estimate_ratio(folder)
+        uplink, cspeed = self.uplink_mbps(), self.compress_mbps()
+        t_store = size_mb / uplink
+        t_compress = size_mb / cspeed + size_mb * ratio / uplink
+        reason = (f"ratio≈{ratio:.2f}, subida {uplink:.1f} MB/s, compresión {cspeed:.0f} MB/s: "
+                  f"{t_compress:.1f}s vs {t_store:.1f}s en Store")
+        level = COMPRESSION_LEVEL if t_compress < t_store * (1 - COMPRESSION_MIN_GAIN) else 0
+        return {'level': level, 'ratio_est': round(ratio, 3), 'reason': reason}
+
+    # --- RESULTADOS ---
+
+    def record(self, prefix: str, decision: Dict, source_mb: float, archive_mb: float, seconds: float) -> float:
+        """Registra el resultado real de una carpeta y retorna el ratio logrado (archivo/original)."""
+        ratio = archive_mb / source_mb if source_mb > 0 else 1.0
+        with self._lock:
+            if decision['level'] > 0 and seconds > 0 and source_mb >= 1:
+                self._ewma('compress_mbps', source_mb / seconds)
+            entry = self.stats.setdefault('prefixes', {}).setdefault(prefix, {
+                'folders': 0, 'compressed': 0, 'source_mb': 0.0, 'archive_mb': 0.0
+            })
+            entry['folders'] += 1
+            entry['compressed'] += 1 if decision['level'] > 0 else 0
+            entry['source_mb'] = round(entry['source_mb'] + source_mb, 2)
+            entry['archive_mb'] = round(entry['archive_mb'] + archive_mb, 2)
+            self._save()
+        return ratio
+
+    def observe_upload(self, size_mb: float, seconds: float):
+        """Velocidad de subida real (incluye reintentos/sondas: es lo que cuesta cada MB enviado)."""
+        if seconds <= 0 or size_mb < 1:
+            return
+        with self._lock:
+            self._ewma('upload_mbps', size_mb / seconds)
+            self._save()
+
+    @staticmethod
+    def label(decision: Dict, ratio: float) -> str:
+        """Valor de la columna 'compresion': 'store' o 'mx1:0.42' (nivel y ratio logrado)."""
+        if decision['level'] == 0:
+            return "store"
+        return f"mx{decision['level']}:{ratio:.2f}"
@@ -10,11 +10,13 @@ from dotenv import load_dotenv
 BASE_DIR = Path(__file__).resolve().parent
 
 # Carpetas de datos
-DATA_DIR = BASE_DIR / "data"
+# NUEVO: GESTOR_DATA_DIR (variable del proceso, no del .env) aísla corridas como los benchmarks
+DATA_DIR = Path(os.environ["GESTOR_DATA_DIR"]) if os.environ.get("GESTOR_DATA_DIR") else BASE_DIR / "data"
 LOGS_DIR = DATA_DIR / "logs"
 TEMP_DIR = DATA_DIR / "temp"
 INDEX_DIR = DATA_DIR / "index"
 BACKUP_DIR = DATA_DIR / "backups"
+KEYS_DIR = DATA_DIR / "keys"        # Copia local de los testigos de clave (cifrados)
 
 # --- 2. CARGA DE VARIABLES DE ENTORNO ---
 load_dotenv()  # Carga el archivo .env si existe
@@ -50,6 +52,39 @@ SMART_T3_LIMIT = float(os.getenv("SMART_T3_LIMIT", 15.0))
 # --- NUEVO: DETECCIÓN DE ESTANCAMIENTO (STALL) ---
 SMART_STALL_MIN_TIME = int(os.getenv("SMART_STALL_MIN_TIME", 120)) # Segundos antes de evaluar stall
 SMART_STALL_LIMIT = float(os.getenv("SMART_STALL_LIMIT", 1.0))      # MB/s promedio mínimo
+# NUEVO: Con una cuota de ancho de banda activa, cada umbral pasa a min(umbral, cuota * margen)
+SMART_CAP_MARGIN = float(os.getenv("SMART_CAP_MARGIN", 0.8))
+
+# --- NUEVO: SONDEO PREVIO DE RUTA (PRE-FLIGHT PROBE) ---
+# Antes de una subida grande se envían objetos pequeños desechables para medir la ruta
+_probe_env = os.getenv("SMART_PROBE_ENABLED", "true").lower()
+SMART_PROBE_ENABLED = _probe_env in ("true", "1", "yes", "on")
+SMART_PROBE_MIN_FILE_MB = float(os.getenv("SMART_PROBE_MIN_FILE_MB", 1024))  # Solo archivos >= a este tamaño
+SMART_PROBE_COUNT = int(os.getenv("SMART_PROBE_COUNT", 3))                  # Sondas en paralelo por ronda
+SMART_PROBE_SIZE_MB = int(os.getenv("SMART_PROBE_SIZE_MB", 16))             # Peso de cada sonda
+SMART_PROBE_MIN_SPEED = float(os.getenv("SMART_PROBE_MIN_SPEED", SMART_T3_LIMIT))  # MB/s mínimo aceptable
+SMART_PROBE_MAX_TTFB = float(os.getenv("SMART_PROBE_MAX_TTFB", 5.0))        # Segundos hasta el primer byte
+SMART_PROBE_MAX_ROUNDS = int(os.getenv("SMART_PROBE_MAX_ROUNDS", 5))        # Rondas antes de rendirse
+
+# Historial de velocidades (compartido por sondas y subidas reales)
+SMART_HISTORY_SIZE = int(os.getenv("SMART_HISTORY_SIZE", 50))
+# NUEVO: Subidas reales recientes (últimos N segundos) a SMART_PROBE_MIN_SPEED o más evitan sondear
+SMART_PROBE_FRESH_SECONDS = float(os.getenv("SMART_PROBE_FRESH_SECONDS", 600))
+
+# --- NUEVO: PLANIFICADOR DE ANCHO DE BANDA (TOKEN BUCKET GLOBAL) ---
+# Ventanas horarias "HH:MM-HH:MM=MB/s" separadas por ';' (usar 'off' para sin límite)
+# Ej: "08:00-19:00=4;19:00-08:00=off" -> 4 MB/s en horario de oficina, libre de noche
+BW_SCHEDULE = os.getenv("BW_SCHEDULE", "")
+BW_DEFAULT_LIMIT = os.getenv("BW_DEFAULT_LIMIT", "off")            # Límite fuera de las ventanas
+BW_BURST_SECONDS = float(os.getenv("BW_BURST_SECONDS", 2.0))       # Capacidad del cubo (segundos de tasa)
+BW_REBALANCE_INTERVAL = int(os.getenv("BW_REBALANCE_INTERVAL", 15)) # Segundos entre reajustes
+BW_RC_BASE_PORT = int(os.getenv("BW_RC_BASE_PORT", 5580))          # Puertos rc (uno por proceso rclone)
+
+# --- NUEVO: GOBERNADOR DE THROTTLING (429/503) ---
+# Backoff exponencial compartido por todos los workers cuando el proveedor limita
+GOV_BASE_DELAY = float(os.getenv("GOV_BASE_DELAY", 2.0))            # Segundos (primer nivel)
+GOV_MAX_DELAY = float(os.getenv("GOV_MAX_DELAY", 300.0))            # Techo del backoff
+GOV_MAX_THROTTLE_RETRIES = int(os.getenv("GOV_MAX_THROTTLE_RETRIES", 10))  # Intentos limitados antes de contar como crítico
 
 # --- NUEVO: CONFIGURACIÓN OPTIMIZADA DE DESCARGA (RCLONE) ---
 # Flags para maximizar ancho de banda
@@ -64,6 +99,87 @@ DL_WRITE_BUFFER_SIZE = os.getenv("DL_WRITE_BUFFER_SIZE", "1Mi")
 _http2_env = os.getenv("DL_DISABLE_HTTP2", "true").lower()
 DL_DISABLE_HTTP2 = _http2_env in ("true", "1", "yes", "on")
 
+# --- NUEVO: PIPELINE DE RESTAURACIÓN (DESCARGA + EXTRACCIÓN EN PARALELO) ---
+RESTORE_DL_WORKERS = int(os.getenv("RESTORE_DL_WORKERS", 3))          # Descargas simultáneas
+RESTORE_EXTRACT_WORKERS = int(os.getenv("RESTORE_EXTRACT_WORKERS", 2)) # Extracciones 7z simultáneas
+RESTORE_QUEUE_SIZE = int(os.getenv("RESTORE_QUEUE_SIZE", 4))          # Archivos descargados en espera de extracción
+RESTORE_STAGING_MAX_MB = float(os.getenv("RESTORE_STAGING_MAX_MB", 20480))  # Tope de disco en data/descargas
+_verify_env = os.getenv("RESTORE_VERIFY_MD5", "true").lower()
+RESTORE_VERIFY_MD5 = _verify_env in ("true", "1", "yes", "on")            # Verificar contra hash_md5 al extraer
+RESTORE_HASH_WORKERS = int(os.getenv("RESTORE_HASH_WORKERS", 4))          # Hilos de MD5 por extracción
+
+# --- NUEVO: CACHÉ LOCAL DE ARCHIVOS CIFRADOS (LRU) ---
+# Los .7z restaurados se conservan cifrados en data/cache para no volver a descargarlos (0 = desactivado)
+BLOB_CACHE_MAX_MB = float(os.getenv("BLOB_CACHE_MAX_MB", 10240))
+
+# --- NUEVO: TRANSFERENCIAS EN LOTE (rclone copy --files-from) ---
+# Archivos pequeños viajan juntos en una sola invocación para aprovechar --transfers/--checkers
+BATCH_MAX_FILE_MB = float(os.getenv("BATCH_MAX_FILE_MB", 256))   # Solo archivos menores a esto van en lote
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 20))          # Archivos por invocación
+UPLOAD_BATCH_TRANSFERS = os.getenv("UPLOAD_BATCH_TRANSFERS", "4") # Paralelismo de subida dentro del lote
+
+# --- NUEVO: ARCHIVOS MULTI-VOLUMEN ---
+# Carpetas mayores a este tamaño se parten en volúmenes .7z.001, .7z.002... (0 = desactivado)
+VOLUME_SIZE_MB = int(os.getenv("VOLUME_SIZE_MB", 4096))
+SMART_PARALLEL_VOLUMES = int(os.getenv("SMART_PARALLEL_VOLUMES", 3))  # Volúmenes subiendo a la vez
+
+# --- NUEVO: POLÍTICA DE COMPRESIÓN ADAPTATIVA ---
+# auto: Store para COMPRESSION_STORE_PREFIXES; el resto se muestrea y se comprime solo si ahorra tiempo total
+COMPRESSION_MODE = os.getenv("COMPRESSION_MODE", "auto")            # auto | store | compress
+COMPRESSION_STORE_PREFIXES = [
+    p.strip().upper() for p in os.getenv("COMPRESSION_STORE_PREFIXES", "VID,IMG,GAM").split(",") if p.strip()
+]
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", 1))          # -mx para carpetas comprimibles (rápido)
+COMPRESSION_THREADS = os.getenv("COMPRESSION_THREADS", "on")       # -mmt (on = todos los núcleos)
+COMPRESSION_SAMPLE_FILES = int(os.getenv("COMPRESSION_SAMPLE_FILES", 8))    # Archivos muestreados (los más grandes)
+COMPRESSION_SAMPLE_BLOCKS = int(os.getenv("COMPRESSION_SAMPLE_BLOCKS", 4))  # Bloques de 64 KB por archivo
+COMPRESSION_SPEED_MBPS = float(os.getenv("COMPRESSION_SPEED_MBPS", 60))     # Estimación inicial (se ajusta al medir)
+COMPRESSION_UPLINK_MBPS = float(os.getenv("COMPRESSION_UPLINK_MBPS", 10))   # Estimación inicial (se ajusta al medir)
+COMPRESSION_MIN_GAIN = float(os.getenv("COMPRESSION_MIN_GAIN", 0.05))       # Ahorro mínimo para comprimir (5%)
+
+# --- NUEVO: VERIFICACIÓN DE INTEGRIDAD REMOTA (SCRUB) ---
+SCRUB_MIN_INTERVAL = float(os.getenv("SCRUB_MIN_INTERVAL", 2))     # Segundos mínimos entre listados lsjson
+SCRUB_SAMPLE_RATE = float(os.getenv("SCRUB_SAMPLE_RATE", 0.01))    # Fracción de archivos OK que se descargan y prueban
+SCRUB_SAMPLE_MAX = int(os.getenv("SCRUB_SAMPLE_MAX", 5))           # Tope de descargas de muestra por pasada
+
+# --- NUEVO: CONCILIACIÓN ÍNDICE <-> NUBE (LISTADO CACHEADO) ---
+RECONCILE_LISTING_TTL = float(os.getenv("RECONCILE_LISTING_TTL", 3600))          # Segundos sin volver a listar
+RECONCILE_FULL_EVERY_HOURS = float(os.getenv("RECONCILE_FULL_EVERY_HOURS", 24))  # Listado completo (detecta borrados)
+
+# --- NUEVO: RECONSTRUCCIÓN DEL ÍNDICE DESDE LA NUBE ---
+REBUILD_WORKERS = int(os.getenv("REBUILD_WORKERS", 8))   # Archivos leídos en paralelo (descargas de rangos + 7z)
+
+# --- NUEVO: OPERACIONES FERNET EN LOTE (AUDITORÍA / RE-CIFRADO) ---
+FERNET_WORKERS = int(os.getenv("FERNET_WORKERS", 0))         # Procesos para lotes grandes (0 = un proceso por núcleo)
+FERNET_CHUNK_SIZE = int(os.getenv("FERNET_CHUNK_SIZE", 5000))  # Tokens por tarea; lotes menores corren en el hilo actual
+
+# --- NUEVO: ROTACIÓN DE CLAVE MAESTRA (SEGUNDO PLANO) ---
+ROTATION_PAUSE_SECONDS = float(os.getenv("ROTATION_PAUSE_SECONDS", 5))     # Pausa entre archivos (deja red libre)
+ROTATION_STAGED_ARCHIVES = int(os.getenv("ROTATION_STAGED_ARCHIVES", 1))   # Archivos en espera entre etapas (acota disco)
+ROTATION_INDEX_EVERY = int(os.getenv("ROTATION_INDEX_EVERY", 20))          # Filas rotadas entre publicaciones del índice
+
+# --- NUEVO: SINCRONIZACIÓN CONDICIONAL DEL ÍNDICE ---
+INDEX_REMOTE_PATH = "index/index_main.7z"   # Índice oficial en la nube
+INDEX_CLOUD_COPY = INDEX_DIR / "index_cloud.7z"               # Última copia cifrada descargada
+INDEX_CLOUD_STATE = INDEX_DIR / "index_cloud_state.json"      # Metadatos remotos de esa copia
+_prefetch_env = os.getenv("INDEX_PREFETCH", "true").lower()
+INDEX_PREFETCH = _prefetch_env in ("true", "1", "yes", "on")  # Revalidar en segundo plano desde el menú
+
+# --- NUEVO: MODO VIGILANCIA (SUBIDA AUTOMÁTICA) ---
+WATCH_BACKEND = os.getenv("WATCH_BACKEND", "auto")                  # auto | inotify | poll
+WATCH_QUIET_SECONDS = float(os.getenv("WATCH_QUIET_SECONDS", 30))   # Sin cambios durante esto -> se sube
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", 60))   # Solo backend 'poll'
+
+# --- NUEVO: ESCÁNER LOCAL PARALELO E INCREMENTAL ---
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", 8))                    # Carpetas PREFIJO recorridas en paralelo
+_scan_inc_env = os.getenv("SCAN_INCREMENTAL", "true").lower()
+SCAN_INCREMENTAL = _scan_inc_env in ("true", "1", "yes", "on")     # Reutilizar listados de carpetas sin cambios
+SCAN_FULL_EVERY_HOURS = float(os.getenv("SCAN_FULL_EVERY_HOURS", 24))  # Escaneo completo forzado cada N horas
+
+# --- NUEVO: CLI HEADLESS (cli.py) ---
+CLI_IMPORT_BUDGET_MS = int(os.getenv("CLI_IMPORT_BUDGET_MS", 300))  # Tope de arranque para comandos rápidos
+KEYRING_SERVICE = os.getenv("KEYRING_SERVICE", "gestor_archivos")   # Servicio en el llavero del sistema
+
 # --- 4. CONSTANTES DE NEGOCIO ---
 # Prefijos permitidos para organizar carpetas
 VALID_PREFIXES = [
@@ -90,6 +206,16 @@ CSV_COLUMNS = [
     'notas'                     # Metadatos extra
 ]
 
+# NUEVO: Columnas opcionales agregadas por versiones posteriores.
+# Un CSV antiguo sin ellas NO se descarta: se completan vacías al cargar.
+CSV_OPTIONAL_COLUMNS = [
+    'volumenes',                # Cantidad de volúmenes .7z.NNN (vacío = archivo único)
+    'manifiesto',               # Manifiesto cifrado en index/manifests (restauración parcial)
+    'compresion',               # 'store' o 'mxN:ratio' (nivel 7z y tamaño final/original)
+    'hash_remoto',              # Huella al subir: 'quickxor:...' (hash del proveedor) o 'size:...' (scrub)
+    'version_clave',            # key_id de la clave maestra del .7z y del token (vacío = clave original)
+]
+
 # --- 5. CONFIGURACIÓN DE LOGGING (AUDITORÍA) ---
 # Crear carpeta de logs si no existe
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
@@ -111,7 +237,7 @@ logger = logging.getLogger("GestorArchivos")
 def init_directories():
     """Crea la estructura de directorios necesaria si no existe."""
     dirs = [
-        DATA_DIR, LOGS_DIR, TEMP_DIR, INDEX_DIR,
+        DATA_DIR, LOGS_DIR, TEMP_DIR, INDEX_DIR, KEYS_DIR,
         BACKUP_DIR / "auto", BACKUP_DIR / "manual",
         DATA_DIR / "descargas", DATA_DIR / "desencriptados"
     ]
@@ -0,0 +1,288 @@
+# folder_watcher.py
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import (
+    logger, VALID_PREFIXES,
+    WATCH_BACKEND, WATCH_QUIET_SECONDS, WATCH_POLL_INTERVAL
+)
+
+# Eventos inotify relevantes (ver <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+              IN_MOVED_TO | IN_CREATE | IN_DELETE)
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def unit_for_path(parent: Path, path: Path) -> Optional[Dict]:
+    """
+    Traduce cualquier ruta bajo 'parent' a su unidad de subida (misma regla que scan_local_folders):
+    - PREFIJO/Categoría/Carpeta/...  -> unidad 'PREFIJO/Categoría/Carpeta'
+    - PREFIJO_Algo/...               -> unidad 'PREFIJO_Algo' (categoría 'General')
+    Retorna {'path', 'prefix', 'category'} o None si la ruta no pertenece a ninguna unidad.
+    """
+    try:
+        parts = Path(path).relative_to(parent).parts
+    except ValueError:
+        return None
+    if not parts:
+        return None
+
+    top = parts[0].upper()
+    if top in VALID_PREFIXES:
+        if len(parts) < 3:
+            return None  # Cambio en el contenedor o la categoría, no en una unidad
+        unit = parent / parts[0] / parts[1] / parts[2]
+        return {'path': unit, 'prefix': top, 'category': parts[1]}
+
+    prefix_found = next((p for p in VALID_PREFIXES if top.startswith(p)), None)
+    if prefix_found and (parent / parts[0]).is_dir():
+        return {'path': parent / parts[0], 'prefix': prefix_found, 'category': 'General'}
+    return None
+
+
+def unit_signature(unit: Path) -> Tuple[int, int, float]:
+    """(archivos, bytes, mtime máximo) de una unidad: si no cambia entre dos chequeos, está quieta."""
+    count, total, newest = 0, 0, 0.0
+    for root, _dirs, files in os.walk(unit):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            count += 1
+            total += st.st_size
+            newest = max(newest, st.st_mtime)
+    return count, total, newest
+
+
+# --- BACKENDS ---
+
+class WatchBackend:
+    """Interfaz: poll() retorna las rutas que cambiaron desde la última llamada."""
+
+    def poll(self, timeout: float) -> List[Path]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class InotifyBackend(WatchBackend):
+    """Linux: watches inotify recursivos vía ctypes (sin dependencias externas)."""
+
+    def __init__(self, parent: Path):
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError("libc no encontrada")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify no disponible")
+        self.fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        self.parent = Path(parent)
+        self._watches: Dict[int, Path] = {}
+        self._buffer = b""
+        self._add_tree(self.parent)
+
+    def _add_watch(self, directory: Path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), WATCH_MASK)
+        if wd < 0:
+            logger.warning(f"⚠️ No se pudo vigilar {directory} (errno {ctypes.get_errno()}). "
+                           "Revise fs.inotify.max_user_watches.")
+            return
+        self._watches[wd] = directory
+
+    def _add_tree(self, root: Path) -> List[Path]:
+        """Vigila 'root' y sus subcarpetas. Retorna lo ya existente (pudo crearse antes del watch)."""
+        found = []
+        self._add_watch(root)
+        for dirpath, dirnames, filenames in os.walk(root):
+            for d in dirnames:
+                self._add_watch(Path(dirpath) / d)
+            found.extend(Path(dirpath) / f for f in filenames)
+        return found
+
+    def poll(self, timeout: float) -> List[Path]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        self._buffer += os.read(self.fd, 64 * 1024)
+
+        changed = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(self._buffer):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(self._buffer, offset)
+            end = offset + EVENT_HEADER.size + length
+            if end > len(self._buffer):
+                break
+            name = self._buffer[offset + EVENT_HEADER.size:end].rstrip(b"\0")
+            offset = end
+
+            if mask & IN_Q_OVERFLOW:
+                # Se perdieron eventos: reportamos la raíz para que el watcher revise todo
+                logger.warning("⚠️ Cola inotify desbordada. Se revisarán todas las unidades.")
+                changed.append(self.parent)
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            base = self._watches.get(wd)
+            if base is None:
+                continue
+            path = base / os.fsdecode(name) if name else base
+            changed.append(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                changed.extend(self._add_tree(path))
+
+        self._buffer = self._buffer[offset:]
+        return changed
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class PollingBackend(WatchBackend):
+    """
+    Respaldo portable (Windows/macOS/shares de red): compara firmas de unidades cada
+    WATCH_POLL_INTERVAL segundos. Más costoso que inotify, pero sin dependencias.
+    """
+
+    def __init__(self, parent: Path, interval: float = None):
+        self.parent = Path(parent)
+        self.interval = interval or WATCH_POLL_INTERVAL
+        self._signatures = self._snapshot()
+        self._next = time.monotonic() + self.interval
+
+    def _units(self) -> List[Path]:
+        units = []
+        for top in self._dirs(self.parent):
+            if top.name.upper() in VALID_PREFIXES:
+                for category in self._dirs(top):
+                    units.extend(self._dirs(category))
+            elif unit_for_path(self.parent, top):
+                units.append(top)
+        return units
+
+    @staticmethod
+    def _dirs(path: Path) -> List[Path]:
+        try:
+            with os.scandir(path) as it:
+                return [Path(e.path) for e in it if e.is_dir(follow_symlinks=False)]
+        except OSError:
+            return []
+
+    def _snapshot(self) -> Dict[Path, Tuple]:
+        return {u: unit_signature(u) for u in self._units()}
+
+    def poll(self, timeout: float) -> List[Path]:
+        wait = self._next - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            if time.monotonic() < self._next:
+                return []
+        self._next = time.monotonic() + self.interval
+
+        current = self._snapshot()
+        changed = [u for u, sig in current.items() if self._signatures.get(u) != sig]
+        self._signatures = current
+        return changed
+
+
+def make_backend(parent: Path) -> WatchBackend:
+    """WATCH_BACKEND: 'auto' (inotify si hay, si no polling), 'inotify' o 'poll'."""
+    choice = (WATCH_BACKEND or "auto").lower()
+    if choice in ("auto", "inotify"):
+        try:
+            backend = InotifyBackend(parent)
+            logger.info("👁️ Vigilancia con inotify.")
+            return backend
+        except (OSError, AttributeError) as e:
+            if choice == "inotify":
+                raise
+            logger.info(f"👁️ inotify no disponible ({e}). Usando sondeo cada {WATCH_POLL_INTERVAL}s.")
+    return PollingBackend(parent)
+
+
+# --- VIGILANTE ---
+
+class FolderWatcher:
+    """
+    MODO VIGILANCIA
+    Detecta unidades PREFIJO/Categoría/Carpeta nuevas o modificadas bajo la carpeta padre y
+    las entrega cuando llevan WATCH_QUIET_SECONDS sin cambios (copia terminada).
+    Nunca reescanea el árbol completo: solo se revisan las unidades que tuvieron eventos.
+    """
+
+    def __init__(self, parent: Path, backend: WatchBackend = None, quiet_seconds: float = None):
+        self.parent = Path(parent)
+        self.backend = backend or make_backend(self.parent)
+        self.quiet_seconds = WATCH_QUIET_SECONDS if quiet_seconds is None else quiet_seconds
+        # ruta -> {'unit', 'last_event', 'signature'}
+        self._pending: Dict[Path, Dict] = {}
+
+    def _mark(self, path: Path, now: float):
+        if path == self.parent:
+            # Desborde de eventos: todas las unidades conocidas vuelven a evaluarse
+            for unit in PollingBackend(self.parent, interval=1)._units():
+                self._mark(unit, now)
+            return
+        unit = unit_for_path(self.parent, path)
+        if not unit:
+            return
+        entry = self._pending.setdefault(unit['path'], {'unit': unit, 'signature': None})
+        entry['last_event'] = now
+
+    def _ready_units(self, now: float) -> List[Dict]:
+        ready = []
+        for path, entry in list(self._pending.items()):
+            if now - entry['last_event'] < self.quiet_seconds:
+                continue
+            if not path.exists():
+                self._pending.pop(path)  # Se borró o renombró antes de asentarse
+                continue
+            signature = unit_signature(path)
+            if signature != entry['signature']:
+                # Cambió desde el último chequeo (ej: copia lenta sin eventos): esperar otra ventana
+                entry['signature'] = signature
+                entry['last_event'] = now
+                continue
+            ready.append(self._pending.pop(path)['unit'])
+        return sorted(ready, key=lambda u: (u['prefix'], u['category']))
+
+    def run(self, on_units: Callable[[List[Dict]], None], stop: threading.Event = None):
+        """Bucle principal: llama on_units(lote) cada vez que hay unidades asentadas."""
+        stop = stop or threading.Event()
+        logger.info(f"👁️ Vigilando {self.parent} (quietud: {self.quiet_seconds:.0f}s).")
+        try:
+            while not stop.is_set():
+                now = time.time()
+                for path in self.backend.poll(timeout=1.0):
+                    self._mark(path, now)
+                ready = self._ready_units(time.time())
+                if ready:
+                    on_units(ready)
+        finally:
+            self.backend.close()
@@ -0,0 +1,71 @@
+# index_codec.py
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, Tuple
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+# Formato: MAGIC(5) + versión(1) + iteraciones(4) + salt(16) + nonce(12) + AES-256-GCM(zlib(csv))
+# El encabezado completo va como datos asociados: alterarlo invalida el tag GCM.
+INDEX_MAGIC = b"GIDX\x00"
+INDEX_VERSION = 1
+HEADER = struct.Struct(">5sBI16s12s")
+KDF_ITERATIONS = 200_000
+SEVEN_ZIP_SIGNATURE = b"7z\xbc\xaf\x27\x1c"
+
+
+class IndexCodec:
+    """
+    FORMATO CIFRADO DEL ÍNDICE (EN MEMORIA)
+    Serializa/deserializa el índice sin 7z ni archivos temporales:
+    zlib + AES-256-GCM con clave PBKDF2-HMAC-SHA256 derivada de la contraseña CSV.
+    Cada archivo lleva su propio salt; las claves derivadas se cachean por salt, así que
+    guardar varias veces en la misma sesión solo paga una derivación.
+    """
+
+    def __init__(self, password: str):
+        self._password = password.encode()
+        self._keys: Dict[Tuple[bytes, int], bytes] = {}
+        self._lock = threading.Lock()
+        self._session_salt = os.urandom(16)
+
+    def _key(self, salt: bytes, iterations: int) -> bytes:
+        with self._lock:
+            key = self._keys.get((salt, iterations))
+            if key is None:
+                kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=iterations)
+                key = self._keys[(salt, iterations)] = kdf.derive(self._password)
+            return key
+
+    @staticmethod
+    def is_encoded(blob: bytes) -> bool:
+        return blob[:len(INDEX_MAGIC)] == INDEX_MAGIC
+
+    @staticmethod
+    def is_legacy_7z(blob: bytes) -> bool:
+        return blob[:len(SEVEN_ZIP_SIGNATURE)] == SEVEN_ZIP_SIGNATURE
+
+    def encode(self, plaintext: bytes) -> bytes:
+        nonce = os.urandom(12)
+        header = HEADER.pack(INDEX_MAGIC, INDEX_VERSION, KDF_ITERATIONS, self._session_salt, nonce)
+        key = self._key(self._session_salt, KDF_ITERATIONS)
+        return header + AESGCM(key).encrypt(nonce, zlib.compress(plaintext, 6), header)
+
+    def decode(self, blob: bytes) -> bytes:
+        """Retorna el contenido en claro. ValueError si el formato no corresponde o la clave/datos no validan."""
+        if len(blob) < HEADER.size or not self.is_encoded(blob):
+            raise ValueError("No es un índice en formato GIDX")
+        _magic, version, iterations, salt, nonce = HEADER.unpack_from(blob)
+        if version != INDEX_VERSION:
+            raise ValueError(f"Versión de índice no soportada: {version}")
+        header = blob[:HEADER.size]
+        try:
+            compressed = AESGCM(self._key(salt, iterations)).decrypt(nonce, blob[HEADER.size:], header)
+        except Exception:
+            # InvalidTag: contraseña CSV incorrecta o archivo alterado/truncado
+            raise ValueError("Contraseña CSV incorrecta o índice dañado")
+        return zlib.decompress(compressed)
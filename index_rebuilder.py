@@ -0,0 +1,225 @@
+# index_rebuilder.py
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from config import (
+    logger, INDEX_DIR, TEMP_DIR, VALID_PREFIXES, CSV_COLUMNS, CSV_OPTIONAL_COLUMNS,
+    REBUILD_WORKERS
+)
+from partial_restore import PartialRestorer, MANIFEST_REMOTE_DIR, MANIFEST_EXT
+from reconciler import RemoteListingCache, ARCHIVE_RE
+from scrubber import fingerprint_from_listing
+from security_manager import SEVEN_ZIP_START_HEADER_SIZE, DECRYPT_ERROR
+
+CHECKPOINT_PATH = INDEX_DIR / "rebuild_checkpoint.jsonl"
+META_NAME = "metadatos.json"
+
+
+class IndexRebuilder:
+    """
+    RECONSTRUCCIÓN DEL ÍNDICE DESDE LA NUBE
+    Para cada .7z remoto (o set de volúmenes) descarga solo lo necesario para leer metadatos.json:
+    los 32 bytes iniciales, el encabezado final y el bloque del JSON (archivos no sólidos), sobre un
+    archivo disperso. Luego desencripta el token del nombre y arma el registro.
+    - Paralelismo acotado (REBUILD_WORKERS): cada trabajador descarga rangos y ejecuta 7z.
+    - Checkpoint en data/index/rebuild_checkpoint.jsonl (una línea por archivo): si se corta,
+      la próxima ejecución retoma sin repetir lo ya leído.
+    """
+
+    def __init__(self, cloud, security):
+        self.cloud = cloud
+        self.security = security
+        self._lock = threading.Lock()
+
+    # --- DESCUBRIMIENTO ---
+
+    @staticmethod
+    def discover(entries: Dict[str, Dict]) -> List[Dict]:
+        """Agrupa el listado remoto en unidades {'key', 'prefix', 'hash', 'parts'} (volúmenes en orden)."""
+        units: Dict[str, Dict] = {}
+        for path, info in entries.items():
+            folder, _, name = path.rpartition("/")
+            if folder.upper() not in VALID_PREFIXES or not ARCHIVE_RE.search(name):
+                continue
+            hash_name = ARCHIVE_RE.sub("", name)
+            key = f"{folder}/{hash_name}"
+            unit = units.setdefault(key, {'key': key, 'prefix': folder, 'hash': hash_name, 'parts': []})
+            unit['parts'].append({'name': name, **info})
+        for unit in units.values():
+            unit['parts'].sort(key=lambda p: p['name'])
+        return sorted(units.values(), key=lambda u: u['key'])
+
+    # --- CHECKPOINT ---
+
+    @staticmethod
+    def _load_checkpoint() -> Dict[str, Dict]:
+        done = {}
+        if not CHECKPOINT_PATH.exists():
+            return done
+        with open(CHECKPOINT_PATH, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Última línea a medio escribir (corte)
+                done[entry['key']] = entry
+        return done
+
+    def _checkpoint(self, entry: Dict):
+        with self._lock:
+            CHECKPOINT_PATH.parent.mkdir(parents=True, exist_ok=True)
+            with open(CHECKPOINT_PATH, "a", encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+                f.flush()
+
+    @staticmethod
+    def clear_checkpoint():
+        CHECKPOINT_PATH.unlink(missing_ok=True)
+
+    # --- LECTURA DE METADATOS ---
+
+    @staticmethod
+    def _is_multivolume(unit: Dict) -> bool:
+        return ARCHIVE_RE.search(unit['parts'][0]['name']).group(1) is not None
+
+    def _fetch_ranges(self, unit: Dict, sparse: Path, ranges: List) -> bool:
+        row = {'ruta_relativa': f"{unit['prefix']}/", 'nombre_encriptado': unit['hash']}
+        # Multi-volumen: todos los volúmenes salvo el último miden lo mismo que el primero
+        manifest = {'volume_size': unit['parts'][0]['size'] if self._is_multivolume(unit) else 0}
+        for start, length in PartialRestorer._merge_ranges(ranges):
+            for remote_path, remote_offset, count, abs_offset in PartialRestorer._segments(row, manifest, start, length):
+                if not self.cloud.download_range(remote_path, remote_offset, count, sparse, abs_offset):
+                    return False
+        return True
+
+    def read_unit(self, unit: Dict) -> Dict:
+        """Lee metadatos.json de una unidad remota. Retorna una entrada de checkpoint."""
+        total = sum(p['size'] for p in unit['parts'])
+        sparse = TEMP_DIR / f"rebuild_{unit['hash']}_{uuid.uuid4().hex[:6]}.7z"
+        sparse.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(sparse, "wb") as f:
+                f.truncate(total)
+
+            # 1. Encabezado de inicio -> ubicación del encabezado final
+            if not self._fetch_ranges(unit, sparse, [(0, SEVEN_ZIP_START_HEADER_SIZE)]):
+                return {'key': unit['key'], 'status': 'error', 'error': 'descarga encabezado'}
+            header_offset, header_size = self.security.read_start_header(sparse)
+            if header_offset + header_size > total:
+                return {'key': unit['key'], 'status': 'error', 'error': 'encabezado fuera de rango'}
+
+            # 2. Encabezado final -> lista de archivos y bloques
+            if not self._fetch_ranges(unit, sparse, [(header_offset, header_size)]):
+                return {'key': unit['key'], 'status': 'error', 'error': 'descarga índice 7z'}
+            listing = self.security.list_archive_blocks(sparse)
+            if listing is None:
+                return {'key': unit['key'], 'status': 'error', 'error': 'listado 7z (¿contraseña?)'}
+
+            files = [e for e in listing if not e['is_dir']]
+            meta_entry = next((e for e in files if Path(e['path']).name == META_NAME), None)
+            size_bytes = sum(e['size'] for e in files if e is not meta_entry)
+            if meta_entry is None or meta_entry['offset'] is None:
+                return {'key': unit['key'], 'status': 'no_meta', 'size_bytes': size_bytes}
+
+            # 3. Solo el bloque de metadatos.json
+            if not self._fetch_ranges(unit, sparse, [(meta_entry['offset'], meta_entry['length'])]):
+                return {'key': unit['key'], 'status': 'error', 'error': 'descarga metadatos'}
+            meta = self.security.recover_metadata_from_7z(sparse)
+            if not meta:
+                return {'key': unit['key'], 'status': 'no_meta', 'size_bytes': size_bytes}
+            return {'key': unit['key'], 'status': 'ok', 'meta': meta, 'size_bytes': size_bytes}
+        except Exception as e:
+            return {'key': unit['key'], 'status': 'error', 'error': str(e)}
+        finally:
+            sparse.unlink(missing_ok=True)
+
+    # --- ARMADO DEL ÍNDICE ---
+
+    def _record(self, unit: Dict, entry: Dict, hash_type: Optional[str], manifests: set) -> Dict:
+        meta = entry.get('meta') or {}
+        token = meta.get('original_name_token')
+        name = self.security.decrypt_text(token) if token else None
+        if name == DECRYPT_ERROR:
+            name = None
+        volumes = len(unit['parts']) if self._is_multivolume(unit) else pd.NA
+        manifest = f"{unit['hash']}{MANIFEST_EXT}"
+        return {
+            'prefijo': unit['prefix'].upper(),
+            'categoria': meta.get('category') or 'General',
+            'nombre_original': name or unit['hash'],
+            'nombre_original_encrypted': token or pd.NA,
+            'nombre_encriptado': unit['hash'],
+            'ruta_relativa': f"{unit['prefix']}/",
+            'carpeta_hija': f"{unit['hash']}.7z",
+            'tamaño_mb': round(entry.get('size_bytes', 0) / (1024 * 1024), 2),
+            'hash_md5': meta.get('md5', pd.NA),
+            'fecha_procesado': meta.get('processed_date', pd.NA),
+            'notas': "Reconstruido" if name else "Reconstruido (sin metadatos legibles)",
+            'volumenes': volumes,
+            'manifiesto': manifest if manifest in manifests else pd.NA,
+            'compresion': pd.NA,
+            'hash_remoto': fingerprint_from_listing(unit['parts'], hash_type),
+            # Encabezado cifrado (-mhe): si se pudo listar, está cifrado con la clave de esta sesión
+            'version_clave': self.security.key_id,
+        }
+
+    @staticmethod
+    def _assign_ids(df: pd.DataFrame) -> pd.DataFrame:
+        """IDs globales y por prefijo en orden de fecha de proceso (las filas sin fecha al final)."""
+        dates = pd.to_datetime(df['fecha_procesado'], format="%d-%m-%Y %H:%M:%S", errors='coerce')
+        df = df.assign(_fecha=dates).sort_values(['_fecha', 'nombre_encriptado'], na_position='last')
+        df = df.drop(columns='_fecha').reset_index(drop=True)
+        df.insert(0, 'id_global', range(1, len(df) + 1))
+        df.insert(1, 'id_prefix', df.groupby('prefijo').cumcount() + 1)
+        return df
+
+    def rebuild(self, fresh: bool = False, progress: Callable[[int, int], None] = None) -> Optional[pd.DataFrame]:
+        """
+        Reconstruye el índice completo. 'fresh=True' descarta el checkpoint anterior.
+        Retorna el DataFrame (columnas CSV_COLUMNS + opcionales) o None si no se pudo listar la nube.
+        """
+        if fresh:
+            self.clear_checkpoint()
+        cache = RemoteListingCache(self.cloud)
+        if not cache.refresh(force_full=True):
+            return None
+
+        units = self.discover(cache.entries)
+        manifests = {p.rsplit("/", 1)[-1] for p in cache.entries if p.startswith(f"{MANIFEST_REMOTE_DIR}/")}
+        done = self._load_checkpoint()
+        pending = [u for u in units if u['key'] not in done or done[u['key']]['status'] == 'error']
+        logger.info(f"🧱 {len(units)} archivos en la nube: {len(units) - len(pending)} ya leídos, {len(pending)} pendientes.")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, REBUILD_WORKERS), thread_name_prefix="rebuild") as pool:
+            futures = [pool.submit(self.read_unit, u) for u in pending]
+            for n, future in enumerate(as_completed(futures), 1):
+                entry = future.result()
+                self._checkpoint(entry)
+                done[entry['key']] = entry
+                if progress:
+                    progress(n, len(pending))
+        if pending:
+            logger.info(f"⏱️ Metadatos leídos en {time.perf_counter() - start:.1f}s.")
+
+        records, failed = [], 0
+        for unit in units:
+            entry = done.get(unit['key'], {'status': 'error'})
+            if entry['status'] == 'error':
+                failed += 1
+                continue
+            records.append(self._record(unit, entry, cache.hash_type, manifests))
+        if failed:
+            logger.warning(f"⚠️ {failed} archivos no se pudieron leer. Vuelva a ejecutar para reintentarlos.")
+
+        if not records:
+            return pd.DataFrame(columns=CSV_COLUMNS + CSV_OPTIONAL_COLUMNS)
+        df = self._assign_ids(pd.DataFrame(records))
+        return df.reindex(columns=CSV_COLUMNS + CSV_OPTIONAL_COLUMNS)
@@ -0,0 +1,141 @@
+# index_sync.py
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+import pandas as pd
+
+from config import (
+    logger, INDEX_DIR, INDEX_REMOTE_PATH, INDEX_PREFETCH,
+    INDEX_CLOUD_COPY as CLOUD_COPY_PATH, INDEX_CLOUD_STATE as CLOUD_STATE_PATH
+)
+
+
+class IndexSync:
+    """
+    SINCRONIZACIÓN CONDICIONAL DEL ÍNDICE
+    Evita descargar/desencriptar/parsear el índice de la nube cuando no cambió:
+    - Compara tamaño, modtime y hash remotos (lsjson) contra la última descarga.
+    - Sin cambios: reutiliza el DataFrame en memoria (o la copia cifrada en disco tras reiniciar).
+    - prefetch() revalida en segundo plano mientras el usuario navega los menús.
+    """
+
+    def __init__(self, cloud, security, inventory):
+        self.cloud = cloud
+        self.security = security
+        self.inventory = inventory
+        self._lock = threading.Lock()
+        self._df: Optional[pd.DataFrame] = None
+        self._meta: Optional[Dict] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-prefetch")
+        self._prefetch: Optional[Future] = None
+
+    # --- ESTADO PERSISTENTE ---
+
+    @staticmethod
+    def _load_state() -> Optional[Dict]:
+        try:
+            return json.loads(CLOUD_STATE_PATH.read_text(encoding='utf-8'))
+        except Exception:
+            return None
+
+    @staticmethod
+    def _save_state(meta: Dict, records: int):
+        """Guarda los metadatos remotos y la cantidad de registros (la CLI la usa sin desencriptar)."""
+        INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = CLOUD_STATE_PATH.with_suffix(".tmp")
+        tmp.write_text(json.dumps({**meta, 'records': records}), encoding='utf-8')
+        os.replace(tmp, CLOUD_STATE_PATH)
+
+    @staticmethod
+    def _same(a: Optional[Dict], b: Optional[Dict]) -> bool:
+        if not a or not b:
+            return False
+        return a['size'] == b['size'] and a['modtime'] == b['modtime'] and a.get('hash') == b.get('hash')
+
+    # --- DESCARGA CONDICIONAL ---
+
+    def fetch(self, force: bool = False) -> Optional[pd.DataFrame]:
+        """
+        Retorna el índice de la nube como DataFrame (copia), descargándolo solo si cambió.
+        None si no existe índice remoto o no se pudo obtener.
+        """
+        with self._lock:
+            meta = self.cloud.stat_remote(INDEX_REMOTE_PATH)
+            if meta is None:
+                return None
+
+            # 1. Caliente: mismo objeto remoto que el ya cargado en memoria
+            if not force and self._df is not None and self._same(meta, self._meta):
+                logger.info("⚡ Índice de la nube sin cambios (caché en memoria).")
+                return self._df.copy()
+
+            # 2. Tibio: la copia cifrada en disco corresponde al objeto remoto actual
+            df = None
+            if not force and CLOUD_COPY_PATH.exists() and self._same(meta, self._load_state()):
+                df = self.inventory.read_encrypted(self.security, CLOUD_COPY_PATH)
+                if df is not None:
+                    logger.info("⚡ Índice de la nube sin cambios (copia local).")
+
+            # 3. Frío: descargar
+            if df is None:
+                if not self.cloud.download_file(INDEX_REMOTE_PATH, CLOUD_COPY_PATH, silent=True):
+                    return None
+                df = self.inventory.read_encrypted(self.security, CLOUD_COPY_PATH)
+                if df is None:
+                    return None
+                self._save_state(meta, len(df))
+
+            self._df, self._meta = df, meta
+            return df.copy()
+
+    # --- PREFETCH EN SEGUNDO PLANO ---
+
+    def prefetch(self):
+        """Lanza una revalidación en segundo plano (no bloquea). Ignora si ya hay una en curso."""
+        if not INDEX_PREFETCH:
+            return
+        if self._prefetch and not self._prefetch.done():
+            return
+        self._prefetch = self._executor.submit(self._safe_fetch)
+
+    def _safe_fetch(self) -> Optional[pd.DataFrame]:
+        try:
+            return self.fetch()
+        except Exception as e:
+            logger.debug(f"Prefetch del índice falló: {e}")
+            return None
+
+    def get(self) -> Optional[pd.DataFrame]:
+        """Índice de la nube: reutiliza el prefetch en curso/terminado si lo hay."""
+        pending = self._prefetch
+        self._prefetch = None
+        if pending is not None:
+            df = pending.result()
+            if df is not None:
+                return df
+        return self.fetch()
+
+    # --- TRAS SUBIR EL ÍNDICE ---
+
+    def note_uploaded(self, encrypted_path: Path, df: pd.DataFrame):
+        """
+        Acabamos de subir 'encrypted_path' (contenido = df): lo dejamos como caché vigente
+        para que la próxima apertura del explorador no lo vuelva a descargar.
+        """
+        meta = self.cloud.stat_remote(INDEX_REMOTE_PATH)
+        if meta is None:
+            return
+        with self._lock:
+            INDEX_DIR.mkdir(parents=True, exist_ok=True)
+            if Path(encrypted_path).resolve() != CLOUD_COPY_PATH.resolve():
+                shutil.copy2(encrypted_path, CLOUD_COPY_PATH)
+            self._save_state(meta, len(df))
+            self._df, self._meta = df.copy(), meta
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -1,13 +1,17 @@
 # inventory_manager.py
+import io
+import os
 import pandas as pd
 import shutil
-import time
+import threading
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional
 
+from index_codec import IndexCodec
+
 # Configuración
-from config import logger, CSV_COLUMNS, INDEX_DIR, BACKUP_DIR, TEMP_DIR
+from config import logger, CSV_COLUMNS, CSV_OPTIONAL_COLUMNS, INDEX_DIR, BACKUP_DIR, TEMP_DIR
 
 class InventoryManager:
     """
@@ -19,6 +23,9 @@ class InventoryManager:
     def __init__(self, csv_password: str):
         self.csv_path = INDEX_DIR / "index_main.csv"
         self.csv_password = csv_password  # Clave específica para el CSV
+        self.codec = IndexCodec(csv_password)  # NUEVO: Cifrado del índice en memoria (AES-GCM)
+        # NUEVO: Procesos en segundo plano (rotación de clave) modifican filas mientras se sube
+        self.lock = threading.RLock()
         self.df = self._load_or_create_db()
 
     def _load_or_create_db(self) -> pd.DataFrame:
@@ -32,7 +39,7 @@ class InventoryManager:
                 if missing:
                     logger.warning(f"⚠️ CSV antiguo. Faltan columnas: {missing}. Se recrearán.")
                     return self._create_empty_db()
-                return df
+                return self._ensure_optional_columns(df)
             except Exception as e:
                 logger.error(f"Error leyendo CSV: {e}. Creando uno nuevo.")
                 return self._create_empty_db()
@@ -40,7 +47,14 @@ class InventoryManager:
             return self._create_empty_db()
 
     def _create_empty_db(self) -> pd.DataFrame:
-        return pd.DataFrame(columns=CSV_COLUMNS)
+        return pd.DataFrame(columns=CSV_COLUMNS + CSV_OPTIONAL_COLUMNS)
+
+    def _ensure_optional_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Completa columnas opcionales ausentes (índices creados por versiones anteriores)."""
+        for col in CSV_OPTIONAL_COLUMNS:
+            if col not in df.columns:
+                df[col] = pd.NA
+        return df
 
     # --- GESTIÓN DE REGISTROS ---
 
@@ -67,10 +81,24 @@ class InventoryManager:
         # Eliminamos columnas totalmente vacías/NA antes de concatenar
         new_row = new_row.dropna(how='all', axis=1)
         
-        if self.df.empty:
-            self.df = new_row
-        else:
-            self.df = pd.concat([self.df, new_row], ignore_index=True)
+        with self.lock:
+            if self.df.empty:
+                self.df = new_row
+            else:
+                self.df = pd.concat([self.df, new_row], ignore_index=True)
+
+    def update_record(self, prefijo: str, nombre_encriptado: str, changes: Dict) -> bool:
+        """NUEVO: Modifica en memoria la fila (prefijo, nombre_encriptado). Retorna False si no existe."""
+        with self.lock:
+            mask = (self.df['prefijo'] == prefijo) & (self.df['nombre_encriptado'] == nombre_encriptado)
+            if not mask.any():
+                return False
+            for column, value in changes.items():
+                if column not in self.df.columns:
+                    self.df[column] = pd.NA
+                self.df[column] = self.df[column].astype(object)
+                self.df.loc[mask, column] = value
+            return True
 
     def get_next_ids(self, prefix: str) -> tuple[int, int]:
         """
@@ -166,123 +194,121 @@ class InventoryManager:
     def save_local(self):
         """Guarda el DataFrame a CSV plano localmente."""
         # MEJORA: utf-8-sig para Excel
-        self.df.to_csv(self.csv_path, index=False, encoding='utf-8-sig')
+        with self.lock:
+            self.df.to_csv(self.csv_path, index=False, encoding='utf-8-sig')
         logger.info(f"💾 Índice guardado localmente: {len(self.df)} registros.")
 
     def save_encrypted_backup(self, security_manager, prefix="AUTO"):
         """
-        Crea un backup encriptado del CSV usando SecurityManager.
-        IMPORTANTE: Usa self.csv_password para encriptar este archivo.
+        Crea un backup encriptado del índice (clave CSV) y actualiza index_main.7z.
+        MEJORA: Se serializa y cifra en memoria (IndexCodec: zlib + AES-256-GCM), sin lanzar 7z
+        ni pasar por archivos temporales. El nombre index_main.7z se mantiene por compatibilidad
+        con la ruta remota; el contenido se reconoce por su encabezado.
         """
-        # 1. Asegurar que está guardado en plano primero
+        # 1. Copia de trabajo local (CSV plano, como siempre)
         self.save_local()
 
         # 2. Definir rutas
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"index_backup_{prefix}_{timestamp}.7z"
+        backup_name = f"index_backup_{prefix}_{timestamp}.idx"
         backup_path = BACKUP_DIR / "auto" / backup_name
-        
         main_encrypted_path = INDEX_DIR / "index_main.7z"
 
-        # 3. Crear Metadatos del Backup
-        metadata = {
-            "timestamp": timestamp,
-            "total_records": len(self.df),
-            "type": "CSV_INDEX_BACKUP"
-        }
-
-        # 4. Comprimir y Encriptar (Usando SecurityManager + Password CSV)
-        success = security_manager.compress_encrypt_7z(
-            source_path=self.csv_path,
-            dest_path=backup_path,
-            metadata=metadata,
-            password=self.csv_password # <--- Usa la clave CSV aquí
-        )
-
-        if success:
-            # 5. Copiar el backup recién creado a index_main.7z (el archivo oficial para la nube)
-            shutil.copy2(backup_path, main_encrypted_path)
-            logger.info(f"🔐 Backup encriptado (Clave CSV) creado: {backup_name}")
-            return main_encrypted_path
-        else:
-            logger.error("❌ Fallo al encriptar el índice CSV.")
+        # 3. Cifrar desde memoria y escribir ambos archivos (reemplazo atómico del oficial)
+        try:
+            with self.lock:
+                blob = self.codec.encode(self._serialize(self.df))
+                backup_path.parent.mkdir(parents=True, exist_ok=True)
+                backup_path.write_bytes(blob)
+                tmp = main_encrypted_path.with_suffix(".tmp")
+                tmp.write_bytes(blob)
+                os.replace(tmp, main_encrypted_path)
+        except Exception as e:
+            logger.error(f"❌ Fallo al encriptar el índice CSV: {e}")
             return None
 
+        logger.info(f"🔐 Backup encriptado (Clave CSV) creado: {backup_name}")
+        return main_encrypted_path
+
+    @staticmethod
+    def _serialize(df: pd.DataFrame) -> bytes:
+        return df.to_csv(index=False).encode('utf-8')
+
+    def _deserialize(self, raw: bytes) -> pd.DataFrame:
+        return self._ensure_optional_columns(pd.read_csv(io.BytesIO(raw), encoding='utf-8-sig'))
+
     def load_from_encrypted(self, security_manager, archive_path: Path, temp_only: bool = False) -> bool:
         """
-        Restaura el CSV desde un .7z encriptado.
-        Usa la clave CSV para desencriptar.
+        Restaura el índice desde un archivo encriptado (clave CSV).
         MEJORA: 'temp_only=True' carga en memoria sin bloquear el archivo local.
         """
+        loaded_df = self.read_encrypted(security_manager, archive_path)
+        if loaded_df is None:
+            return False
+
+        self.df = loaded_df
+        if temp_only:
+            logger.info("✅ Índice cargado en memoria (Modo Solo Lectura).")
+        else:
+            # Modo restauración: Sobreescribimos la copia de trabajo local
+            self.save_local()
+            logger.info("✅ Índice restaurado en disco local.")
+        return True
+
+    def read_encrypted(self, security_manager, archive_path: Path) -> Optional[pd.DataFrame]:
+        """
+        NUEVO: Desencripta un índice (clave CSV) y lo retorna como DataFrame,
+        sin tocar el índice local ni el de memoria. None si falla.
+        Formato GIDX: en memoria. Índices .7z antiguos: se leen con 7z (lector de compatibilidad).
+        """
+        try:
+            blob = Path(archive_path).read_bytes()
+            if self.codec.is_encoded(blob):
+                return self._deserialize(self.codec.decode(blob))
+            if self.codec.is_legacy_7z(blob):
+                return self._read_legacy_7z(security_manager, archive_path)
+            logger.error(f"Formato de índice desconocido: {Path(archive_path).name}")
+            return None
+        except Exception as e:
+            logger.error(f"Error leyendo índice encriptado: {e}")
+            return None
+
+    def _read_legacy_7z(self, security_manager, archive_path: Path) -> Optional[pd.DataFrame]:
+        """Índices creados antes del formato GIDX (CSV dentro de un .7z con la clave CSV)."""
         import uuid
-        # Carpeta única para evitar colisiones
-        temp_extract = TEMP_DIR / f"csv_restore_{uuid.uuid4().hex[:6]}"
+        temp_extract = TEMP_DIR / f"csv_read_{uuid.uuid4().hex[:6]}"
         temp_extract.mkdir(parents=True, exist_ok=True)
+        try:
+            if security_manager.decrypt_extract_7z(archive_path, temp_extract, password=self.csv_password):
+                restored_csv = temp_extract / "index_main.csv"
+                if restored_csv.exists():
+                    logger.info("📦 Índice en formato 7z antiguo: se convertirá al próximo guardado.")
+                    return self._ensure_optional_columns(pd.read_csv(restored_csv, encoding='utf-8-sig'))
+            return None
+        finally:
+            shutil.rmtree(temp_extract, ignore_errors=True)
 
-        # Usamos clave CSV para desencriptar
-        if security_manager.decrypt_extract_7z(archive_path, temp_extract, password=self.csv_password):
-            restored_csv = temp_extract / "index_main.csv"
-            
-            if restored_csv.exists():
-                try:
-                    loaded_df = pd.read_csv(restored_csv, encoding='utf-8-sig')
-                    
-                    if temp_only:
-                        self.df = loaded_df
-                        logger.info("✅ Índice cargado en memoria (Modo Solo Lectura).")
-                    else:
-                        # Modo restauración: Sobreescribimos
-                        time.sleep(0.5) # Pausa de seguridad
-                        try:
-                            shutil.move(str(restored_csv), str(self.csv_path))
-                        except PermissionError:
-                            shutil.copy2(str(restored_csv), str(self.csv_path))
-                        
-                        self.df = loaded_df # Recargar en memoria
-                        logger.info("✅ Índice restaurado en disco local.")
-                    
-                    return True
-                except Exception as e:
-                    logger.error(f"Error cargando CSV restaurado: {e}")
-                    return False
-                finally:
-                    try: shutil.rmtree(temp_extract, ignore_errors=True)
-                    except: pass
-        
-        try: shutil.rmtree(temp_extract, ignore_errors=True)
-        except: pass
-        return False
+    def compare_with(self, cloud_df: Optional[pd.DataFrame]) -> str:
+        """
+        Compara el índice local actual contra el de la nube (ya cargado).
+        Retorna: 'LOCAL_NEWER', 'CLOUD_NEWER', 'EQUAL', 'ERROR'
+        """
+        if cloud_df is None:
+            return 'ERROR'
+        count_local = len(self.df)
+        count_cloud = len(cloud_df)
+
+        # Criterio simple: Cantidad de registros
+        if count_local > count_cloud:
+            return 'LOCAL_NEWER'
+        elif count_cloud > count_local:
+            return 'CLOUD_NEWER'
+        else:
+            return 'EQUAL'
 
     def compare_local_vs_cloud_backup(self, security_manager, cloud_backup_path: Path) -> str:
         """
         Compara el índice local actual contra un backup descargado de la nube.
         Retorna: 'LOCAL_NEWER', 'CLOUD_NEWER', 'EQUAL', 'ERROR'
         """
-        import uuid
-        temp_extract = TEMP_DIR / f"compare_{uuid.uuid4().hex[:6]}"
-        temp_extract.mkdir(parents=True, exist_ok=True)
-
-        try:
-            # Desencriptar en temporal
-            if security_manager.decrypt_extract_7z(cloud_backup_path, temp_extract, password=self.csv_password):
-                cloud_csv = temp_extract / "index_main.csv"
-                if cloud_csv.exists():
-                    cloud_df = pd.read_csv(cloud_csv, encoding='utf-8-sig')
-                    
-                    count_local = len(self.df)
-                    count_cloud = len(cloud_df)
-                    
-                    # Criterio simple: Cantidad de registros
-                    if count_local > count_cloud:
-                        return 'LOCAL_NEWER'
-                    elif count_cloud > count_local:
-                        return 'CLOUD_NEWER'
-                    else:
-                        return 'EQUAL'
-            return 'ERROR'
-        except Exception as e:
-            logger.error(f"Error comparando índices: {e}")
-            return 'ERROR'
-        finally:
-            try: shutil.rmtree(temp_extract, ignore_errors=True)
-            except: pass
\ No newline at end of file
+        return self.compare_with(self.read_encrypted(security_manager, cloud_backup_path))
\ No newline at end of file
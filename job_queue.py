@@ -0,0 +1,149 @@
+# job_queue.py
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import logger, DATA_DIR
+
+JOB_DB_PATH = DATA_DIR / "jobs.db"
+
+# Etapas en orden: cada una implica que las anteriores terminaron
+STAGES = ['scanned', 'hashed', 'encrypted', 'uploaded', 'committed']
+
+
+class JobQueue:
+    """
+    COLA DE TRABAJOS PERSISTENTE (SQLite en data/jobs.db)
+    Registra cada carpeta de un lote de subida a través de las etapas
+    scanned -> hashed -> encrypted -> uploaded -> committed.
+    Si el proceso muere, la próxima ejecución retoma desde la última etapa completa:
+    reutiliza el .7z ya encriptado y reintenta las subidas fallidas sin volver a encriptar.
+    """
+
+    def __init__(self, db_path: Path = None):
+        self.db_path = Path(db_path or JOB_DB_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            # WAL + synchronous=NORMAL: cada transición es durable sin un fsync por lectura
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                    carpeta     TEXT NOT NULL UNIQUE,
+                    source_path TEXT NOT NULL,
+                    prefijo     TEXT NOT NULL,
+                    categoria   TEXT,
+                    stage       TEXT NOT NULL,
+                    payload     TEXT,
+                    attempts    INTEGER NOT NULL DEFAULT 0,
+                    last_error  TEXT,
+                    updated_at  REAL NOT NULL
+                )
+            """)
+
+    # --- CONVERSIÓN ---
+
+    @staticmethod
+    def _row(row: Optional[sqlite3.Row]) -> Optional[Dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload']) if job['payload'] else {}
+        return job
+
+    @staticmethod
+    def _dump(payload: Dict) -> str:
+        # Valores no serializables (ej: pd.NA) se guardan como null
+        return json.dumps(payload, ensure_ascii=False, default=lambda o: None)
+
+    # --- TRANSICIONES ---
+
+    def enqueue(self, carpeta: str, source_path: str, prefijo: str, categoria: str) -> Dict:
+        """Registra la carpeta (etapa 'scanned') o retorna el trabajo existente para reanudarlo."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (carpeta, source_path, prefijo, categoria, stage, updated_at) "
+                "VALUES (?, ?, ?, ?, 'scanned', ?)",
+                (carpeta, source_path, prefijo, categoria, time.time())
+            )
+            row = self._conn.execute("SELECT * FROM jobs WHERE carpeta = ?", (carpeta,)).fetchone()
+        return self._row(row)
+
+    def advance(self, job_id: int, stage: str, payload: Dict = None):
+        """Marca una etapa como completa. 'payload' reemplaza el estado guardado si se indica."""
+        if stage not in STAGES:
+            raise ValueError(f"Etapa desconocida: {stage}")
+        with self._lock, self._conn:
+            if payload is None:
+                self._conn.execute(
+                    "UPDATE jobs SET stage = ?, last_error = NULL, updated_at = ? WHERE id = ?",
+                    (stage, time.time(), job_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET stage = ?, payload = ?, last_error = NULL, updated_at = ? WHERE id = ?",
+                    (stage, self._dump(payload), time.time(), job_id)
+                )
+
+    def fail(self, job_id: int, error: str):
+        """Registra un fallo sin retroceder la etapa (se reintenta desde ahí)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET attempts = attempts + 1, last_error = ?, updated_at = ? WHERE id = ?",
+                (error, time.time(), job_id)
+            )
+
+    def reset(self, job_id: int):
+        """Vuelve a 'scanned' (ej: la carpeta cambió desde la última ejecución)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET stage = 'scanned', payload = NULL, updated_at = ? WHERE id = ?",
+                (time.time(), job_id)
+            )
+
+    def complete(self, carpeta: str):
+        """Marca como confirmado un trabajo cuyo registro ya está en el índice."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET stage = 'committed', updated_at = ? WHERE carpeta = ? AND stage != 'committed'",
+                (time.time(), carpeta)
+            )
+
+    def remove(self, job_id: int):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    # --- CONSULTAS ---
+
+    def pending(self, source_path: str = None) -> List[Dict]:
+        """Trabajos sin confirmar (opcionalmente de una carpeta padre)."""
+        query = "SELECT * FROM jobs WHERE stage != 'committed'"
+        params = ()
+        if source_path:
+            query += " AND source_path = ?"
+            params = (source_path,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [self._row(r) for r in rows]
+
+    def purge_committed(self, older_than_days: float = 30) -> int:
+        """Elimina trabajos confirmados antiguos. Retorna cuántos borró."""
+        cutoff = time.time() - older_than_days * 86400
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "DELETE FROM jobs WHERE stage = 'committed' AND updated_at < ?", (cutoff,)
+            )
+        if cur.rowcount:
+            logger.info(f"🧹 {cur.rowcount} trabajos confirmados antiguos eliminados de la cola.")
+        return cur.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
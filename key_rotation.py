@@ -0,0 +1,265 @@
+# key_rotation.py
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from config import (
+    logger, INDEX_DIR, TEMP_DIR, VOLUME_SIZE_MB,
+    ROTATION_PAUSE_SECONDS, ROTATION_STAGED_ARCHIVES, ROTATION_INDEX_EVERY
+)
+from partial_restore import PartialRestorer, MANIFEST_REMOTE_DIR
+from scrubber import archive_paths, archive_fingerprint
+
+STATE_PATH = INDEX_DIR / "key_rotation.json"
+_DONE = object()  # Fin de la cola entre etapas
+
+
+def compression_level(label) -> int:
+    """Nivel 7z a partir de la columna 'compresion' ('store', 'mx1:0.42'; vacío = Store)."""
+    if isinstance(label, str) and label.startswith("mx"):
+        try:
+            return int(label[2:].split(":", 1)[0])
+        except ValueError:
+            return 0
+    return 0
+
+
+class KeyRotator:
+    """
+    ROTACIÓN DE CLAVE MAESTRA EN SEGUNDO PLANO
+    Re-cifra cada archivo de la clave actual a la nueva, una fila a la vez:
+    descarga -> extrae (clave vieja) -> verifica MD5 -> re-empaqueta (clave nueva) -> sube.
+    - Las etapas corren en hilos encadenados por colas acotadas (ROTATION_STAGED_ARCHIVES):
+      mientras un archivo se sube, el siguiente se re-cifra y el otro se descarga; en disco
+      nunca hay más que esos pocos archivos.
+    - El .7z nuevo se sube con el nombre hash de la clave nueva, junto al viejo. La fila pasa a
+      la clave nueva ('version_clave') y el viejo se borra recién cuando la nube tiene un índice
+      que ya no lo referencia. Mientras tanto el índice sirve claves mezcladas.
+    - Estado en data/index/key_rotation.json: se detiene en cualquier momento y se retoma.
+    """
+
+    def __init__(self, cloud, security, inventory, publish_index: Callable[[], bool]):
+        self.cloud = cloud
+        self.security = security
+        self.inventory = inventory
+        self.publish_index = publish_index  # Guarda y sube índice + manifiestos; True si llegó a la nube
+
+    # --- ESTADO ---
+
+    @staticmethod
+    def load_state() -> Dict:
+        try:
+            return json.loads(STATE_PATH.read_text(encoding='utf-8'))
+        except Exception:
+            return {}
+
+    @staticmethod
+    def _save_state(state: Dict):
+        STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = STATE_PATH.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp, STATE_PATH)
+
+    def pending_rows(self, from_key: str) -> List[Dict]:
+        with self.inventory.lock:
+            df = self.inventory.df
+            if 'version_clave' not in df.columns:
+                return []
+            return df[df['version_clave'] == from_key].to_dict('records')
+
+    def begin(self, new_security) -> Dict:
+        """Inicia una rotación hacia 'new_security' o retoma la que está en curso hacia esa misma clave."""
+        state = self.load_state()
+        new_key = new_security.key_id
+        if state and not state.get('complete'):
+            if state['to_key'] != new_key:
+                raise ValueError("Hay una rotación en curso hacia otra clave. Termínela con esa contraseña.")
+            return state
+        if new_key == self.security.key_id:
+            raise ValueError("La clave nueva es igual a la actual.")
+
+        # Las filas sin versión son de la clave original: se marcan explícitamente antes de mezclar
+        with self.inventory.lock:
+            df = self.inventory.df
+            if 'version_clave' not in df.columns:
+                df['version_clave'] = pd.NA
+            df['version_clave'] = df['version_clave'].astype(object)
+            df.loc[df['version_clave'].isna() | (df['version_clave'] == ""), 'version_clave'] = self.security.key_id
+            self.inventory.save_local()
+
+        state = {
+            'from_key': self.security.key_id, 'to_key': new_key,
+            'started': time.strftime("%d-%m-%Y %H:%M:%S"),
+            'rotated': 0, 'failed': {}, 'pending_deletes': [], 'complete': False
+        }
+        self._save_state(state)
+        return state
+
+    # --- ETAPAS ---
+
+    def _download(self, row: Dict, work: Path) -> Optional[List[Path]]:
+        files = []
+        for remote in archive_paths(row):
+            dest = work / "old" / Path(remote).name
+            if not self.cloud.download_file(remote, dest, silent=True):
+                return None
+            files.append(dest)
+        return files
+
+    def _rekey(self, item: Dict, old, new) -> Optional[str]:
+        """Re-cifra el archivo de 'item' con la clave nueva. Retorna el error o None."""
+        row, work = item['row'], item['work']
+        plain = work / "plain" / str(row['nombre_original'])
+        if not old.decrypt_extract_7z(item['files'][0], plain):
+            return "extracción"
+        shutil.rmtree(work / "old", ignore_errors=True)  # Libera disco antes de re-empaquetar
+
+        file_entries = new.hash_folder_files(plain)
+        if isinstance(row.get('hash_md5'), str) and new.folder_md5(file_entries) != row['hash_md5']:
+            return "MD5 distinto al registrado (no se rota)"
+
+        name = str(row['nombre_original'])
+        new_hash = new.generate_filename_hash(name)
+        token = new.encrypt_text(name)
+        metadata = {
+            "original_name_token": token, "hash_filename": new_hash, "md5": row.get('hash_md5'),
+            "processed_date": row.get('fecha_procesado'), "category": row.get('categoria')
+        }
+        try:
+            size_mb = float(row.get('tamaño_mb') or 0)
+        except (TypeError, ValueError):
+            size_mb = 0.0
+        volume_mb = VOLUME_SIZE_MB if VOLUME_SIZE_MB > 0 and size_mb > VOLUME_SIZE_MB else 0
+        dest = work / "new" / f"{new_hash}.7z"
+        if not new.compress_encrypt_7z(plain, dest, metadata=metadata, volume_size_mb=volume_mb,
+                                       level=compression_level(row.get('compresion'))):
+            return "encriptación"
+        shutil.rmtree(work / "plain", ignore_errors=True)
+
+        volumes = new.list_volumes(dest) if volume_mb else []
+        manifest = new.build_archive_manifest(dest, file_entries, volumes)
+        item.update({
+            'new_hash': new_hash, 'token': token, 'dest': dest, 'volumes': volumes,
+            'manifest': PartialRestorer(self.cloud, new).save_manifest(new_hash, manifest) if manifest else pd.NA
+        })
+        return None
+
+    def _upload(self, item: Dict) -> bool:
+        prefix = item['row']['prefijo']
+        if item['volumes']:
+            return self.cloud.upload_volumes(item['volumes'], prefix)
+        return self.cloud.upload_file(item['dest'], prefix)
+
+    def _commit(self, item: Dict, state: Dict):
+        """La fila pasa a la clave nueva; el archivo viejo queda pendiente de borrar."""
+        row = item['row']
+        files = item['volumes'] or [item['dest']]
+        self.inventory.update_record(row['prefijo'], row['nombre_encriptado'], {
+            'nombre_encriptado': item['new_hash'], 'carpeta_hija': f"{item['new_hash']}.7z",
+            'nombre_original_encrypted': item['token'],
+            'volumenes': len(item['volumes']) if item['volumes'] else pd.NA,
+            'manifiesto': item['manifest'],
+            'hash_remoto': archive_fingerprint(self.cloud, files),
+            'version_clave': state['to_key'],
+        })
+        self.inventory.save_local()
+        state['pending_deletes'] += archive_paths(row)
+        if isinstance(row.get('manifiesto'), str) and row['manifiesto']:
+            state['pending_deletes'].append(f"{MANIFEST_REMOTE_DIR}/{row['manifiesto']}")
+            PartialRestorer(self.cloud, self.security).discard_manifest(row['nombre_encriptado'])
+        state['rotated'] += 1
+        state['failed'].pop(row['nombre_encriptado'], None)
+        self._save_state(state)
+
+    def _flush_deletes(self, state: Dict) -> bool:
+        """Publica el índice y, solo si llegó a la nube, borra los archivos viejos ya reemplazados."""
+        if not state['pending_deletes']:
+            return True
+        if not self.publish_index():
+            logger.warning("⚠️ No se pudo publicar el índice: los archivos viejos se conservan por ahora.")
+            return False
+        if self.cloud.delete_remote_files(state['pending_deletes']):
+            logger.info(f"🧹 {len(state['pending_deletes'])} objetos con la clave anterior eliminados.")
+            state['pending_deletes'] = []
+            self._save_state(state)
+        return True
+
+    # --- EJECUCIÓN ---
+
+    def run(self, new_security, stop: threading.Event = None, max_rows: int = None) -> Dict:
+        """
+        Avanza la rotación hacia 'new_security' hasta terminar, 'stop' o 'max_rows' filas.
+        Retorna el estado; 'complete' indica que ya no quedan filas con la clave anterior.
+        """
+        stop = stop or threading.Event()
+        state = self.begin(new_security)
+        old = self.security.for_key(state['from_key'])
+        if old is None:
+            raise ValueError("Se necesita la contraseña anterior para continuar la rotación.")
+        self.security.register_key(new_security)  # Las filas ya rotadas siguen legibles en esta sesión
+        self._flush_deletes(state)  # Restos de una ejecución anterior interrumpida
+
+        rows = self.pending_rows(state['from_key'])
+        if max_rows:
+            rows = rows[:max_rows]
+        logger.info(f"🔑 Rotación de clave: {len(rows)} archivos por re-cifrar.")
+
+        downloaded = queue.Queue(maxsize=max(1, ROTATION_STAGED_ARCHIVES))
+        rekeyed = queue.Queue(maxsize=max(1, ROTATION_STAGED_ARCHIVES))
+
+        def download_stage():
+            for row in rows:
+                if stop.is_set():
+                    break
+                work = TEMP_DIR / f"rotate_{uuid.uuid4().hex[:8]}"
+                files = self._download(row, work)
+                downloaded.put({'row': row, 'work': work, 'files': files, 'error': None if files else "descarga"})
+                stop.wait(ROTATION_PAUSE_SECONDS)  # Deja la red libre para el uso normal
+            downloaded.put(_DONE)
+
+        def rekey_stage():
+            while (item := downloaded.get()) is not _DONE:
+                if not item['error']:
+                    try:
+                        item['error'] = self._rekey(item, old, new_security)
+                    except Exception as e:
+                        item['error'] = str(e)
+                rekeyed.put(item)
+            rekeyed.put(_DONE)
+
+        threading.Thread(target=download_stage, name="rotate-dl", daemon=True).start()
+        threading.Thread(target=rekey_stage, name="rotate-rekey", daemon=True).start()
+
+        since_publish = 0
+        while (item := rekeyed.get()) is not _DONE:
+            row = item['row']
+            try:
+                if not item['error'] and not self._upload(item):
+                    item['error'] = "subida"
+                if item['error']:
+                    logger.error(f"❌ Rotación de {row['nombre_original']}: {item['error']}")
+                    state['failed'][row['nombre_encriptado']] = item['error']
+                    self._save_state(state)
+                    continue
+                self._commit(item, state)
+                since_publish += 1
+                if since_publish >= max(1, ROTATION_INDEX_EVERY):
+                    since_publish = 0 if self._flush_deletes(state) else since_publish
+            finally:
+                shutil.rmtree(item['work'], ignore_errors=True)
+
+        self._flush_deletes(state)
+        state['complete'] = not self.pending_rows(state['from_key'])
+        if state['complete']:
+            state['finished'] = time.strftime("%d-%m-%Y %H:%M:%S")
+            logger.info("✅ Rotación de clave completa.")
+        self._save_state(state)
+        return state
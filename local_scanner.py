@@ -0,0 +1,172 @@
+# local_scanner.py
+import json
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from config import (
+    logger, INDEX_DIR, VALID_PREFIXES,
+    SCAN_WORKERS, SCAN_INCREMENTAL, SCAN_FULL_EVERY_HOURS
+)
+
+SNAPSHOT_PATH = INDEX_DIR / "scan_snapshot.json"
+_DONE = object()  # Marca de fin de un worker
+
+
+def _subdirs(path: str) -> List[os.DirEntry]:
+    """Subcarpetas vía os.scandir (el tipo viene en el DirEntry: sin stat extra por entrada)."""
+    try:
+        with os.scandir(path) as it:
+            return [e for e in it if e.is_dir(follow_symlinks=False)]
+    except OSError as e:
+        logger.warning(f"⚠️ No se pudo listar {path}: {e}")
+        return []
+
+
+def _mtime(entry_or_path) -> Optional[float]:
+    try:
+        st = entry_or_path.stat() if isinstance(entry_or_path, os.DirEntry) else os.stat(entry_or_path)
+        return st.st_mtime
+    except OSError:
+        return None
+
+
+class LocalScanner:
+    """
+    ESCÁNER LOCAL PARALELO E INCREMENTAL
+    - os.scandir en lugar de iterdir()+is_dir() (menos llamadas al sistema, clave en shares de red).
+    - Cada carpeta PREFIJO se recorre en su propio hilo.
+    - Snapshot de mtimes de carpetas: si un PREFIJO o una Categoría no cambió desde el último
+      escaneo, se reutiliza su listado guardado sin volver a listarla.
+    - scan() es un generador: el pipeline empieza a procesar antes de que termine el escaneo.
+    """
+
+    def __init__(self, parent: Path, workers: int = None, incremental: bool = None):
+        self.parent = Path(parent)
+        self.workers = max(1, workers or SCAN_WORKERS)
+        self.incremental = SCAN_INCREMENTAL if incremental is None else incremental
+        self.stats = {'listed': 0, 'reused': 0}
+
+    # --- SNAPSHOT ---
+
+    def _load_snapshot(self) -> Dict:
+        try:
+            data = json.loads(SNAPSHOT_PATH.read_text(encoding='utf-8'))
+        except Exception:
+            return {}
+        entry = data.get(str(self.parent.resolve()), {})
+        # Cada tanto un escaneo completo (por si el FS no actualiza mtimes de forma fiable)
+        if time.time() - entry.get('taken_at', 0) > SCAN_FULL_EVERY_HOURS * 3600:
+            return {}
+        return entry.get('prefixes', {})
+
+    def _save_snapshot(self, prefixes: Dict):
+        try:
+            data = json.loads(SNAPSHOT_PATH.read_text(encoding='utf-8'))
+        except Exception:
+            data = {}
+        key = str(self.parent.resolve())
+        previous = data.get(key, {})
+        # Si este escaneo reutilizó el snapshot, conservamos la fecha del último escaneo completo
+        taken_at = previous.get('taken_at', time.time()) if self.stats['reused'] else time.time()
+        data[key] = {'taken_at': taken_at, 'prefixes': prefixes}
+        SNAPSHOT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = SNAPSHOT_PATH.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data), encoding='utf-8')
+        os.replace(tmp, SNAPSHOT_PATH)
+
+    # --- RECORRIDO ---
+
+    def _walk_prefix(self, prefix_path: str, prefix_name: str, old: Optional[Dict], out: queue.Queue) -> Dict:
+        """Recorre PREFIJO/Categoría/Unidad emitiendo unidades a 'out'. Retorna su snapshot."""
+        prefix = prefix_name.upper()
+        prefix_mtime = _mtime(prefix_path)
+        old = old or {}
+        old_categories = old.get('categories', {})
+
+        # PREFIJO sin cambios -> mismas categorías (solo se revisa el mtime de cada una)
+        if old and old.get('mtime') == prefix_mtime:
+            categories = [(name, os.path.join(prefix_path, name), None) for name in old_categories]
+        else:
+            self.stats['listed'] += 1
+            categories = [(e.name, e.path, e) for e in _subdirs(prefix_path)]
+
+        snapshot = {'mtime': prefix_mtime, 'categories': {}}
+        for name, path, entry in sorted(categories):
+            cat_mtime = _mtime(entry if entry is not None else path)
+            if cat_mtime is None:
+                continue  # Se borró entre el listado y ahora
+            cached = old_categories.get(name)
+            if cached and cached.get('mtime') == cat_mtime:
+                units = cached['units']
+                self.stats['reused'] += 1
+            else:
+                units = sorted(e.name for e in _subdirs(path))
+                self.stats['listed'] += 1
+            snapshot['categories'][name] = {'mtime': cat_mtime, 'units': units}
+            for unit in units:
+                out.put({'path': Path(path) / unit, 'prefix': prefix, 'category': name})
+        return snapshot
+
+    def _walk_prefix_safe(self, prefix_path, prefix_name, old, out, results: Dict):
+        try:
+            results[prefix_name] = self._walk_prefix(prefix_path, prefix_name, old, out)
+        except Exception as e:
+            logger.error(f"Error escaneando {prefix_path}: {e}")
+            results[prefix_name] = None
+        finally:
+            out.put(_DONE)
+
+    def scan(self) -> Iterator[Dict]:
+        """Genera unidades {'path', 'prefix', 'category'} a medida que se encuentran."""
+        if not self.parent.exists():
+            logger.error(f"Ruta no existe: {self.parent}")
+            return
+
+        logger.info(f"Explorando: {self.parent}")
+        old = self._load_snapshot() if self.incremental else {}
+        tops = _subdirs(str(self.parent))
+        prefix_dirs = []
+        count = 0
+
+        for entry in sorted(tops, key=lambda e: e.name):
+            name = entry.name.upper()
+            if name in VALID_PREFIXES:
+                prefix_dirs.append(entry)
+            else:
+                # Carpeta directa con prefijo (Legacy/Simple). Ej: DOC_Contrato
+                prefix_found = next((p for p in VALID_PREFIXES if name.startswith(p)), None)
+                if prefix_found:
+                    count += 1
+                    yield {'path': Path(entry.path), 'prefix': prefix_found, 'category': 'General'}
+
+        out: queue.Queue = queue.Queue()
+        results: Dict[str, Optional[Dict]] = {}
+        completed = True
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scan") as pool:
+            for entry in prefix_dirs:
+                pool.submit(self._walk_prefix_safe, entry.path, entry.name, old.get(entry.name), out, results)
+
+            remaining = len(prefix_dirs)
+            try:
+                while remaining:
+                    item = out.get()
+                    if item is _DONE:
+                        remaining -= 1
+                        continue
+                    count += 1
+                    yield item
+            except GeneratorExit:
+                completed = False  # El consumidor cortó antes: no guardamos un snapshot parcial
+                raise
+            finally:
+                if completed:
+                    prefixes = {k: v for k, v in results.items() if v is not None}
+                    self._save_snapshot(prefixes)
+                    logger.info(
+                        f"✅ Encontradas {count} carpetas para procesar "
+                        f"({self.stats['listed']} listados, {self.stats['reused']} reutilizados del snapshot)."
+                    )
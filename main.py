@@ -1,18 +1,40 @@
 # main.py
 import sys
 import getpass
+import hashlib
 import time
 import os
+import json
+import threading
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, Iterable, Optional
 from colorama import init, Fore, Style
 from tabulate import tabulate
 
 # Importamos Managers
-from config import init_directories, logger, VALID_PREFIXES, DATA_DIR
+from config import (
+    init_directories, logger, VALID_PREFIXES, DATA_DIR, KEYS_DIR, INDEX_REMOTE_PATH,
+    BATCH_MAX_FILE_MB, BATCH_MAX_FILES, VOLUME_SIZE_MB
+)
 from security_manager import SecurityManager
 from cloud_manager import CloudManager
 from inventory_manager import InventoryManager
+from restore_pipeline import RestorePipeline
+from mirror_restore import MirrorRestorer
+from partial_restore import PartialRestorer
+from blob_cache import BlobCache
+from index_sync import IndexSync
+from background_janitor import BackgroundJanitor
+from job_queue import JobQueue
+from compression_policy import CompressionPolicy
+from scrubber import Scrubber, archive_fingerprint
+from reconciler import Reconciler
+from index_rebuilder import IndexRebuilder
+from index_audit import IndexAuditor
+from key_rotation import KeyRotator
+from folder_watcher import FolderWatcher
 
 # Inicializar colores para la consola
 init(autoreset=True)
@@ -22,6 +44,16 @@ class AppOrchestrator:
         self.security: SecurityManager = None
         self.cloud: CloudManager = None
         self.inventory: InventoryManager = None
+        self.partial: PartialRestorer = None
+        self.cache: BlobCache = None
+        self.index_sync: IndexSync = None
+        self.jobs: JobQueue = None
+        self.compression: CompressionPolicy = None
+        self.janitor = BackgroundJanitor()
+        self.startup_times: dict = {}
+        self.index_status: str = None
+        self._rotation_thread: Optional[threading.Thread] = None
+        self._rotation_stop = threading.Event()
 
     # --- UI HELPERS ---
     
@@ -43,23 +75,43 @@ class AppOrchestrator:
 
     def safe_delete(self, path: Path):
         """
-        Intenta borrar un archivo con reintentos y espera progresiva.
+        Intenta borrar un archivo al instante.
+        MEJORA: Si está bloqueado, los reintentos con espera progresiva pasan al janitor
+        en segundo plano en lugar de frenar el flujo principal.
         """
         if not path.exists(): return
         
-        max_retries = 10 
-        for i in range(max_retries):
-            try:
-                time.sleep(0.5 + (i * 0.2)) 
-                path.unlink()
-                return
-            except PermissionError:
-                if i == max_retries - 1: 
-                    self.print_info(f"⚠️ No se pudo borrar temporal inmediatamente: {path.name} (bloqueado). Se limpiará después.")
-                continue
-            except Exception as e:
-                self.print_error(f"Error borrando {path.name}: {e}")
-                return
+        try:
+            path.unlink()
+        except PermissionError:
+            self.janitor.discard(path)
+        except Exception as e:
+            self.print_error(f"Error borrando {path.name}: {e}")
+
+    def _timed(self, phase: str, fn, *args):
+        """Ejecuta fn(*args) registrando su duración en el reporte de arranque."""
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.startup_times[phase] = time.perf_counter() - start
+
+    @staticmethod
+    def _witness_state_path(witness: Path) -> Path:
+        return witness.with_name(f"{witness.name}.json")
+
+    def _witness_unchanged(self, witness: Path, remote_meta: dict) -> bool:
+        """True si la copia local del testigo corresponde al objeto remoto actual."""
+        try:
+            stored = json.loads(self._witness_state_path(witness).read_text(encoding='utf-8'))
+        except Exception:
+            return False
+        return witness.exists() and stored == remote_meta
+
+    def _remember_witness(self, witness: Path, remote_path: str):
+        meta = self.cloud.stat_remote(remote_path)
+        if meta:
+            self._witness_state_path(witness).write_text(json.dumps(meta), encoding='utf-8')
 
     def _validate_and_sync_key(self, key_type: str, password: str):
         """
@@ -67,15 +119,22 @@ class AppOrchestrator:
         Usa la carpeta remota 'keys/' para mantener orden.
         """
         witness_name = f"witness_{key_type}.7z"
-        local_witness = DATA_DIR / "temp" / witness_name
+        # MEJORA: Copia local persistente (cifrada) en data/keys
+        local_witness = KEYS_DIR / witness_name
         # Ruta dedicada para keys
         remote_witness_path = f"keys/{witness_name}"
         
         self.print_info(f"Validando clave {key_type} con la nube...")
 
-        if self.cloud.download_file(remote_witness_path, local_witness, silent=True):
+        # MEJORA: Si el testigo remoto no cambió desde la última validación, no se descarga
+        remote_meta = self.cloud.stat_remote(remote_witness_path)
+        available = bool(remote_meta) and self._witness_unchanged(local_witness, remote_meta)
+        if not available and self.cloud.download_file(remote_witness_path, local_witness, silent=True):
+            available = True
+            self._remember_witness(local_witness, remote_witness_path)
+
+        if available:
             is_valid = self.security.verify_password_with_witness(local_witness, password)
-            # No borramos inmediatamente para evitar bloqueo
             
             if is_valid:
                 self.print_success(f"Clave {key_type} VERIFICADA.")
@@ -89,7 +148,7 @@ class AppOrchestrator:
                 # Subir a la carpeta keys/
                 if self.cloud.upload_file(local_witness, remote_witness_path):
                     self.print_success(f"Testigo {key_type} creado en carpeta 'keys/'.")
-                    self.safe_delete(local_witness)
+                    self._remember_witness(local_witness, remote_witness_path)
                     return True
             return False
 
@@ -118,42 +177,8 @@ class AppOrchestrator:
                 if c_pass == c_pass_conf: break
                 self.print_error("No coinciden.")
 
-            self.security = SecurityManager(m_pass)
-            self.cloud = CloudManager()
-            self.inventory = InventoryManager(c_pass) 
-            
-            if not self._validate_and_sync_key('master', m_pass): sys.exit(1)
-            if not self._validate_and_sync_key('csv', c_pass): sys.exit(1)
-
-            # Limpieza de testigos
-            self.print_info("Limpiando testigos en 5 segundos...")
-            time.sleep(5)
-            self.safe_delete(DATA_DIR / "temp" / "witness_master.7z")
-            self.safe_delete(DATA_DIR / "temp" / "witness_csv.7z")
-
-            self.print_success("Sistemas inicializados.")
-            
-            # --- NUEVO: VALIDACIÓN DE ATOMICIDAD (SYNC CHECK) ---
-            self.print_info("Verificando integridad del índice con la nube...")
-            local_idx_check = DATA_DIR / "temp" / "index_atomic_check.7z"
-            
-            if self.cloud.download_file("index/index_main.7z", local_idx_check, silent=True):
-                status = self.inventory.compare_local_vs_cloud_backup(self.security, local_idx_check)
-                self.safe_delete(local_idx_check)
-                
-                if status == 'LOCAL_NEWER':
-                    print(f"{Fore.YELLOW}⚠️  ATENCIÓN: Tu índice LOCAL tiene más datos que la NUBE.{Style.RESET_ALL}")
-                    if input("¿Deseas actualizar la nube ahora? (s/n): ").lower() == 's':
-                        encrypted = self.inventory.save_encrypted_backup(self.security, prefix="SYNC_FIX")
-                        if encrypted and self.cloud.upload_file(encrypted, "index/index_main.7z"):
-                            self.print_success("Nube actualizada correctamente.")
-                elif status == 'CLOUD_NEWER':
-                    print(f"{Fore.YELLOW}⚠️  ATENCIÓN: La NUBE tiene más datos que tu local.{Style.RESET_ALL}")
-                    self.print_info("Se recomienda usar la opción '2. Descarga' para sincronizar o revisar.")
-                elif status == 'EQUAL':
-                    self.print_success("Índices sincronizados.")
-            else:
-                self.print_info("No existe índice en nube aún (o error de conexión).")
+            if not self.initialize(m_pass, c_pass):
+                sys.exit(1)
 
         except Exception as e:
             self.print_error(f"Error de inicio: {e}")
@@ -162,12 +187,80 @@ class AppOrchestrator:
         while True:
             self.show_menu()
 
+    def initialize(self, m_pass: str, c_pass: str, interactive: bool = True) -> bool:
+        """
+        Inicializa managers, valida ambas claves y chequea el índice contra la nube.
+        'interactive=False' (CLI) no hace preguntas: solo informa el estado.
+        """
+        boot_start = time.perf_counter()
+        # La derivación de clave (PBKDF2) arranca en segundo plano dentro de SecurityManager
+        self.security = self._timed("managers", SecurityManager, m_pass)
+        self.cloud = CloudManager()
+        self.inventory = InventoryManager(c_pass) 
+        self.partial = PartialRestorer(self.cloud, self.security)
+        self.cache = BlobCache(self.cloud)
+        self.index_sync = IndexSync(self.cloud, self.security, self.inventory)
+        self.jobs = JobQueue()
+        self.compression = CompressionPolicy(self.cloud.bandwidth)
+        self.jobs.purge_committed()
+        
+        # MEJORA: Testigos y chequeo del índice en paralelo (todo es espera de red / 7z)
+        self.print_info("Verificando claves e integridad del índice con la nube...")
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="startup") as pool:
+            f_master = pool.submit(self._timed, "testigo master", self._validate_and_sync_key, 'master', m_pass)
+            f_csv = pool.submit(self._timed, "testigo csv", self._validate_and_sync_key, 'csv', c_pass)
+            # --- NUEVO: VALIDACIÓN DE ATOMICIDAD (SYNC CHECK) ---
+            # Descarga condicional (solo si el índice remoto cambió desde la última vez)
+            f_index = pool.submit(self._timed, "índice", self.index_sync.fetch)
+            master_ok, csv_ok = f_master.result(), f_csv.result()
+            cloud_df = f_index.result()
+
+        if not master_ok or not csv_ok: return False
+        self.startup_times["derivación clave"] = self.security.wait_key()
+
+        # Testigos de versiones anteriores (data/temp): limpieza en segundo plano
+        self.janitor.discard(DATA_DIR / "temp" / "witness_master.7z")
+        self.janitor.discard(DATA_DIR / "temp" / "witness_csv.7z")
+
+        self.startup_times["total"] = time.perf_counter() - boot_start
+        self.print_success("Sistemas inicializados.")
+        self.print_startup_report()
+        
+        self.index_status = 'ERROR'
+        if cloud_df is not None:
+            status = self.index_status = self.inventory.compare_with(cloud_df)
+            
+            if status == 'LOCAL_NEWER':
+                print(f"{Fore.YELLOW}⚠️  ATENCIÓN: Tu índice LOCAL tiene más datos que la NUBE.{Style.RESET_ALL}")
+                if interactive and input("¿Deseas actualizar la nube ahora? (s/n): ").lower() == 's':
+                    encrypted = self.inventory.save_encrypted_backup(self.security, prefix="SYNC_FIX")
+                    if encrypted and self.cloud.upload_file(encrypted, INDEX_REMOTE_PATH):
+                        self.index_sync.note_uploaded(encrypted, self.inventory.df)
+                        self.print_success("Nube actualizada correctamente.")
+            elif status == 'CLOUD_NEWER':
+                print(f"{Fore.YELLOW}⚠️  ATENCIÓN: La NUBE tiene más datos que tu local.{Style.RESET_ALL}")
+                self.print_info("Se recomienda usar la opción '2. Descarga' para sincronizar o revisar.")
+            elif status == 'EQUAL':
+                self.print_success("Índices sincronizados.")
+        else:
+            self.print_info("No existe índice en nube aún (o error de conexión).")
+        return True
+
+    def print_startup_report(self):
+        """Tiempo por fase del arranque (las fases en paralelo se solapan)."""
+        phases = " | ".join(f"{name}: {secs:.2f}s" for name, secs in self.startup_times.items())
+        print(f"   ⏱️  Arranque -> {phases}")
+        logger.info(f"⏱️ Arranque -> {phases}")
+
     def show_menu(self):
+        # NUEVO: Revalidar el índice de la nube en segundo plano mientras se elige opción
+        self.index_sync.prefetch()
         print(f"\n{Fore.BLUE}--- MENÚ PRINCIPAL ---{Style.RESET_ALL}")
         print("1. 📤 MODO SUBIDA (Smart Upload + Validado)")
         print("2. 📥 MODO DESCARGA (Explorador Visual)")
         print("3. 🔍 CONSULTAR ÍNDICE")
         print("4. 🔧 MANTENIMIENTO Y ESTADO")
+        print("5. 👁️  MODO VIGILANCIA (Subida automática)")
         print("0. 🚪 SALIR")
         
         opcion = input("\n👉 Seleccione opción: ")
@@ -176,35 +269,65 @@ class AppOrchestrator:
         elif opcion == "2": self.run_download_mode()
         elif opcion == "3": self.run_query_mode()
         elif opcion == "4": self.run_maintenance_mode()
-        elif opcion == "0": sys.exit(0)
+        elif opcion == "5": self.run_watch_mode()
+        elif opcion == "0":
+            self.janitor.drain()
+            sys.exit(0)
         else: self.print_error("Opción inválida.")
 
     # --- MODOS DE OPERACIÓN ---
 
-    def run_upload_mode(self):
+    def run_upload_mode(self, source_path: Path = None, assume_yes: bool = False):
+        """
+        Procesa una carpeta padre. Sin argumentos pregunta la ruta y pide confirmación;
+        la CLI pasa 'source_path' y 'assume_yes=True'. Retorna la cantidad subida (None si aborta).
+        """
         self.print_header("MODO SUBIDA")
-        path_str = input("📁 Carpeta PADRE a procesar: ").strip().replace('"', '')
-        source_path = Path(path_str)
+        if source_path is None:
+            path_str = input("📁 Carpeta PADRE a procesar: ").strip().replace('"', '')
+            source_path = Path(path_str)
         
         if not source_path.exists():
             return self.print_error("La ruta no existe.")
 
+        if assume_yes:
+            # NUEVO: Sin confirmación no hace falta el total: se sube mientras se escanea
+            processed = self.upload_items(source_path, self.cloud.iter_local_folders(source_path))
+            if processed is None:
+                return self.print_error("No se encontraron subcarpetas con prefijos válidos.")
+            return processed
+
         # Llamada al escáner que ahora soporta categorías
         items_encontrados = self.cloud.scan_local_folders(source_path)
         if not items_encontrados:
             return self.print_error("No se encontraron subcarpetas con prefijos válidos.")
 
         # items_encontrados es una lista de dicts: {'path', 'prefix', 'category'}
-        
         confirm = input(f"¿Procesar {len(items_encontrados)} carpetas? (s/n): ")
         if confirm.lower() != 's': return
 
+        return self.upload_items(source_path, items_encontrados)
+
+    def upload_items(self, source_path: Path, items_encontrados: Iterable[Dict]) -> Optional[int]:
+        """
+        Sube unidades {'path', 'prefix', 'category'} de 'source_path': una lista (escaneo
+        completo o lote del modo vigilancia) o el generador del escáner, que se consume a
+        medida que avanza. Retorna la cantidad subida (None si no llegó ninguna unidad).
+        """
+        resumable = self.jobs.pending(str(source_path))
+        if resumable:
+            self.print_info(f"♻️  {len(resumable)} trabajos de una ejecución anterior se retomarán donde quedaron.")
+
         processed_count = 0
         skipped_count = 0
-        total_files = len(items_encontrados)
+        # Con un generador el total no se conoce hasta terminar el escaneo
+        total_files = len(items_encontrados) if hasattr(items_encontrados, '__len__') else '?'
+        # NUEVO: Archivos pequeños esperando subida en lote, agrupados por prefijo (carpeta remota)
+        pending_batches = {}
 
         print(f"\n{Fore.CYAN}🚀 Iniciando lote...{Style.RESET_ALL}")
 
+        idx = 0
         for idx, item_data in enumerate(items_encontrados, 1):
             carpeta = item_data['path']
             prefijo = item_data['prefix']
@@ -212,64 +335,169 @@ class AppOrchestrator:
             
             try:
                 # VALIDACIÓN DUPLICADOS (Ahora considerando Categoría implícitamente por nombre)
-                if self.inventory.check_exists(prefijo, carpeta.name):
+                pending_names = {rec['nombre_original'] for rec, _, _ in pending_batches.get(prefijo, [])}
+                if self.inventory.check_exists(prefijo, carpeta.name) or carpeta.name in pending_names:
+                    if carpeta.name not in pending_names:
+                        self.jobs.complete(str(carpeta))  # Registrado antes de un corte: cerrar el trabajo
                     print(f"{Fore.YELLOW}⚠️  [{idx}/{total_files}] Saltando duplicado: {carpeta.name}{Style.RESET_ALL}")
                     skipped_count += 1
                     continue
 
                 size_mb = self.security.get_size_mb(carpeta)
+                # Antes de hashear: una edición posterior invalida el trabajo guardado
+                signature = self._folder_signature(carpeta)
                 print(f"\n{Fore.BLUE}────────────────────────────────────────────────────────────{Style.RESET_ALL}")
                 print(f"{Fore.YELLOW}📤 Procesando: {carpeta.name} ({size_mb:.2f} MB) - ({idx}/{total_files}){Style.RESET_ALL}")
                 print(f"   📂 Prefijo: {prefijo} | Categoría: {categoria}")
 
-                next_global, next_prefix = self.inventory.get_next_ids(prefijo)
-                hash_nombre = self.security.generate_filename_hash(carpeta.name)
-                nombre_orig_encrypted = self.security.encrypt_text(carpeta.name)
-                md5_hash = self.security.calculate_md5(carpeta)
-                fecha_fmt = time.strftime("%d-%m-%Y %H:%M:%S")
-
-                metadata_json = {
-                    "original_name_token": nombre_orig_encrypted,
-                    "hash_filename": hash_nombre,
-                    "md5": md5_hash,
-                    "processed_date": fecha_fmt,
-                    "category": categoria # Guardamos categoría en metadatos también
-                }
-
-                print(f"{Fore.CYAN}📦 Encriptando...{Style.RESET_ALL}")
-                filename_7z = f"{hash_nombre}.7z"
-                dest_7z = source_path / filename_7z 
-                
-                if self.security.compress_encrypt_7z(carpeta, dest_7z, metadata=metadata_json):
-                    print(f"{Fore.GREEN}   ✅ Encriptado.{Style.RESET_ALL}")
+                # NUEVO: Cola persistente -> se retoma desde la última etapa completa
+                job = self.jobs.enqueue(str(carpeta), str(source_path), prefijo, categoria)
+                resumed = self._resume_job(job, size_mb, signature)
+
+                if resumed and job['stage'] == 'uploaded':
+                    # Se cortó entre la subida y el commit: solo falta registrar
+                    print(f"{Fore.GREEN}   ♻️  Ya estaba subido (ejecución interrumpida). Registrando...{Style.RESET_ALL}")
+                    self._commit_record(resumed['record'], job['id'])
+                    processed_count += 1
+                    continue
+
+                if resumed and job['stage'] == 'encrypted':
+                    print(f"{Fore.GREEN}   ♻️  Reutilizando .7z ya encriptado (sin volver a encriptar).{Style.RESET_ALL}")
+                    record = resumed['record']
+                    dest_7z = Path(resumed['dest_7z'])
+                    volumes = [Path(v) for v in resumed['volumes']]
+                else:
+                    hash_nombre = self.security.generate_filename_hash(carpeta.name)
+                    nombre_orig_encrypted = self.security.encrypt_text(carpeta.name)
+
+                    if resumed and job['stage'] == 'hashed':
+                        file_entries, md5_hash = resumed['file_entries'], resumed['md5']
+                    else:
+                        # MEJORA: Hash por archivo (manifiesto) reutilizado para el MD5 de la carpeta
+                        file_entries = self.security.hash_folder_files(carpeta)
+                        md5_hash = self.security.folder_md5(file_entries)
+                        self.jobs.advance(job['id'], 'hashed', {
+                            'size_mb': size_mb, 'signature': signature,
+                            'file_entries': file_entries, 'md5': md5_hash
+                        })
+                    fecha_fmt = time.strftime("%d-%m-%Y %H:%M:%S")
+
+                    metadata_json = {
+                        "original_name_token": nombre_orig_encrypted,
+                        "hash_filename": hash_nombre,
+                        "md5": md5_hash,
+                        "processed_date": fecha_fmt,
+                        "category": categoria # Guardamos categoría en metadatos también
+                    }
+
+                    print(f"{Fore.CYAN}📦 Encriptando...{Style.RESET_ALL}")
+                    filename_7z = f"{hash_nombre}.7z"
+                    dest_7z = source_path / filename_7z 
+
+                    # Mismo nombre en otro prefijo -> mismo .7z: subir ese lote antes de sobreescribirlo
+                    for other_prefix, batch in list(pending_batches.items()):
+                        if any(dest == dest_7z for _, dest, _ in batch):
+                            processed_count += self._flush_upload_batch(source_path, other_prefix, pending_batches.pop(other_prefix))
+                    
+                    # NUEVO: Carpetas enormes se parten en volúmenes que suben en paralelo
+                    volume_mb = VOLUME_SIZE_MB if VOLUME_SIZE_MB > 0 and size_mb > VOLUME_SIZE_MB else 0
+
+                    # NUEVO: Store o compresión rápida según prefijo + muestra del contenido
+                    decision = self.compression.decide(carpeta, prefijo, size_mb)
+                    print(f"   🗜️  {'Store' if decision['level'] == 0 else 'Compresión mx=' + str(decision['level'])} ({decision['reason']})")
+
+                    t_compress = time.monotonic()
+                    if not self.security.compress_encrypt_7z(carpeta, dest_7z, metadata=metadata_json,
+                                                             volume_size_mb=volume_mb, level=decision['level']):
+                        self.jobs.fail(job['id'], "encriptación")
+                        continue
+
+                    volumes = self.security.list_volumes(dest_7z) if volume_mb else []
+                    archive_mb = sum(f.stat().st_size for f in (volumes or [dest_7z])) / (1024 * 1024)
+                    ratio = self.compression.record(prefijo, decision, size_mb, archive_mb, time.monotonic() - t_compress)
+                    print(f"{Fore.GREEN}   ✅ Encriptado ({archive_mb:.2f} MB, {ratio:.0%} del original).{Style.RESET_ALL}")
+
+                    # NUEVO: Manifiesto cifrado (contenido + rangos de bytes) para restauración parcial
+                    manifest_name = pd.NA
+                    manifest = self.security.build_archive_manifest(dest_7z, file_entries, volumes)
+                    if manifest:
+                        manifest_name = self.partial.save_manifest(hash_nombre, manifest)
+                    else:
+                        self.print_info("Sin manifiesto: este archivo solo admitirá restauración completa.")
 
                     # REGISTRO CON CATEGORÍA (Estrategia A: No guardar aun)
+                    # Los IDs se asignan recién al confirmar (ver _commit_record)
                     record = {
-                        'id_global': next_global, 'id_prefix': next_prefix, 'prefijo': prefijo,
+                        'prefijo': prefijo,
                         'categoria': categoria, # NUEVO CAMPO
                         'nombre_original': carpeta.name, 'nombre_original_encrypted': nombre_orig_encrypted,
                         'nombre_encriptado': hash_nombre, 'ruta_relativa': f"{prefijo}/",
                         'carpeta_hija': filename_7z, 'tamaño_mb': size_mb,
-                        'hash_md5': md5_hash, 'fecha_procesado': fecha_fmt, 'notas': "Auto Upload"
+                        'hash_md5': md5_hash, 'fecha_procesado': fecha_fmt, 'notas': "Auto Upload",
+                        'volumenes': len(volumes) if volumes else pd.NA,
+                        'manifiesto': manifest_name,
+                        'compresion': self.compression.label(decision, ratio),
+                        # NUEVO: Hash nativo del proveedor calculado localmente (verificación sin descargas)
+                        'hash_remoto': archive_fingerprint(self.cloud, volumes or [dest_7z]),
+                        'version_clave': self.security.key_id  # NUEVO: Clave maestra usada (rotación)
                     }
-                    
-                    print(f"{Fore.CYAN}⬆️  Subiendo a la nube...{Style.RESET_ALL}")
-                    
-                    # Subida a carpeta PREFIJO (Plana en la nube)
-                    if self.cloud.upload_file(dest_7z, prefijo):
+                    self.jobs.advance(job['id'], 'encrypted', self._job_artifacts(size_mb, signature, record, dest_7z, volumes))
+
+                if volumes:
+                    print(f"{Fore.CYAN}⬆️  Subiendo {len(volumes)} volúmenes en paralelo...{Style.RESET_ALL}")
+                    t_upload = time.monotonic()
+                    if self.cloud.upload_volumes(volumes, prefijo):
+                        volumes_mb = sum(v.stat().st_size for v in volumes) / (1024 * 1024)
+                        self.compression.observe_upload(volumes_mb, time.monotonic() - t_upload)
                         print(f"{Fore.GREEN}   ✅ Subida OK.{Style.RESET_ALL}")
-                        
-                        # SUBIDA OK -> REGISTRAMOS
-                        self.inventory.add_record(record)
-                        self.inventory.save_local()
+                        self.jobs.advance(job['id'], 'uploaded')
+                        self._commit_record(record, job['id'])
                         processed_count += 1
                     else:
-                        self.print_error("Fallo subida. No se registrará en índice.")
-                        self.safe_delete(dest_7z)
+                        # MEJORA: Los volúmenes se conservan; la próxima ejecución reintenta sin re-encriptar
+                        self.print_error("Fallo subida de volúmenes. No se registrará en índice (se reintentará).")
+                        self.jobs.fail(job['id'], "subida")
+                    continue
+
+                # NUEVO: Los .7z pequeños se acumulan y viajan juntos en una sola invocación rclone
+                archive_mb = dest_7z.stat().st_size / (1024 * 1024)
+                if archive_mb < BATCH_MAX_FILE_MB:
+                    print(f"{Fore.CYAN}🗂️  En cola para subida en lote ({prefijo}).{Style.RESET_ALL}")
+                    pending_batches.setdefault(prefijo, []).append((record, dest_7z, job['id']))
+                    if len(pending_batches[prefijo]) >= BATCH_MAX_FILES:
+                        processed_count += self._flush_upload_batch(source_path, prefijo, pending_batches.pop(prefijo))
+                    continue
+                
+                print(f"{Fore.CYAN}⬆️  Subiendo a la nube...{Style.RESET_ALL}")
+                
+                # Subida a carpeta PREFIJO (Plana en la nube)
+                t_upload = time.monotonic()
+                if self.cloud.upload_file(dest_7z, prefijo):
+                    self.compression.observe_upload(archive_mb, time.monotonic() - t_upload)
+                    print(f"{Fore.GREEN}   ✅ Subida OK.{Style.RESET_ALL}")
+                    
+                    # SUBIDA OK -> REGISTRAMOS
+                    self.jobs.advance(job['id'], 'uploaded')
+                    self._commit_record(record, job['id'])
+                    processed_count += 1
+                else:
+                    # MEJORA: El .7z se conserva; la próxima ejecución reintenta sin re-encriptar
+                    self.print_error("Fallo subida. No se registrará en índice (se reintentará).")
+                    self.jobs.fail(job['id'], "subida")
                 
             except Exception as e:
                 self.print_error(f"Error procesando {carpeta.name}: {e}")
 
+        if idx == 0:
+            return None  # El escáner no entregó ninguna unidad
+
+        # Vaciar los lotes pendientes
+        for prefijo in list(pending_batches):
+            try:
+                processed_count += self._flush_upload_batch(source_path, prefijo, pending_batches.pop(prefijo))
+            except Exception as e:
+                self.print_error(f"Error subiendo lote {prefijo}: {e}")
+
         print(f"\n{Fore.GREEN}✨ Lote completado.{Style.RESET_ALL}")
         print(f"🏁 Resumen: {processed_count} subidos, {skipped_count} duplicados omitidos.")
 
@@ -278,23 +506,135 @@ class AppOrchestrator:
             encrypted_index_path = self.inventory.save_encrypted_backup(self.security, prefix="UPLOAD")
             if encrypted_index_path:
                 # Subir índice a carpeta 'index/'
-                if self.cloud.upload_file(encrypted_index_path, "index/index_main.7z"):
+                if self.cloud.upload_file(encrypted_index_path, INDEX_REMOTE_PATH):
+                    self.index_sync.note_uploaded(encrypted_index_path, self.inventory.df)
                     self.print_success("Índice actualizado en 'index/'.")
                 else:
                     self.print_error("No se pudo subir índice.")
+            # Los manifiestos viajan junto al índice ('index/manifests')
+            if not self.partial.sync_manifests():
+                self.print_error("No se pudieron subir los manifiestos.")
             
         print(f"\n✅ Proceso finalizado.")
+        return processed_count
+
+    def run_watch_mode(self, source_path: Path = None, initial_scan: bool = True):
+        """
+        NUEVO: Vigila la carpeta padre y sube cada unidad nueva/modificada cuando queda quieta.
+        Un escaneo inicial opcional cubre lo creado mientras no se vigilaba. Ctrl+C para salir.
+        """
+        self.print_header("MODO VIGILANCIA")
+        if source_path is None:
+            path_str = input("📁 Carpeta PADRE a vigilar: ").strip().replace('"', '')
+            source_path = Path(path_str)
+        if not source_path.exists():
+            return self.print_error("La ruta no existe.")
+
+        # El watcher se arma antes del escaneo inicial: nada creado entre medio se pierde
+        watcher = FolderWatcher(source_path)
+        if initial_scan:
+            self.upload_items(source_path, self.cloud.iter_local_folders(source_path))
+
+        def _on_units(units):
+            self.print_info(f"👁️  {len(units)} carpetas nuevas/modificadas listas para subir.")
+            self.upload_items(source_path, units)
+
+        self.print_info("Vigilando cambios... (Ctrl+C para detener)")
+        try:
+            watcher.run(_on_units)
+        except KeyboardInterrupt:
+            self.print_info("Vigilancia detenida.")
+
+    def _commit_record(self, record: dict, job_id: int = None):
+        """Asigna IDs definitivos y confirma el registro en el índice local (commit)."""
+        next_global, next_prefix = self.inventory.get_next_ids(record['prefijo'])
+        record = {'id_global': next_global, 'id_prefix': next_prefix, **record}
+        self.inventory.add_record(record)
+        self.inventory.save_local()
+        if job_id is not None:
+            self.jobs.advance(job_id, 'committed')
+
+    @staticmethod
+    def _file_stamp(path: Path) -> list:
+        stat = path.stat()
+        return [stat.st_size, stat.st_mtime]
+
+    @staticmethod
+    def _folder_signature(folder: Path) -> str:
+        """Huella del contenido sin leerlo: ruta, tamaño y mtime de cada archivo."""
+        hasher = hashlib.sha1()
+        for path in sorted(p for p in folder.rglob("*") if p.is_file()):
+            stat = path.stat()
+            hasher.update(f"{path.relative_to(folder).as_posix()}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+        return hasher.hexdigest()
+
+    def _job_artifacts(self, size_mb: float, signature: str, record: dict, dest_7z: Path, volumes: list) -> dict:
+        """Estado reanudable de un trabajo encriptado: registro + archivos generados (con tamaño/mtime)."""
+        files = volumes or [dest_7z]
+        return {
+            'size_mb': size_mb, 'signature': signature, 'record': record, 'dest_7z': str(dest_7z),
+            'volumes': [str(v) for v in volumes],
+            'stamps': {str(f): self._file_stamp(Path(f)) for f in files}
+        }
+
+    def _resume_job(self, job: dict, size_mb: float, signature: str):
+        """
+        Valida si un trabajo pendiente puede retomarse. Retorna su payload o None (empezar de cero).
+        La carpeta no debe haber cambiado y los .7z deben seguir intactos en disco.
+        """
+        payload = job['payload']
+        if job['stage'] not in ('hashed', 'encrypted', 'uploaded') or not payload:
+            return None
+        # CORRECCIÓN: el tamaño total no alcanza (una edición puede conservarlo); se compara además
+        # la huella por archivo. Trabajos guardados sin huella no se pueden validar: se rehacen.
+        if abs(payload.get('size_mb', -1) - size_mb) > 1e-6 or payload.get('signature') != signature:
+            self.print_info("La carpeta cambió desde la ejecución anterior. Se procesa de nuevo.")
+            self.jobs.reset(job['id'])
+            return None
+        if job['stage'] == 'hashed':
+            return payload
+
+        for name, stamp in payload.get('stamps', {}).items():
+            path = Path(name)
+            if not path.exists() or self._file_stamp(path) != stamp:
+                self.print_info("El .7z de la ejecución anterior ya no está intacto. Se encripta de nuevo.")
+                self.jobs.reset(job['id'])
+                return None
+
+        # JSON guarda pd.NA como null: restaurar vacíos de columnas opcionales
+        payload['record'] = {k: (pd.NA if v is None else v) for k, v in payload['record'].items()}
+        return payload
+
+    def _flush_upload_batch(self, source_path: Path, prefijo: str, batch: list) -> int:
+        """
+        Sube un lote de .7z con una sola invocación rclone y confirma/revierte cada fila.
+        Retorna la cantidad de registros confirmados.
+        """
+        print(f"\n{Fore.CYAN}⬆️  Subiendo lote de {len(batch)} archivos a '{prefijo}'...{Style.RESET_ALL}")
+        results = self.cloud.upload_batch(source_path, [dest.name for _, dest, _ in batch], prefijo)
+
+        committed = 0
+        for record, dest_7z, job_id in batch:
+            if results.get(dest_7z.name):
+                self.jobs.advance(job_id, 'uploaded')
+                self._commit_record(record, job_id)
+                committed += 1
+            else:
+                # El .7z se conserva para reintentar la subida sin re-encriptar
+                self.print_error(f"Fallo subida de {record['nombre_original']}. No se registrará en índice (se reintentará).")
+                self.jobs.fail(job_id, "subida")
+        return committed
 
     def run_download_mode(self):
         self.print_header("MODO DESCARGA EXPLORADOR")
         
         self.print_info("Sincronizando índice...")
-        local_idx_enc = Path("data/temp/index_main_download.7z")
         
-        # Descargar desde 'index/'
-        if self.cloud.download_file("index/index_main.7z", local_idx_enc, silent=True):
-            if self.inventory.load_from_encrypted(self.security, local_idx_enc, temp_only=True):
-                self.print_success("Índice actualizado.")
+        # MEJORA: Reutiliza el prefetch del menú / la caché si el índice remoto no cambió
+        cloud_df = self.index_sync.get()
+        if cloud_df is not None:
+            self.inventory.df = cloud_df  # Modo solo lectura (no pisa el CSV local)
+            self.print_success("Índice actualizado.")
         else:
             self.print_info("Usando índice local.")
 
@@ -302,7 +642,6 @@ class AppOrchestrator:
         summary = self.inventory.get_prefixes_summary()
         if summary.empty: 
             self.print_error("Índice vacío.")
-            self.safe_delete(local_idx_enc)
             return
 
         print(f"\n{Fore.CYAN}📂 PREFIJOS DISPONIBLES:{Style.RESET_ALL}")
@@ -314,14 +653,12 @@ class AppOrchestrator:
         sel_idx = input("\n👉 Seleccione el NÚMERO (#) del Prefijo (o 0 para Salir): ").strip()
         
         if not sel_idx.isdigit() or int(sel_idx) == 0: 
-            self.safe_delete(local_idx_enc)
             return
 
         try:
             sel_prefix = summary.iloc[int(sel_idx)-1]['prefijo']
         except IndexError:
             self.print_error("Número inválido.")
-            self.safe_delete(local_idx_enc)
             return
 
         # 2. MENU CATEGORÍAS (NUEVO)
@@ -347,7 +684,6 @@ class AppOrchestrator:
         files_df = self.inventory.get_files_by_category(sel_prefix, sel_category)
         if files_df.empty: 
             self.print_error("Carpeta vacía.")
-            self.safe_delete(local_idx_enc)
             return
 
         print(f"\n{Fore.CYAN}📄 ARCHIVOS EN '{sel_prefix}' > '{sel_category}':{Style.RESET_ALL}")
@@ -355,10 +691,18 @@ class AppOrchestrator:
         view_df = files_df[['id_prefix', 'nombre_original', 'nombre_encriptado', 'tamaño_mb']].rename(columns={'id_prefix': 'ID'})
         print(tabulate(view_df, headers=['ID', 'Nombre Real', 'Nombre 7z', 'MB'], tablefmt='simple', showindex=False))
 
-        selection = input("\n👉 Ingrese IDs a descargar (ej: 3,4,5) o 'TODO' (0 Cancelar): ").strip()
+        selection = input("\n👉 Ingrese IDs a descargar (ej: 3,4,5), 'TODO', o V<ID> para ver contenido (0 Cancelar): ").strip()
         
         if selection == '0':
-            self.safe_delete(local_idx_enc)
+            return
+
+        # NUEVO: Explorar contenido y restaurar archivos sueltos (sin bajar el .7z completo)
+        if selection.upper().startswith('V') and selection[1:].strip().isdigit():
+            match = files_df[files_df['id_prefix'] == int(selection[1:].strip())]
+            if match.empty:
+                self.print_error("ID inválido.")
+            else:
+                self._explore_archive(match.iloc[0].to_dict())
             return
 
         to_download = pd.DataFrame()
@@ -370,45 +714,80 @@ class AppOrchestrator:
                 to_download = files_df[files_df['id_prefix'].isin(ids)]
             except ValueError:
                 self.print_error("Formato inválido.")
-                self.safe_delete(local_idx_enc)
                 return
 
         if to_download.empty: 
             self.print_error("Ningún archivo seleccionado.")
-            self.safe_delete(local_idx_enc)
             return
 
+        # NUEVO: Modo espejo (solo descarga lo que difiere de la copia local)
+        if input("👉 ¿Modo espejo? Solo restaura archivos distintos a los locales (s/N): ").strip().lower() == 's':
+            self.mirror_rows(to_download)
+        else:
+            self.restore_rows(to_download)
+
+    def restore_rows(self, to_download: pd.DataFrame) -> dict:
+        """Restaura las filas seleccionadas del índice. Retorna {'restored', 'failed'}."""
         total_items = len(to_download)
-        self.print_info(f"Iniciando descarga de {total_items} archivos...")
+        self.print_info(f"Iniciando restauración de {total_items} archivos (descarga y extracción en paralelo)...")
 
-        for i, (idx, row) in enumerate(to_download.iterrows(), 1):
-            nombre_real = row['nombre_original']
-            cat_archivo = row['categoria']
-            size_mb = row['tamaño_mb']
-            
-            remote_path = f"{row['ruta_relativa']}{row['nombre_encriptado']}.7z"
-            local_7z = Path(f"data/descargas/{row['nombre_encriptado']}.7z")
-            
-            # MEJORA: Destino organizado por Categoría
-            # data/desencriptados/Categoria/NombreReal
-            local_dest_folder = Path(f"data/desencriptados/{cat_archivo}/{nombre_real}")
+        if 'version_clave' in to_download.columns:
+            self._unlock_keys(to_download['version_clave'])
 
-            print(f"\n{Fore.BLUE}────────────────────────────────────────────────────────────{Style.RESET_ALL}")
-            print(f"{Fore.YELLOW}📥 Bajando: {nombre_real} (Size: {size_mb} MB) - ({i} de {total_items}){Style.RESET_ALL}")
-            
-            if self.cloud.download_file(remote_path, local_7z, silent=False):
-                print(f"{Fore.YELLOW}📦 Desencriptando y descomprimiendo...{Style.RESET_ALL}")
-                # security_manager maneja el aplanado
-                if self.security.decrypt_extract_7z(local_7z, local_dest_folder):
-                    print(f"{Fore.GREEN}   ✅ Restaurado en: {local_dest_folder}{Style.RESET_ALL}")
-                    self.safe_delete(local_7z)
-                else:
-                    self.print_error("Fallo en descompresión.")
-            else:
-                self.print_error("Fallo en descarga desde la nube.")
+        # MEJORA: Pipeline N descargas -> cola acotada -> M extracciones (ordenado por tamaño)
+        pipeline = RestorePipeline(self.cloud, self.security, cleanup=self.safe_delete, cache=self.cache)
+        result = pipeline.run(to_download.to_dict('records'))
+
+        for job in result['restored']:
+            print(f"{Fore.GREEN}   ✅ Restaurado en: {job['dest_folder']}{Style.RESET_ALL}")
+        for job in result['failed']:
+            self.print_error(f"Fallo en {job['error']}: {job['name']}")
         
-        self.safe_delete(local_idx_enc) 
         print(f"\n{Fore.GREEN}✨ Lote completado.{Style.RESET_ALL}")
+        return result
+
+    def mirror_rows(self, to_download: pd.DataFrame, prune: bool = True) -> dict:
+        """Restauración espejo: omite carpetas idénticas y solo restaura los archivos que difieren."""
+        self.print_info(f"Comparando {len(to_download)} archivos con la copia local...")
+        if 'version_clave' in to_download.columns:
+            self._unlock_keys(to_download['version_clave'])
+
+        mirror = MirrorRestorer(self.partial, full_restore=self.restore_rows)
+        report = mirror.run(to_download.to_dict('records'), prune=prune)
+
+        print(f"\n{Fore.GREEN}🪞 Espejo: {report['skipped']} idénticos, {report['synced']} sincronizados, "
+              f"{report['full']} completos ({report['files_restored']} archivos restaurados, "
+              f"{report['files_same']} sin cambios, {report['files_pruned']} eliminados).{Style.RESET_ALL}")
+        for row in report['failed']:
+            self.print_error(f"Fallo: {row['nombre_original']}")
+        return report
+
+    def _explore_archive(self, row: dict):
+        """Lista el contenido de un archivo (manifiesto) y restaura solo los elegidos."""
+        self._unlock_keys([row.get('version_clave')])
+        contents = self.partial.list_contents(row)
+        if not contents:
+            self.print_error("Sin manifiesto disponible (archivo subido con una versión anterior). Use la descarga completa.")
+            return
+
+        print(f"\n{Fore.CYAN}🗂️  CONTENIDO DE '{row['nombre_original']}':{Style.RESET_ALL}")
+        view = [(i, f['path'], f"{f['size'] / (1024 * 1024):.2f}") for i, f in enumerate(contents, start=1)]
+        print(tabulate(view, headers=['#', 'Ruta', 'MB'], tablefmt='simple'))
+
+        selection = input("\n👉 Números a restaurar (ej: 1,4,7) (0 Cancelar): ").strip()
+        if selection == '0' or not selection:
+            return
+        try:
+            picks = [contents[int(x.strip()) - 1]['path'] for x in selection.split(',')]
+        except (ValueError, IndexError):
+            return self.print_error("Formato inválido.")
+
+        dest_folder = DATA_DIR / "desencriptados" / str(row['categoria']) / str(row['nombre_original'])
+        self.print_info(f"Restaurando {len(picks)} archivos (solo los rangos necesarios)...")
+        if self.partial.restore_files(row, picks, dest_folder):
+            self.print_success(f"Restaurado en: {dest_folder}")
+        else:
+            self.print_error("Fallo en la restauración parcial.")
 
     def run_query_mode(self):
         self.print_header("CONSULTA")
@@ -421,6 +800,13 @@ class AppOrchestrator:
         self.print_header("MANTENIMIENTO")
         print("1. Verificar conexión a Nube")
         print("2. Limpiar temporales")
+        print("3. Vaciar caché de archivos cifrados")
+        print("4. Trabajos de subida pendientes (reanudables)")
+        print("5. Verificar integridad de archivos en la nube (scrub)")
+        print("6. Conciliar índice vs nube (huérfanos / faltantes)")
+        print("7. Reconstruir índice desde la nube (metadatos de cada .7z)")
+        print("8. Auditar tokens de nombres del índice")
+        print("9. Rotar clave maestra (re-cifrado en segundo plano)")
         op = input("Opción: ")
         if op == "1":
             if self.cloud.check_connection(): self.print_success("Conexión Rclone OK")
@@ -428,6 +814,246 @@ class AppOrchestrator:
         elif op == "2":
             self.cloud.clean_temp()
             self.print_success("Temporales limpios.")
+        elif op == "3":
+            stats = self.cache.stats()
+            self.cache.clear()
+            self.print_success(f"Caché vaciada ({stats['entries']} archivos, {stats['used_mb']:.2f} MB liberados).")
+        elif op == "4":
+            self._manage_pending_jobs()
+        elif op == "5":
+            self.run_scrub()
+        elif op == "6":
+            full = input("¿Forzar listado completo de la nube? (s/N): ").strip().lower() == 's'
+            self.run_reconcile(force_full=full)
+        elif op == "7":
+            print(f"{Fore.YELLOW}⚠️  El índice reconstruido REEMPLAZA al índice local.{Style.RESET_ALL}")
+            if input("¿Continuar? (s/N): ").strip().lower() == 's':
+                fresh = input("¿Descartar el avance de una reconstrucción anterior? (s/N): ").strip().lower() == 's'
+                self.run_rebuild(fresh=fresh, upload=input("¿Subir el índice a la nube al terminar? (s/N): ").strip().lower() == 's')
+        elif op == "8":
+            self.run_audit()
+        elif op == "9":
+            self._manage_key_rotation()
+
+    def run_scrub(self, max_prefixes: int = None) -> dict:
+        """
+        Verifica contra la nube el índice oficial (no el CSV local) sin descargar los archivos,
+        salvo una pequeña muestra. Retorna el estado de la pasada.
+        """
+        cloud_df = self.index_sync.get()
+        df = cloud_df if cloud_df is not None else self.inventory.df
+        state = Scrubber(self.cloud, self.security).run(df, max_prefixes=max_prefixes)
+
+        c = state['counts']
+        print(f"\n🔎 Revisados: {c['checked']} | OK: {c['ok']} | Faltantes: {c['missing']} | "
+              f"Distintos: {c['mismatch']} | Sin huella: {c['unverified']} | "
+              f"Muestras: {c['sampled']} ({c['sample_failed']} fallidas)")
+        if state['problems']:
+            view = [(p['prefijo'], p['id_prefix'], p['nombre_original'], p['archivo'], p['estado'])
+                    for p in state['problems']]
+            print(tabulate(view, headers=['Prefijo', 'ID', 'Nombre', 'Archivo', 'Estado'], tablefmt='simple'))
+        if state.get('complete'):
+            self.print_success("Pasada de scrub completa.")
+        else:
+            self.print_info("Pasada parcial: la próxima ejecución continúa donde quedó.")
+        return state
+
+    def run_reconcile(self, force_full: bool = False):
+        """Cruza el índice oficial contra el listado (cacheado) de la nube. Retorna el reporte o None."""
+        cloud_df = self.index_sync.get()
+        df = cloud_df if cloud_df is not None else self.inventory.df
+        report = Reconciler(self.cloud).reconcile(df, force_full=force_full)
+        if report is None:
+            self.print_error("No se pudo listar la nube.")
+            return None
+
+        # Huérfanos que corresponden a subidas pendientes de confirmar (se registran al reanudar)
+        resumable = {
+            j['payload'].get('record', {}).get('nombre_encriptado')
+            for j in self.jobs.pending() if j['stage'] == 'uploaded'
+        }
+        for orphan, hash_name in zip(report['orphans'], Reconciler.orphan_hash_names(report)):
+            orphan['nota'] = 'trabajo pendiente' if hash_name in resumable else ''
+
+        print(f"\n🧮 {report['records']} registros vs {report['objects']} objetos "
+              f"(listado de hace {report['listing_age_s']:.0f}s, cruce en {report['elapsed_s']:.2f}s)")
+        print(f"   OK: {report['ok']} | Sin huella: {report['unverified']} | Faltantes: {len(report['missing'])} | "
+              f"Distintos: {len(report['mismatch'])} | Huérfanos: {len(report['orphans'])}")
+        for key, title in (('missing', 'FALTANTES EN LA NUBE'), ('mismatch', 'TAMAÑO/HASH DISTINTO'), ('orphans', 'HUÉRFANOS')):
+            if report[key]:
+                print(f"\n{Fore.YELLOW}{title} (primeros 50):{Style.RESET_ALL}")
+                print(tabulate(report[key][:50], headers='keys', tablefmt='simple'))
+        self.print_info("Reporte completo en data/index/reconcile_report.json")
+        return report
+
+    def run_rebuild(self, fresh: bool = False, upload: bool = False) -> Optional[pd.DataFrame]:
+        """
+        Reconstruye el índice leyendo metadatos.json de cada .7z remoto (solo los rangos necesarios).
+        Reemplaza el índice local; si 'upload', también el de la nube. Retorna el DataFrame o None.
+        """
+        def progress(done, total):
+            if done == total or done % 50 == 0:
+                print(f"\r🧱 Leídos {done}/{total}", end="" if done < total else "\n", flush=True)
+
+        df = IndexRebuilder(self.cloud, self.security).rebuild(fresh=fresh, progress=progress)
+        if df is None:
+            self.print_error("No se pudo listar la nube.")
+            return None
+
+        self.inventory.df = df
+        self.inventory.save_local()
+        self.print_success(f"Índice reconstruido: {len(df)} registros.")
+        encrypted = self.inventory.save_encrypted_backup(self.security, prefix="REBUILD")
+        if upload and encrypted:
+            if self.cloud.upload_file(encrypted, INDEX_REMOTE_PATH):
+                self.index_sync.note_uploaded(encrypted, self.inventory.df)
+                self.print_success("Índice actualizado en 'index/'.")
+            else:
+                self.print_error("No se pudo subir índice.")
+        return df
+
+    def run_audit(self, workers: int = None) -> dict:
+        """Desencripta todos los tokens del índice local y reporta filas corruptas o inconsistentes."""
+        report = IndexAuditor(self.security).audit(self.inventory.df, workers=workers)
+        print(f"\n🔐 {report['rows']} filas en {report['elapsed_s']:.1f}s ({report['rows_per_s']} filas/s, "
+              f"{report['workers']} procesos)")
+        print(f"   OK: {report['ok']} | Sin token: {report['no_token']} | Otra clave: {report['other_key']} | "
+              f"Corruptos: {len(report['corrupt'])} | "
+              f"Nombre distinto: {len(report['mismatch'])} | Hash distinto: {len(report['hash_mismatch'])}")
+        for key, title in (('corrupt', 'TOKENS CORRUPTOS'), ('mismatch', 'NOMBRE DISTINTO AL TOKEN'),
+                           ('hash_mismatch', 'HASH DE ARCHIVO DISTINTO')):
+            if report[key]:
+                print(f"\n{Fore.YELLOW}{title} (primeros 50):{Style.RESET_ALL}")
+                print(tabulate(report[key][:50], headers='keys', tablefmt='simple'))
+        self.print_info("Reporte completo en data/index/audit_report.json")
+        return report
+
+    # --- CLAVES MAESTRAS (ROTACIÓN) ---
+
+    def _unlock_keys(self, key_ids: Iterable) -> None:
+        """Pide (si hay terminal) la contraseña de las claves maestras que la sesión no tiene cargadas."""
+        missing = sorted({k for k in key_ids if isinstance(k, str) and k and self.security.for_key(k) is None})
+        for key_id in missing:
+            if not sys.stdin.isatty():
+                self.print_error(f"Hay archivos cifrados con otra clave maestra ({key_id}); no se podrán abrir.")
+                continue
+            other = SecurityManager(getpass.getpass(f"   🔑 Contraseña MAESTRA de la clave {key_id}: "))
+            if other.key_id == key_id:
+                self.security.register_key(other)
+                self.print_success(f"Clave {key_id} cargada.")
+            else:
+                self.print_error("La contraseña no corresponde a esa clave.")
+
+    def _publish_index(self) -> bool:
+        """Guarda el índice cifrado y lo sube junto a los manifiestos. True si llegó a la nube."""
+        encrypted = self.inventory.save_encrypted_backup(self.security, prefix="ROTATION")
+        if not encrypted or not self.cloud.upload_file(encrypted, INDEX_REMOTE_PATH):
+            return False
+        self.index_sync.note_uploaded(encrypted, self.inventory.df)
+        return self.partial.sync_manifests()
+
+    def _finish_key_rotation(self, new_security: SecurityManager):
+        """El testigo maestro pasa a la clave nueva y la sesión sigue con ella (la anterior queda registrada)."""
+        local_witness = KEYS_DIR / "witness_master.7z"
+        staged = KEYS_DIR / "witness_master_new.7z"
+        if new_security.create_password_witness(staged, new_security.master_password) \
+                and self.cloud.upload_file(staged, "keys/witness_master.7z"):
+            os.replace(staged, local_witness)
+            self._remember_witness(local_witness, "keys/witness_master.7z")
+        else:
+            self.print_error("No se pudo actualizar el testigo maestro: reintente la rotación para publicarlo.")
+            return
+        new_security.register_key(self.security)
+        self.security = self.partial.security = self.index_sync.security = new_security
+        self.print_success("Rotación completa: desde ahora se ingresa con la contraseña maestra nueva.")
+
+    def run_key_rotation(self, new_password: str, background: bool = False, max_rows: int = None) -> Optional[dict]:
+        """
+        Re-cifra los archivos con la clave nueva (KeyRotator). En segundo plano retorna enseguida;
+        en primer plano retorna el estado al terminar o al llegar a 'max_rows'. None si no puede iniciar.
+        """
+        new_security = SecurityManager(new_password)
+        rotator = KeyRotator(self.cloud, self.security, self.inventory, self._publish_index)
+        try:
+            state = rotator.begin(new_security)
+        except ValueError as e:
+            self.print_error(str(e))
+            return None
+
+        def work():
+            try:
+                result = rotator.run(new_security, stop=self._rotation_stop, max_rows=max_rows)
+            except ValueError as e:
+                self.print_error(str(e))
+                return None
+            if result['complete']:
+                self._finish_key_rotation(new_security)
+            return result
+
+        self._rotation_stop.clear()
+        if not background:
+            return work()
+        self._rotation_thread = threading.Thread(target=work, name="key-rotation", daemon=True)
+        self._rotation_thread.start()
+        self.print_info("Rotación en segundo plano. Vuelva a esta opción para ver el avance o detenerla.")
+        return state
+
+    def _manage_key_rotation(self):
+        state = KeyRotator.load_state()
+        if state:
+            print(f"🔑 {state['from_key']} → {state['to_key']} | Rotados: {state['rotated']} | "
+                  f"Fallidos: {len(state['failed'])} | Completa: {'sí' if state.get('complete') else 'no'}")
+        if self._rotation_thread and self._rotation_thread.is_alive():
+            if input("Rotación en curso. ¿Detenerla? (s/N): ").strip().lower() == 's':
+                self._rotation_stop.set()
+                self.print_info("Se detendrá al terminar el archivo actual (se puede retomar luego).")
+            return
+
+        resuming = bool(state) and not state.get('complete')
+        prompt = "¿Retomar la rotación?" if resuming else "¿Rotar la clave maestra? Todos los archivos se re-cifrarán"
+        if input(f"{prompt} (s/N): ").strip().lower() != 's':
+            return
+        while True:
+            new_pass = getpass.getpass("   🔑 Contraseña MAESTRA nueva: ")
+            if len(new_pass) >= 12 and (resuming or new_pass == getpass.getpass("   🔑 Confirme nueva: ")):
+                break
+            self.print_error("Debe tener al menos 12 caracteres y coincidir.")
+        self.run_key_rotation(new_pass, background=True)
+
+    def _manage_pending_jobs(self):
+        """Lista los trabajos sin confirmar y permite descartarlos (borra sus .7z y manifiestos)."""
+        pending = self.jobs.pending()
+        if not pending:
+            return self.print_success("No hay trabajos pendientes.")
+
+        view = [
+            (j['id'], Path(j['carpeta']).name, j['prefijo'], j['stage'], j['attempts'], j['last_error'] or '')
+            for j in pending
+        ]
+        print(tabulate(view, headers=['ID', 'Carpeta', 'Prefijo', 'Etapa', 'Fallos', 'Último error'], tablefmt='simple'))
+        print("Se retoman automáticamente al volver a procesar la misma carpeta padre.")
+
+        selection = input("\n👉 IDs a descartar (ej: 3,4), 'TODO' o Enter para volver: ").strip()
+        if not selection:
+            return
+        if selection.upper() == 'TODO':
+            targets = pending
+        else:
+            try:
+                ids = {int(x.strip()) for x in selection.split(',')}
+            except ValueError:
+                return self.print_error("Formato inválido.")
+            targets = [j for j in pending if j['id'] in ids]
+
+        for job in targets:
+            payload = job['payload']
+            for name in payload.get('stamps', {}):
+                self.safe_delete(Path(name))
+            record = payload.get('record') or {}
+            if record.get('nombre_encriptado'):
+                self.partial.discard_manifest(record['nombre_encriptado'])
+            self.jobs.remove(job['id'])
+        self.print_success(f"{len(targets)} trabajos descartados.")
 
 if __name__ == "__main__":
     app = AppOrchestrator()
@@ -0,0 +1,151 @@
+# mirror_restore.py
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from config import logger, DATA_DIR, INDEX_DIR, RESTORE_HASH_WORKERS
+
+DIGEST_CACHE_PATH = INDEX_DIR / "mirror_digests.json"
+
+
+class MirrorRestorer:
+    """
+    RESTAURACIÓN ESPEJO (INCREMENTAL)
+    Sincroniza data/desencriptados/<Categoria>/<nombre> con lo que hay en la nube sin vaciar el destino:
+    - Compara el manifiesto de cada .7z (ruta, tamaño, MD5 por archivo) contra los archivos locales.
+      El MD5 local se cachea por (tamaño, mtime) en data/index/mirror_digests.json: una segunda
+      pasada sin cambios no lee ningún archivo.
+    - Carpeta idéntica: se omite sin descargar nada.
+    - Si no: solo los archivos distintos o faltantes se restauran por rangos (PartialRestorer)
+      y los que sobran localmente se borran (prune).
+    - Filas sin manifiesto (subidas antiguas) pasan a la restauración completa ('full_restore').
+    """
+
+    def __init__(self, partial, full_restore: Callable[[pd.DataFrame], Dict], output_dir: Path = None):
+        self.partial = partial
+        self.full_restore = full_restore
+        self.output_dir = Path(output_dir or DATA_DIR / "desencriptados")
+        self._lock = threading.Lock()
+        self._cache = self._load_cache()
+
+    # --- CACHÉ DE DIGESTS LOCALES ---
+
+    @staticmethod
+    def _load_cache() -> Dict[str, Dict]:
+        try:
+            return json.loads(DIGEST_CACHE_PATH.read_text(encoding='utf-8'))
+        except Exception:
+            return {}
+
+    def _save_cache(self):
+        DIGEST_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = DIGEST_CACHE_PATH.with_suffix(".tmp")
+        with self._lock:
+            tmp.write_text(json.dumps(self._cache), encoding='utf-8')
+        os.replace(tmp, DIGEST_CACHE_PATH)
+
+    def _remember(self, path: Path, md5: str):
+        st = path.stat()
+        with self._lock:
+            self._cache[str(path)] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'md5': md5}
+
+    def local_md5(self, path: Path) -> Optional[str]:
+        """MD5 de un archivo local (cacheado mientras no cambien tamaño ni mtime). None si no existe."""
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._cache.get(str(path))
+        if cached and cached['size'] == st.st_size and cached['mtime_ns'] == st.st_mtime_ns:
+            return cached['md5']
+        md5 = self.partial.security.file_md5(path)
+        self._remember(path, md5)
+        return md5
+
+    # --- COMPARACIÓN ---
+
+    def dest_folder(self, row: Dict) -> Path:
+        return self.output_dir / str(row['categoria']) / str(row['nombre_original'])
+
+    @staticmethod
+    def _local_path(dest: Path, member: str) -> Path:
+        # 'Carpeta/sub/a.txt' -> dest/sub/a.txt (misma regla que la extracción)
+        return dest.joinpath(*(Path(member).parts[1:] or Path(member).parts))
+
+    def diff(self, row: Dict, manifest: Dict) -> Dict:
+        """Retorna {'changed': [rutas internas], 'extra': [Paths locales], 'same': n}."""
+        dest = self.dest_folder(row)
+        files = manifest['files']
+        with ThreadPoolExecutor(max_workers=max(1, RESTORE_HASH_WORKERS)) as pool:
+            def check(entry):
+                local = self._local_path(dest, entry['path'])
+                try:
+                    if local.stat().st_size != entry['size']:
+                        return False  # Tamaño distinto: no hace falta leerlo
+                except OSError:
+                    return False
+                return self.local_md5(local) == entry['md5']
+            matches = list(pool.map(check, files))
+
+        expected = {self._local_path(dest, f['path']) for f in files}
+        extra = [p for p in dest.rglob("*") if p.is_file() and p not in expected] if dest.exists() else []
+        return {
+            'changed': [f['path'] for f, ok in zip(files, matches) if not ok],
+            'extra': extra,
+            'same': sum(matches)
+        }
+
+    # --- EJECUCIÓN ---
+
+    def run(self, rows: List[Dict], prune: bool = True) -> Dict:
+        """Sincroniza las filas. Retorna contadores y las filas fallidas."""
+        report = {'archives': len(rows), 'skipped': 0, 'synced': 0, 'full': 0,
+                  'files_same': 0, 'files_restored': 0, 'files_pruned': 0, 'failed': []}
+        without_manifest = []
+        try:
+            for row in rows:
+                manifest = self.partial.load_manifest(row)
+                if not manifest:
+                    without_manifest.append(row)
+                    continue
+
+                delta = self.diff(row, manifest)
+                report['files_same'] += delta['same']
+                if prune:
+                    for path in delta['extra']:
+                        path.unlink(missing_ok=True)
+                        with self._lock:
+                            self._cache.pop(str(path), None)
+                    report['files_pruned'] += len(delta['extra'])
+
+                if not delta['changed']:
+                    report['skipped'] += 1
+                    continue
+
+                logger.info(f"🪞 {row['nombre_original']}: {len(delta['changed'])} de {len(manifest['files'])} archivos distintos.")
+                dest = self.dest_folder(row)
+                if not self.partial.restore_files(row, delta['changed'], dest):
+                    report['failed'].append(row)
+                    continue
+                # restore_files ya verificó cada MD5 contra el manifiesto: se cachean sin releer
+                by_path = {f['path']: f['md5'] for f in manifest['files']}
+                for member in delta['changed']:
+                    self._remember(self._local_path(dest, member), by_path[member])
+                report['synced'] += 1
+                report['files_restored'] += len(delta['changed'])
+
+            if without_manifest:
+                logger.info(f"📦 {len(without_manifest)} archivos sin manifiesto: restauración completa.")
+                # CORRECCIÓN: restore_rows recibe un DataFrame (usa .columns y .to_dict), no una lista
+                result = self.full_restore(pd.DataFrame(without_manifest))
+                report['full'] = len(result['restored'])
+                report['failed'] += [job['row'] for job in result['failed']]
+        finally:
+            self._save_cache()
+        return report
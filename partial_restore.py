@@ -0,0 +1,164 @@
+# partial_restore.py
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import logger, INDEX_DIR, TEMP_DIR, RESTORE_DL_WORKERS
+from security_manager import SEVEN_ZIP_START_HEADER_SIZE
+
+# Manifiestos cifrados: se guardan junto al índice (local y nube)
+MANIFEST_DIR = INDEX_DIR / "manifests"
+MANIFEST_REMOTE_DIR = "index/manifests"
+MANIFEST_EXT = ".mf"
+
+# Rangos separados por menos de esto se piden juntos (menos invocaciones rclone)
+RANGE_MERGE_GAP = 256 * 1024
+
+
+class PartialRestorer:
+    """
+    RESTAURACIÓN PARCIAL
+    Usa el manifiesto cifrado de cada archivo (ruta, tamaño, MD5 y rango de bytes) para:
+    - Listar el contenido de un .7z sin descargarlo.
+    - Restaurar archivos sueltos descargando solo el encabezado y los bloques que los contienen
+      sobre un archivo disperso (sparse) del mismo tamaño que el original.
+    """
+
+    def __init__(self, cloud, security):
+        self.cloud = cloud
+        self.security = security
+
+    # --- PERSISTENCIA DE MANIFIESTOS ---
+
+    @staticmethod
+    def manifest_name(hash_name: str) -> str:
+        return f"{hash_name}{MANIFEST_EXT}"
+
+    def save_manifest(self, hash_name: str, manifest: Dict) -> str:
+        """Guarda el manifiesto cifrado en data/index/manifests. Retorna el nombre del archivo."""
+        MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
+        name = self.manifest_name(hash_name)
+        (MANIFEST_DIR / name).write_bytes(self.security.encrypt_manifest(manifest))
+        return name
+
+    def discard_manifest(self, hash_name: str):
+        (MANIFEST_DIR / self.manifest_name(hash_name)).unlink(missing_ok=True)
+
+    def sync_manifests(self) -> bool:
+        """Sube los manifiestos nuevos a 'index/manifests' (copy: nunca borra los remotos)."""
+        if not MANIFEST_DIR.exists() or not any(MANIFEST_DIR.iterdir()):
+            return True
+        return self.cloud._run_rclone_scheduled([
+            "copy", str(MANIFEST_DIR), self.cloud._build_remote_path(MANIFEST_REMOTE_DIR)
+        ], kind="upload")
+
+    def load_manifest(self, row: Dict) -> Optional[Dict]:
+        """Carga el manifiesto de una fila (copia local o descarga desde la nube)."""
+        name = self.manifest_name(row['nombre_encriptado'])
+        local = MANIFEST_DIR / name
+        if not local.exists():
+            if not self.cloud.download_file(f"{MANIFEST_REMOTE_DIR}/{name}", local, silent=True):
+                return None
+        security = self.security.for_key(row.get('version_clave'))
+        if security is None:
+            logger.error(f"❌ Manifiesto cifrado con otra clave maestra ({row.get('version_clave')}).")
+            return None
+        return security.decrypt_manifest(local.read_bytes())
+
+    # --- CONSULTA ---
+
+    def list_contents(self, row: Dict) -> Optional[List[Dict]]:
+        manifest = self.load_manifest(row)
+        return manifest['files'] if manifest else None
+
+    # --- RANGOS ---
+
+    @staticmethod
+    def _merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Une rangos (inicio, largo) solapados o cercanos."""
+        merged = []
+        for start, length in sorted(r for r in ranges if r[1] > 0):
+            end = start + length
+            if merged and start <= merged[-1][1] + RANGE_MERGE_GAP:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return [(s, e - s) for s, e in merged]
+
+    @staticmethod
+    def _segments(row: Dict, manifest: Dict, start: int, length: int) -> List[Tuple[str, int, int, int]]:
+        """
+        Traduce un rango absoluto del archivo a (ruta_remota, offset_remoto, largo, offset_absoluto),
+        repartiéndolo entre volúmenes cuando el archivo es multi-volumen.
+        """
+        base_remote = f"{row['ruta_relativa']}{row['nombre_encriptado']}.7z"
+        volume_size = manifest.get('volume_size') or 0
+        if not volume_size:
+            return [(base_remote, start, length, start)]
+
+        segments, cursor, end = [], start, start + length
+        while cursor < end:
+            vol_index = cursor // volume_size
+            vol_start = vol_index * volume_size
+            chunk = min(end, vol_start + volume_size) - cursor
+            segments.append((f"{base_remote}.{vol_index + 1:03d}", cursor - vol_start, chunk, cursor))
+            cursor += chunk
+        return segments
+
+    # --- RESTAURACIÓN ---
+
+    def restore_files(self, row: Dict, paths: List[str], dest_folder: Path) -> bool:
+        """Restaura solo 'paths' (rutas internas del manifiesto) en dest_folder."""
+        manifest = self.load_manifest(row)
+        if not manifest:
+            logger.error("❌ Este archivo no tiene manifiesto (subido con una versión anterior).")
+            return False
+
+        files = {f['path']: f for f in manifest['files']}
+        selected = [files[p] for p in paths if p in files]
+        if not selected:
+            logger.error("❌ Ninguna ruta seleccionada existe en el manifiesto.")
+            return False
+
+        header = manifest['header']
+        ranges = [(0, SEVEN_ZIP_START_HEADER_SIZE), (header['offset'], header['size'])]
+        ranges += [(f['offset'], f['length']) for f in selected if f.get('offset') is not None]
+        ranges = self._merge_ranges(ranges)
+        segments = [seg for start, length in ranges for seg in self._segments(row, manifest, start, length)]
+
+        needed = sum(length for _, length in ranges)
+        logger.info(
+            f"🧩 Restauración parcial: {len(selected)} archivos, {needed / (1024 * 1024):.2f} MB "
+            f"de {manifest['archive_size'] / (1024 * 1024):.2f} MB ({len(segments)} rangos)."
+        )
+
+        # Archivo disperso del tamaño original: solo se rellenan los rangos necesarios
+        sparse = TEMP_DIR / f"partial_{row['nombre_encriptado']}.7z"
+        sparse.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(sparse, "wb") as f:
+                f.truncate(manifest['archive_size'])
+
+            def _fetch(seg):
+                remote_path, remote_offset, count, abs_offset = seg
+                return self.cloud.download_range(remote_path, remote_offset, count, sparse, abs_offset)
+
+            with ThreadPoolExecutor(max_workers=max(1, RESTORE_DL_WORKERS)) as pool:
+                if not all(pool.map(_fetch, segments)):
+                    return False
+
+            security = self.security.for_key(row.get('version_clave'))
+            if not security.extract_selected_7z(sparse, [f['path'] for f in selected], Path(dest_folder)):
+                return False
+
+            # Verificación contra el manifiesto (archivos chicos: relectura barata)
+            ok = True
+            for f in selected:
+                rel_parts = Path(f['path']).parts[1:] or Path(f['path']).parts
+                restored = Path(dest_folder).joinpath(*rel_parts)
+                if self.security.file_md5(restored) != f['md5']:
+                    logger.error(f"❌ MD5 no coincide: {f['path']}")
+                    ok = False
+            return ok
+        finally:
+            sparse.unlink(missing_ok=True)
@@ -0,0 +1,206 @@
+# reconciler.py
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from config import (
+    logger, INDEX_DIR, VALID_PREFIXES,
+    RECONCILE_LISTING_TTL, RECONCILE_FULL_EVERY_HOURS
+)
+from scrubber import Scrubber, archive_paths
+
+LISTING_CACHE_PATH = INDEX_DIR / "remote_listing.json"
+REPORT_PATH = INDEX_DIR / "reconcile_report.json"
+ARCHIVE_RE = re.compile(r"\.7z(\.\d{3})?$")
+ROW_COLUMNS = ['prefijo', 'id_prefix', 'nombre_original', 'nombre_encriptado',
+               'ruta_relativa', 'volumenes', 'hash_remoto']
+
+
+class RemoteListingCache:
+    """
+    LISTADO REMOTO CACHEADO
+    Un 'lsjson -R' de toda la carpeta base, guardado en data/index/remote_listing.json:
+    - Más nuevo que RECONCILE_LISTING_TTL: se usa tal cual (sin llamadas a la nube).
+    - Vencido: refresco incremental ('--max-age' desde el último listado) que agrega
+      los objetos nuevos o modificados.
+    - Cada RECONCILE_FULL_EVERY_HOURS (o con force_full) listado completo, que además
+      detecta lo borrado en la nube.
+    - refresh_folders relista carpetas puntuales sin '--max-age' (ver Reconciler.reconcile).
+    """
+
+    def __init__(self, cloud):
+        self.cloud = cloud
+        self.entries: Dict[str, Dict] = {}
+        self.taken_at = 0.0       # Último refresco (completo o incremental)
+        self.full_at = 0.0        # Último listado completo
+        self.hash_type: Optional[str] = None
+        self._load()
+
+    def _load(self):
+        try:
+            data = json.loads(LISTING_CACHE_PATH.read_text(encoding='utf-8'))
+        except Exception:
+            return
+        self.entries = data.get('entries', {})
+        self.taken_at = data.get('taken_at', 0.0)
+        self.full_at = data.get('full_at', 0.0)
+        self.hash_type = data.get('hash_type')
+
+    def _save(self):
+        LISTING_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = LISTING_CACHE_PATH.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            'taken_at': self.taken_at, 'full_at': self.full_at,
+            'hash_type': self.hash_type, 'entries': self.entries
+        }), encoding='utf-8')
+        os.replace(tmp, LISTING_CACHE_PATH)
+
+    def age(self) -> float:
+        return time.time() - self.taken_at if self.taken_at else float('inf')
+
+    def refresh(self, force_full: bool = False) -> bool:
+        """Actualiza el listado según TTL. Retorna False si no se pudo listar (se conserva el anterior)."""
+        now = time.time()
+        hash_type = self.cloud.remote_hash_type()
+        full_due = (force_full or not self.full_at or hash_type != self.hash_type
+                    or now - self.full_at > RECONCILE_FULL_EVERY_HOURS * 3600)
+
+        if not full_due and now - self.taken_at <= RECONCILE_LISTING_TTL:
+            return True
+
+        if full_due:
+            logger.info("📡 Listando la nube completa (lsjson -R)...")
+            items = self.cloud.list_remote_tree("", hash_type)
+            if items is None:
+                return False
+            self.entries = {}
+        else:
+            # Margen de 5 min por diferencias de reloj entre el equipo y el proveedor
+            minutes = int((now - self.taken_at) / 60) + 5
+            logger.info(f"📡 Refresco incremental del listado (últimos {minutes} min)...")
+            items = self.cloud.list_remote_tree("", hash_type, max_age=f"{minutes}m")
+            if items is None:
+                return False
+
+        for item in items:
+            path = item.pop('path')
+            self.entries[path] = item
+        self.taken_at = now
+        if full_due:
+            self.full_at = now
+        self.hash_type = hash_type
+        self._save()
+        return True
+
+    def refresh_folders(self, folders: List[str]) -> int:
+        """Relista completas estas carpetas y reemplaza sus entradas. Retorna cuántas se pudieron listar."""
+        listed = 0
+        for folder in folders:
+            items = self.cloud.list_remote_tree(folder, self.hash_type)
+            if items is None:
+                continue
+            prefix = f"{folder.strip('/')}/"
+            for path in [p for p in self.entries if p.startswith(prefix)]:
+                del self.entries[path]
+            for item in items:
+                self.entries[item.pop('path')] = item
+            listed += 1
+        if listed:
+            self._save()
+        return listed
+
+
+class Reconciler:
+    """
+    CONCILIACIÓN ÍNDICE ↔ NUBE
+    Cruza cada registro (ruta_relativa + nombre_encriptado) contra el listado cacheado usando
+    búsquedas en diccionarios (O(registros + objetos)), sin una llamada a la nube por archivo.
+    Reporta:
+    - missing: registros cuyo archivo (o algún volumen) no está en la nube.
+    - mismatch: tamaño/hash distinto a la huella guardada al subir ('hash_remoto').
+    - orphans: .7z en carpetas PREFIJO que ningún registro referencia (ej: subida sin commit).
+    """
+
+    def __init__(self, cloud):
+        self.cloud = cloud
+        self.listing = RemoteListingCache(cloud)
+
+    @staticmethod
+    def _is_archive(path: str) -> bool:
+        top = path.split("/", 1)[0].upper()
+        return top in VALID_PREFIXES and bool(ARCHIVE_RE.search(path))
+
+    def reconcile(self, df: pd.DataFrame, force_full: bool = False) -> Optional[Dict]:
+        refresh_started = time.time()
+        if not self.listing.refresh(force_full):
+            if not self.listing.taken_at:
+                return None
+            logger.warning("⚠️ No se pudo refrescar el listado. Se usa la versión cacheada.")
+
+        start = time.perf_counter()
+        hash_type = self.listing.hash_type
+        referenced = set()
+        report = {'ok': 0, 'unverified': 0, 'missing': [], 'mismatch': [], 'orphans': []}
+
+        def record(row, paths, status):
+            if status in ('ok', 'unverified'):
+                report[status] += 1
+            else:
+                report[status].append({
+                    'prefijo': row.get('prefijo'), 'id_prefix': row.get('id_prefix'),
+                    'nombre_original': row.get('nombre_original'), 'archivo': paths[0]
+                })
+
+        # Solo las columnas necesarias, como listas (to_dict('records') es varias veces más lento)
+        frame = df.reindex(columns=ROW_COLUMNS)
+        missing = []
+        for values in zip(*(frame[col].tolist() for col in ROW_COLUMNS)):
+            row = dict(zip(ROW_COLUMNS, values))
+            paths = archive_paths(row)
+            referenced.update(paths)
+            status = Scrubber.check_row(row, self.listing.entries, hash_type, names=paths)
+            if status == 'missing':
+                missing.append((row, paths))
+            else:
+                record(row, paths, status)
+
+        # CORRECCIÓN: '--max-age' filtra por ModTime, que rclone copia del .7z local (anterior al fin
+        # de la subida): un archivo subido después del último listado puede no aparecer en el
+        # refresco incremental. Antes de reportar faltantes se relistan completas sus carpetas,
+        # salvo que el listado completo se haya tomado en esta misma llamada.
+        if missing and self.listing.full_at < refresh_started:
+            folders = sorted({row['ruta_relativa'] for row, _ in missing
+                              if isinstance(row['ruta_relativa'], str) and row['ruta_relativa'].strip('/')})
+            if folders:
+                logger.info(f"📡 {len(missing)} registros sin objeto en el listado: relistando {len(folders)} carpetas...")
+                self.listing.refresh_folders(folders)
+        for row, paths in missing:
+            record(row, paths, Scrubber.check_row(row, self.listing.entries, hash_type, names=paths))
+
+        entries = self.listing.entries
+        for path, info in entries.items():
+            if path not in referenced and self._is_archive(path):
+                report['orphans'].append({'archivo': path, 'size': info['size'], 'modtime': info['modtime']})
+
+        report.update({
+            'records': len(df), 'objects': len(entries),
+            'listing_age_s': round(self.listing.age(), 1),
+            'elapsed_s': round(time.perf_counter() - start, 3),
+            'generated': time.strftime("%d-%m-%Y %H:%M:%S")
+        })
+        self._save_report(report)
+        return report
+
+    @staticmethod
+    def _save_report(report: Dict):
+        REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        REPORT_PATH.write_text(json.dumps(report, ensure_ascii=False, indent=2, default=str), encoding='utf-8')
+
+    @staticmethod
+    def orphan_hash_names(report: Dict) -> List[str]:
+        """Nombres (hash) de los huérfanos, para cruzarlos con la cola de trabajos."""
+        return [ARCHIVE_RE.sub("", o['archivo'].rsplit("/", 1)[-1]) for o in report.get('orphans', [])]
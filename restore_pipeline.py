@@ -0,0 +1,289 @@
+# restore_pipeline.py
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from tqdm import tqdm
+
+from config import (
+    logger, DATA_DIR,
+    RESTORE_DL_WORKERS, RESTORE_EXTRACT_WORKERS,
+    RESTORE_QUEUE_SIZE, RESTORE_STAGING_MAX_MB, RESTORE_VERIFY_MD5,
+    BATCH_MAX_FILE_MB, BATCH_MAX_FILES
+)
+
+MB = 1024 * 1024
+
+
+class StagingBudget:
+    """
+    Presupuesto de disco (MB) para archivos descargados pendientes de extracción.
+    Un archivo más grande que el tope se admite solo cuando el staging está vacío.
+    """
+
+    def __init__(self, max_mb: float):
+        self.max_mb = max_mb
+        self.used_mb = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, size_mb: float):
+        with self._cond:
+            while self.used_mb > 0 and self.used_mb + size_mb > self.max_mb:
+                self._cond.wait()
+            self.used_mb += size_mb
+
+    def release(self, size_mb: float):
+        with self._cond:
+            self.used_mb = max(0.0, self.used_mb - size_mb)
+            self._cond.notify_all()
+
+
+class RestorePipeline:
+    """
+    PIPELINE DE RESTAURACIÓN
+    N workers de descarga alimentan M workers de extracción a través de una cola acotada.
+    - Orden por tamaño descendente (los grandes primero acortan el tiempo total).
+    - El disco usado en data/descargas nunca supera RESTORE_STAGING_MAX_MB.
+    - Una sola barra de progreso agregada para todo el lote.
+    - Los archivos pequeños se agrupan en una sola invocación rclone (--files-from).
+    - Con caché (BlobCache), los .7z ya descargados y vigentes no se vuelven a bajar.
+    """
+
+    def __init__(self, cloud, security, cleanup: Optional[Callable[[Path], None]] = None,
+                 staging_dir: Path = None, output_dir: Path = None, cache=None):
+        self.cloud = cloud
+        self.security = security
+        self.cache = cache
+        self.cleanup = cleanup or (lambda p: Path(p).unlink(missing_ok=True))
+        self.staging_dir = Path(staging_dir or DATA_DIR / "descargas")
+        self.output_dir = Path(output_dir or DATA_DIR / "desencriptados")
+
+        self.budget = StagingBudget(RESTORE_STAGING_MAX_MB)
+        self._units: "queue.Queue[List[Dict]]" = queue.Queue()
+        self._extract_q: "queue.Queue[Optional[Dict]]" = queue.Queue(maxsize=RESTORE_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._pbar = None
+        self.restored: List[Dict] = []
+        self.failed: List[Dict] = []
+
+    # --- PREPARACIÓN ---
+
+    @staticmethod
+    def _volume_count(row: Dict) -> int:
+        """Cantidad de volúmenes de la fila (0 = archivo único). Tolera NaN de pandas."""
+        try:
+            value = int(float(row.get('volumenes')))
+        except (TypeError, ValueError):
+            return 0
+        return max(value, 0)
+
+    def _build_job(self, row: Dict) -> Dict:
+        """Traduce una fila del índice a una unidad de trabajo del pipeline."""
+        try:
+            size_mb = float(row.get('tamaño_mb') or 0)
+        except (TypeError, ValueError):
+            size_mb = 0.0
+        hash_name = row['nombre_encriptado']
+        base_remote = f"{row['ruta_relativa']}{hash_name}.7z"
+
+        volumes = self._volume_count(row)
+        if volumes:
+            # NUEVO: Set multi-volumen -> .7z.001 ... .7z.NNN
+            remote_paths = [f"{base_remote}.{i:03d}" for i in range(1, volumes + 1)]
+            local_files = [self.staging_dir / Path(p).name for p in remote_paths]
+        else:
+            remote_paths = [base_remote]
+            local_files = [self.staging_dir / f"{hash_name}.7z"]
+
+        return {
+            'row': row,
+            'name': row['nombre_original'],
+            'size_mb': size_mb,
+            'remote_paths': remote_paths,
+            'local_files': local_files,
+            'local_7z': local_files[0],  # 7z abre el set completo desde el primer volumen
+            # Destino organizado por Categoría: data/desencriptados/Categoria/NombreReal
+            'dest_folder': self.output_dir / str(row['categoria']) / str(row['nombre_original']),
+        }
+
+    def _build_units(self, jobs: List[Dict]) -> List[List[Dict]]:
+        """Grandes: una unidad por archivo. Pequeños: lotes de hasta BATCH_MAX_FILES."""
+        units, small = [], []
+        for job in jobs:
+            if job['size_mb'] >= BATCH_MAX_FILE_MB or len(job['remote_paths']) > 1:
+                units.append([job])
+            else:
+                small.append(job)
+        for i in range(0, len(small), BATCH_MAX_FILES):
+            units.append(small[i:i + BATCH_MAX_FILES])
+        return units
+
+    # --- ETAPAS ---
+
+    def _download(self, unit: List[Dict]) -> List[bool]:
+        """
+        Resuelve una unidad: primero la caché local, luego la nube para el resto.
+        Lo recién descargado pasa a la caché. Retorna éxito por trabajo.
+        """
+        pending = []
+        for job in unit:
+            cached = self.cache.lookup(job['row']['nombre_encriptado'], job['remote_paths']) if self.cache else None
+            if cached:
+                self._use_cached(job, cached)
+            else:
+                pending.append(job)
+
+        fetched = dict(zip(map(id, pending), self._fetch(pending))) if pending else {}
+        for job in pending:
+            if fetched[id(job)] and self.cache:
+                cached = self.cache.admit(job['row']['nombre_encriptado'], job['remote_paths'], job['local_files'])
+                if cached:
+                    self._use_cached(job, cached)
+        return [fetched.get(id(job), True) for job in unit]
+
+    @staticmethod
+    def _use_cached(job: Dict, paths: List[Path]):
+        job['local_files'] = paths
+        job['local_7z'] = paths[0]
+        job['cached'] = True
+
+    def _fetch(self, unit: List[Dict]) -> List[bool]:
+        """Descarga una unidad (archivo suelto o lote) desde la nube. Retorna éxito por trabajo."""
+        if len(unit) == 1 and len(unit[0]['remote_paths']) == 1:
+            job = unit[0]
+            return [self.cloud.download_file(job['remote_paths'][0], job['local_7z'], silent=True)]
+
+        # Lote de archivos pequeños o volúmenes de un set: una sola invocación rclone en paralelo.
+        # Nota: el encabezado 7z (cifrado) vive al final del set, por lo que la extracción
+        # arranca cuando llegó el último volumen.
+        all_paths = [p for job in unit for p in job['remote_paths']]
+        results = self.cloud.download_batch(all_paths, self.staging_dir)
+        outcome = []
+        for job in unit:
+            ok = all(results.get(p) for p in job['remote_paths'])
+            # El lote replica la subruta remota (DOC/...): apuntamos a esas rutas
+            job['local_files'] = [results.get(p) or self.staging_dir / p.strip("/") for p in job['remote_paths']]
+            job['local_7z'] = job['local_files'][0]
+            outcome.append(ok)
+        return outcome
+
+    def _extract(self, job: Dict) -> bool:
+        # NUEVO: Cada fila se abre con la clave maestra con la que fue cifrada ('version_clave')
+        security = self.security.for_key(job['row'].get('version_clave'))
+        if security is None:
+            logger.error(f"❌ {job['name']}: cifrado con otra clave maestra ({job['row'].get('version_clave')}).")
+            return False
+        # NUEVO: Verificación contra hash_md5 mientras se extrae (sin releer la carpeta al final)
+        expected = job['row'].get('hash_md5') if RESTORE_VERIFY_MD5 else None
+        return security.decrypt_extract_7z(job['local_7z'], job['dest_folder'],
+                                           expected_md5=expected if isinstance(expected, str) and expected else None)
+
+    # --- WORKERS ---
+
+    def _download_worker(self):
+        while True:
+            try:
+                unit = self._units.get_nowait()
+            except queue.Empty:
+                return
+
+            self.budget.acquire(sum(j['size_mb'] for j in unit))
+            try:
+                outcome = self._download(unit)
+            except Exception as e:
+                logger.error(f"Error descargando {', '.join(j['name'] for j in unit)}: {e}")
+                outcome = [False] * len(unit)
+
+            for job, ok in zip(unit, outcome):
+                if ok:
+                    self._advance(job['size_mb'] * MB)
+                    self._extract_q.put(job)  # Bloquea si los extractores van atrasados (backpressure)
+                else:
+                    self._cleanup_job(job)  # Descarga parcial: no dejar basura en staging
+                    self.budget.release(job['size_mb'])
+                    self._finish(job, ok=False, reason="descarga")
+
+    def _extract_worker(self):
+        while True:
+            job = self._extract_q.get()
+            if job is None:
+                return
+            ok = False
+            try:
+                ok = self._extract(job)
+            except Exception as e:
+                logger.error(f"Error extrayendo {job['name']}: {e}")
+            finally:
+                self._cleanup_job(job)
+                self.budget.release(job['size_mb'])
+            self._finish(job, ok=ok, reason="extracción")
+
+    def _cleanup_job(self, job: Dict):
+        if job.get('cached'):
+            # Queda en la caché (cifrado): solo liberamos la reserva
+            self.cache.release(job['row']['nombre_encriptado'])
+            return
+        for local in job['local_files']:
+            if Path(local).exists():
+                self.cleanup(Path(local))
+
+    # --- PROGRESO AGREGADO ---
+
+    def _advance(self, nbytes: float):
+        with self._lock:
+            if self._pbar:
+                self._pbar.update(int(nbytes))
+
+    def _finish(self, job: Dict, ok: bool, reason: str):
+        with self._lock:
+            if ok:
+                self.restored.append(job)
+            else:
+                job['error'] = reason
+                self.failed.append(job)
+            if self._pbar:
+                self._pbar.set_postfix(OK=len(self.restored), Fallos=len(self.failed))
+        if not ok:
+            logger.error(f"❌ Fallo en {reason}: {job['name']}")
+
+    # --- EJECUCIÓN ---
+
+    def run(self, rows: List[Dict]) -> Dict[str, List[Dict]]:
+        """Restaura las filas indicadas. Retorna {'restored': [...], 'failed': [...]}."""
+        jobs = sorted((self._build_job(r) for r in rows), key=lambda j: j['size_mb'], reverse=True)
+        if not jobs:
+            return {'restored': [], 'failed': []}
+
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        units = self._build_units(jobs)
+        for unit in units:
+            self._units.put(unit)
+
+        total_bytes = int(sum(j['size_mb'] for j in jobs) * MB)
+        self._pbar = tqdm(total=total_bytes, unit='B', unit_scale=True, unit_divisor=1024,
+                          desc=f"Restaurando {len(jobs)} archivos")
+
+        downloaders = [
+            threading.Thread(target=self._download_worker, name=f"restore-dl-{i}", daemon=True)
+            for i in range(max(1, min(RESTORE_DL_WORKERS, len(units))))
+        ]
+        extractors = [
+            threading.Thread(target=self._extract_worker, name=f"restore-x-{i}", daemon=True)
+            for i in range(max(1, min(RESTORE_EXTRACT_WORKERS, len(jobs))))
+        ]
+
+        try:
+            for t in downloaders + extractors:
+                t.start()
+            for t in downloaders:
+                t.join()
+            for _ in extractors:
+                self._extract_q.put(None)  # Fin de lote para cada extractor
+            for t in extractors:
+                t.join()
+        finally:
+            self._pbar.close()
+            self._pbar = None
+
+        return {'restored': self.restored, 'failed': self.failed}
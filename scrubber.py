@@ -0,0 +1,242 @@
+# scrubber.py
+import json
+import math
+import os
+import random
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from config import (
+    logger, INDEX_DIR, TEMP_DIR,
+    SCRUB_MIN_INTERVAL, SCRUB_SAMPLE_RATE, SCRUB_SAMPLE_MAX
+)
+
+STATE_PATH = INDEX_DIR / "scrub_state.json"
+
+
+def archive_names(row) -> List[str]:
+    """Nombres remotos de un registro: hash.7z o hash.7z.001, .002... si es multi-volumen."""
+    base = f"{row['nombre_encriptado']}.7z"
+    try:
+        volumes = int(float(row.get('volumenes')))
+    except (TypeError, ValueError):
+        volumes = 0  # Vacío / NA / NaN: archivo único
+    if volumes > 0:
+        return [f"{base}.{i:03d}" for i in range(1, volumes + 1)]
+    return [base]
+
+
+def archive_paths(row) -> List[str]:
+    """Rutas remotas completas (relativas a la carpeta base) de un registro."""
+    return [f"{row['ruta_relativa']}{name}" for name in archive_names(row)]
+
+
+def archive_fingerprint(cloud, files: List[Path]) -> str:
+    """
+    Huella del archivo cifrado al subirlo (columna 'hash_remoto'):
+    '<tipo>:<h1>[;<h2>...]' con el hash nativo del proveedor, uno por volumen.
+    Si el remoto no informa hashes (ej: crypt) se usa 'size:<bytes>[;...]'.
+    """
+    hash_type = cloud.remote_hash_type()
+    if hash_type:
+        values = [cloud.local_hash(f, hash_type) for f in files]
+        if all(values):
+            return f"{hash_type}:{';'.join(values)}"
+    return "size:" + ";".join(str(Path(f).stat().st_size) for f in files)
+
+
+def fingerprint_from_listing(parts: List[Dict], hash_type: Optional[str]) -> str:
+    """Misma huella que archive_fingerprint, pero desde un listado remoto ({'size', 'hash'} por volumen)."""
+    if hash_type and all(p.get('hash') for p in parts):
+        return f"{hash_type}:{';'.join(p['hash'] for p in parts)}"
+    return "size:" + ";".join(str(p['size']) for p in parts)
+
+
+def parse_fingerprint(value) -> Optional[Tuple[str, List[str]]]:
+    if not isinstance(value, str) or ":" not in value:
+        return None
+    kind, _, values = value.partition(":")
+    return kind, values.split(";")
+
+
+class Scrubber:
+    """
+    VERIFICACIÓN DE INTEGRIDAD REMOTA (SCRUB) SIN DESCARGAS
+    - Compara la huella guardada al subir ('hash_remoto') contra 'rclone lsjson --hash'
+      de cada carpeta PREFIJO (una llamada por prefijo, no una por archivo).
+    - Reanudable: el avance de la pasada se guarda en data/index/scrub_state.json tras cada prefijo.
+    - Limitado: SCRUB_MIN_INTERVAL segundos entre listados; las descargas de muestra pasan
+      por el planificador de ancho de banda.
+    - Solo una muestra (SCRUB_SAMPLE_RATE, tope SCRUB_SAMPLE_MAX) se descarga y se prueba con '7z t'.
+    """
+
+    def __init__(self, cloud, security):
+        self.cloud = cloud
+        self.security = security
+        self._last_listing = 0.0
+
+    # --- ESTADO ---
+
+    @staticmethod
+    def _load_state() -> Dict:
+        try:
+            return json.loads(STATE_PATH.read_text(encoding='utf-8'))
+        except Exception:
+            return {}
+
+    @staticmethod
+    def _save_state(state: Dict):
+        STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = STATE_PATH.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp, STATE_PATH)
+
+    @staticmethod
+    def _new_pass() -> Dict:
+        return {
+            'started': time.strftime("%d-%m-%Y %H:%M:%S"), 'done_prefixes': [],
+            'counts': {'checked': 0, 'ok': 0, 'missing': 0, 'mismatch': 0, 'unverified': 0,
+                       'sampled': 0, 'sample_failed': 0},
+            'problems': []
+        }
+
+    def _throttle(self, stop: threading.Event):
+        wait = self._last_listing + SCRUB_MIN_INTERVAL - time.monotonic()
+        if wait > 0:
+            stop.wait(wait)
+        self._last_listing = time.monotonic()
+
+    # --- VERIFICACIÓN ---
+
+    @staticmethod
+    def check_row(row, listing: Dict[str, Dict], hash_type: Optional[str], names: List[str] = None) -> str:
+        """
+        Estado de un registro frente al listado: ok | missing | mismatch | unverified.
+        'names' son las claves a buscar en 'listing' (por defecto, los nombres de archivo).
+        """
+        names = names or archive_names(row)
+        if any(name not in listing for name in names):
+            return 'missing'
+        parsed = parse_fingerprint(row.get('hash_remoto'))
+        if parsed is None:
+            return 'unverified'  # Subido antes del scrub: solo se sabe que existe
+        kind, values = parsed
+        if len(values) != len(names):
+            return 'mismatch'
+        unverified = False
+        for name, expected in zip(names, values):
+            obj = listing[name]
+            if kind == 'size':
+                if str(obj['size']) != expected:
+                    return 'mismatch'
+            elif kind == hash_type:
+                # CORRECCIÓN: sin hash en el listado no hay nada que comparar (no cuenta como ok)
+                if not obj['hash']:
+                    unverified = True
+                elif obj['hash'] != expected.lower():
+                    return 'mismatch'
+            else:
+                return 'unverified'  # Huella de otro tipo de hash (cambió el remoto)
+        return 'unverified' if unverified else 'ok'
+
+    def verify_sample(self, row) -> bool:
+        """Descarga un archivo completo, compara su huella y lo prueba con '7z t'."""
+        work = TEMP_DIR / f"scrub_{uuid.uuid4().hex[:8]}"
+        try:
+            files = []
+            for name in archive_names(row):
+                dest = work / name
+                if not self.cloud.download_file(f"{row['ruta_relativa']}{name}", dest, silent=True):
+                    return False
+                files.append(dest)
+            expected = row.get('hash_remoto')
+            parsed = parse_fingerprint(expected)
+            if parsed and parsed[0] in ('size', self.cloud.remote_hash_type()):
+                if archive_fingerprint(self.cloud, files) != expected:
+                    return False
+            security = self.security.for_key(row.get('version_clave'))
+            return security.test_archive(files[0]) if security else True  # Otra clave: solo la huella
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+    def run(self, df: pd.DataFrame, max_prefixes: int = None, sample: bool = True,
+            stop: threading.Event = None) -> Dict:
+        """
+        Avanza sobre 'df' (índice) la pasada en curso o inicia una. Retorna el estado con
+        contadores y problemas; 'complete' indica si la pasada terminó.
+        """
+        stop = stop or threading.Event()
+        state = self._load_state()
+        if not state or state.get('complete'):
+            state = self._new_pass()
+
+        prefixes = sorted(p for p in df['prefijo'].dropna().unique() if p not in state['done_prefixes'])
+        if max_prefixes:
+            prefixes = prefixes[:max_prefixes]
+        hash_type = self.cloud.remote_hash_type()
+        counts = state['counts']
+
+        for prefix in prefixes:
+            if stop.is_set():
+                break
+            rows = df[df['prefijo'] == prefix]
+            remote_dirs = sorted(rows['ruta_relativa'].fillna(f"{prefix}/").unique())
+
+            listing: Dict[str, Dict] = {}
+            failed = False
+            for remote_dir in remote_dirs:
+                self._throttle(stop)
+                part = self.cloud.list_remote_hashes(remote_dir, hash_type)
+                if part is None:
+                    failed = True
+                    break
+                listing.update(part)
+            if failed:
+                logger.warning(f"⚠️ No se pudo listar {prefix}. Se reintentará en la próxima ejecución.")
+                continue
+
+            ok_rows = []
+            for _, row in rows.iterrows():
+                status = self.check_row(row, listing, hash_type)
+                counts['checked'] += 1
+                counts[status] += 1
+                if status == 'ok':
+                    ok_rows.append(row)
+                elif status in ('missing', 'mismatch'):
+                    state['problems'].append(self._problem(row, status))
+
+            if sample and ok_rows and SCRUB_SAMPLE_RATE > 0:
+                budget = max(0, SCRUB_SAMPLE_MAX - counts['sampled'])
+                picks = random.sample(ok_rows, min(budget, len(ok_rows), math.ceil(len(ok_rows) * SCRUB_SAMPLE_RATE)))
+                for row in picks:
+                    if stop.is_set():
+                        break
+                    counts['sampled'] += 1
+                    if not self.verify_sample(row):
+                        counts['sample_failed'] += 1
+                        state['problems'].append(self._problem(row, 'sample_failed'))
+
+            state['done_prefixes'].append(prefix)
+            self._save_state(state)
+            logger.info(f"🔎 Scrub {prefix}: {len(rows)} registros revisados.")
+
+        all_prefixes = set(df['prefijo'].dropna().unique())
+        state['complete'] = all_prefixes.issubset(state['done_prefixes'])
+        if state['complete']:
+            state['finished'] = time.strftime("%d-%m-%Y %H:%M:%S")
+        self._save_state(state)
+        return state
+
+    @staticmethod
+    def _problem(row, status: str) -> Dict:
+        return {
+            'prefijo': row['prefijo'], 'id_prefix': str(row.get('id_prefix')),
+            'nombre_original': row.get('nombre_original'),
+            'archivo': f"{row['ruta_relativa']}{row['nombre_encriptado']}.7z", 'estado': status
+        }
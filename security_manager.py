@@ -5,9 +5,15 @@ import shutil
 import hashlib
 import base64
 import subprocess
+import struct
+import threading
+import time
 import uuid
+import zlib
 from pathlib import Path
-from typing import Dict, Tuple, Optional
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Tuple, Optional, Sequence
 
 # Librerías de criptografía (Standard NIST)
 from cryptography.fernet import Fernet
@@ -15,7 +21,40 @@ from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 # Importamos configuración
-from config import logger, SEVEN_ZIP_PATH
+from config import (
+    logger, SEVEN_ZIP_PATH, COMPRESSION_THREADS, TEMP_DIR, FERNET_WORKERS, FERNET_CHUNK_SIZE,
+    RESTORE_HASH_WORKERS
+)
+
+# Encabezado de inicio de un .7z: firma(6) + versión(2) + CRC(4) + NextHeaderOffset(8) + NextHeaderSize(8) + CRC(4)
+SEVEN_ZIP_START_HEADER_SIZE = 32
+DECRYPT_ERROR = "[ERROR_DECRYPT]"
+
+# --- TRABAJADORES DE LOTES FERNET (nivel de módulo: deben poder serializarse para el pool) ---
+_worker_cipher: Optional[Fernet] = None
+
+
+def _init_fernet_worker(key: bytes):
+    global _worker_cipher
+    _worker_cipher = Fernet(key)
+
+
+def _encrypt_chunk(texts: List[str], cipher: Fernet = None) -> List[str]:
+    cipher = cipher or _worker_cipher
+    return [cipher.encrypt(t.encode()).decode() for t in texts]
+
+
+def _decrypt_chunk(tokens: List[Optional[str]], cipher: Fernet = None) -> List[Optional[str]]:
+    """Token inválido, alterado o vacío -> None (sin registrar cada error: pueden ser miles)."""
+    cipher = cipher or _worker_cipher
+    out = []
+    for token in tokens:
+        try:
+            out.append(cipher.decrypt(token.encode()).decode())
+        except Exception:
+            out.append(None)
+    return out
+
 
 class SecurityManager:
     """
@@ -29,10 +68,64 @@ class SecurityManager:
             logger.warning("⚠️ La contraseña maestra es corta (<12 chars). Se recomienda mayor longitud.")
             
         self.master_password = master_password
-        self.key = self._derive_key(master_password)
-        self.cipher = Fernet(self.key)
         self.seven_zip_exe = self._find_7z_executable()
 
+        # MEJORA: PBKDF2 (100k iteraciones) corre en segundo plano; el arranque sigue con
+        # testigos e índice y solo se espera la clave cuando algo la usa (property 'cipher').
+        self.kdf_seconds: Optional[float] = None
+        self._cipher: Optional[Fernet] = None
+        self._key_ready = threading.Event()
+        self._key_error: Optional[Exception] = None
+        # NUEVO: Otras claves maestras (rotación) indexadas por su key_id ('version_clave' de cada fila)
+        self._keyring: Dict[str, "SecurityManager"] = {}
+        threading.Thread(target=self._derive_in_background, name="kdf", daemon=True).start()
+
+    def _derive_in_background(self):
+        start = time.perf_counter()
+        try:
+            self.key = self._derive_key(self.master_password)
+            self._cipher = Fernet(self.key)
+        except Exception as e:
+            self._key_error = e
+        finally:
+            self.kdf_seconds = time.perf_counter() - start
+            self._key_ready.set()
+
+    @property
+    def cipher(self) -> Fernet:
+        """Motor Fernet (bloquea hasta que termine la derivación de la clave)."""
+        self._key_ready.wait()
+        if self._key_error:
+            raise self._key_error
+        return self._cipher
+
+    def wait_key(self) -> float:
+        """Espera la derivación de la clave. Retorna los segundos que tomó."""
+        _ = self.cipher
+        return self.kdf_seconds
+
+    @property
+    def key_id(self) -> str:
+        """NUEVO: Identificador corto de la clave derivada (columna 'version_clave'). No permite recuperarla."""
+        _ = self.cipher
+        return hashlib.sha256(b"gestor_key_id:" + self.key).hexdigest()[:12]
+
+    def register_key(self, other: "SecurityManager") -> str:
+        """NUEVO: Agrega otra clave maestra para abrir archivos cifrados con ella. Retorna su key_id."""
+        key_id = other.key_id
+        if key_id != self.key_id:
+            self._keyring[key_id] = other
+        return key_id
+
+    def for_key(self, key_id) -> Optional["SecurityManager"]:
+        """
+        Motor para la 'version_clave' de una fila: vacía o igual a la actual -> self;
+        otra -> la registrada con register_key, o None si esa clave no está disponible.
+        """
+        if not isinstance(key_id, str) or not key_id or key_id == self.key_id:
+            return self
+        return self._keyring.get(key_id)
+
     def _derive_key(self, password: str) -> bytes:
         """
         Deriva una clave de 32 bytes segura usando PBKDF2HMAC-SHA256.
@@ -84,7 +177,33 @@ class SecurityManager:
             return self.cipher.decrypt(token.encode()).decode()
         except Exception as e:
             logger.error(f"Error desencriptando token: {e}")
-            return "[ERROR_DECRYPT]"
+            return DECRYPT_ERROR
+
+    def _map_chunks(self, func, items: Sequence, workers: int = None, chunk_size: int = None) -> List:
+        """
+        Aplica 'func' por tramos. Con un solo tramo corre en el hilo actual (crear procesos cuesta
+        más que cifrar unos pocos tokens); si no, reparte los tramos en un pool de procesos
+        inicializado una vez con la clave, y conserva el orden.
+        """
+        chunk_size = max(1, chunk_size or FERNET_CHUNK_SIZE)
+        items = list(items)
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        workers = min(len(chunks), workers or FERNET_WORKERS or os.cpu_count() or 1)
+        if workers <= 1:
+            cipher = self.cipher
+            return [value for chunk in chunks for value in func(chunk, cipher)]
+        _ = self.cipher  # Espera la derivación y propaga su error antes de lanzar procesos
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_fernet_worker, initargs=(self.key,)) as pool:
+            return [value for part in pool.map(func, chunks) for value in part]
+
+    def encrypt_many(self, texts: Sequence[str], workers: int = None, chunk_size: int = None) -> List[str]:
+        """encrypt_text para muchos textos en paralelo (mismo orden de entrada)."""
+        return self._map_chunks(_encrypt_chunk, texts, workers, chunk_size)
+
+    def decrypt_many(self, tokens: Sequence[Optional[str]], workers: int = None,
+                     chunk_size: int = None) -> List[Optional[str]]:
+        """decrypt_text para muchos tokens en paralelo. Los tokens que no se pueden desencriptar dan None."""
+        return self._map_chunks(_decrypt_chunk, tokens, workers, chunk_size)
 
     def generate_filename_hash(self, plaintext: str) -> str:
         """
@@ -108,14 +227,43 @@ class SecurityManager:
                     hasher.update(chunk)
         elif path.is_dir():
             # Para carpetas, hasheamos los hashes de los archivos ordenados alfabéticamente
-            for p in sorted(path.rglob("*")):
-                if p.is_file():
-                    with open(p, "rb") as f:
-                        file_hash = hashlib.md5(f.read()).hexdigest()
-                    hasher.update(file_hash.encode())
+            return self.folder_md5(self.hash_folder_files(path))
         
         return hasher.hexdigest()
 
+    @staticmethod
+    def file_md5(path: Path) -> str:
+        hasher = hashlib.md5()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def hash_folder_files(self, folder: Path) -> List[Dict]:
+        """
+        NUEVO: Hashea cada archivo de una carpeta (mismo orden que calculate_md5).
+        Retorna [{'path': 'Carpeta/sub/a.txt', 'size': int, 'md5': str}] con rutas tal como
+        quedan dentro del .7z (relativas al padre de la carpeta, separador '/').
+        """
+        folder = Path(folder)
+        entries = []
+        for p in sorted(folder.rglob("*")):
+            if p.is_file():
+                entries.append({
+                    'path': p.relative_to(folder.parent).as_posix(),
+                    'size': p.stat().st_size,
+                    'md5': self.file_md5(p)
+                })
+        return entries
+
+    @staticmethod
+    def folder_md5(entries: List[Dict]) -> str:
+        """MD5 de carpeta a partir de los hashes por archivo (idéntico a calculate_md5)."""
+        hasher = hashlib.md5()
+        for entry in entries:
+            hasher.update(entry['md5'].encode())
+        return hasher.hexdigest()
+
     def get_size_mb(self, path: Path) -> float:
         """Calcula el tamaño en MB."""
         path = Path(path)
@@ -128,10 +276,13 @@ class SecurityManager:
 
     # --- MÉTODOS DE COMPRESIÓN (7-ZIP) ---
 
-    def compress_encrypt_7z(self, source_path: Path, dest_path: Path, metadata: Dict = None, password: str = None) -> bool:
+    def compress_encrypt_7z(self, source_path: Path, dest_path: Path, metadata: Dict = None, password: str = None,
+                            volume_size_mb: int = 0, level: int = 0) -> bool:
         """
         Comprime una carpeta/archivo a .7z usando AES-256 y Header Encryption (-mhe=on).
         MEJORA: Usa -mx=0 (Store) para velocidad máxima (solo empaquetar y encriptar).
+        NUEVO: 'volume_size_mb' > 0 parte el archivo en volúmenes dest.7z.001, .002...
+        NUEVO: 'level' > 0 comprime (-mx=level, multihilo) según la política de compresión.
         """
         # Si no se pasa password, usa la maestra por defecto
         pwd_to_use = password if password else self.master_password
@@ -149,11 +300,16 @@ class SecurityManager:
                 self.seven_zip_exe, "a",       # Add (Comprimir)
                 f"-p{pwd_to_use}",             # Password (dinámico)
                 "-mhe=on",                     # Encrypt Headers (Oculta nombres de archivo)
-                "-mx=0",                       # MEJORA: Store (Sin compresión, solo encriptación rápida)
+                f"-mx={int(level)}",           # MEJORA: Store por defecto (0 = sin compresión, solo encriptación)
+                "-ms=off",                     # NUEVO: No sólido (un bloque por archivo -> restauración por rangos)
                 "-y",                          # Yes to all
                 str(dest_path),                # Archivo destino
                 str(source_path)               # Fuente
             ]
+            if volume_size_mb and volume_size_mb > 0:
+                cmd.insert(6, f"-v{int(volume_size_mb)}m")  # NUEVO: Volúmenes de tamaño fijo
+            if level > 0:
+                cmd.insert(6, f"-mmt={COMPRESSION_THREADS}")  # NUEVO: Compresión multihilo
 
             # Si hay metadatos, crear JSON temporal e incluirlo
             if metadata:
@@ -173,7 +329,8 @@ class SecurityManager:
                 logger.error(f"❌ Error 7z: {result.stderr}")
                 return False
             
-            logger.info(f"✅ Encriptación exitosa (Store): {dest_path.name}")
+            mode = "Store" if level <= 0 else f"mx={int(level)}"
+            logger.info(f"✅ Encriptación exitosa ({mode}): {dest_path.name}")
             return True
 
         except Exception as e:
@@ -184,17 +341,31 @@ class SecurityManager:
             if temp_meta_path and temp_meta_path.exists():
                 temp_meta_path.unlink()
 
-    def decrypt_extract_7z(self, archive_path: Path, dest_folder: Path, password: str = None) -> bool:
+    @staticmethod
+    def list_volumes(dest_path: Path) -> List[Path]:
+        """Retorna los volúmenes generados para 'dest_path' (dest.7z.001, .002...) en orden."""
+        dest_path = Path(dest_path)
+        return sorted(dest_path.parent.glob(f"{dest_path.name}.[0-9][0-9][0-9]"))
+
+    def decrypt_extract_7z(self, archive_path: Path, dest_folder: Path, password: str = None,
+                           expected_md5: str = None) -> bool:
         """
         Desencripta y extrae un archivo .7z.
         MEJORA: Extrae en temporal, elimina metadatos.json y mueve el contenido limpio
         al destino final, evitando la estructura anidada GAM/GAM.
+        MEJORA: El temporal está junto al destino (mismo disco): publicar es renombrar, no copiar.
+        NUEVO: 'expected_md5' (hash_md5 del índice) se verifica con el MD5 de cada archivo,
+        calculado en paralelo apenas 7z lo termina de escribir: sin segunda lectura al final.
+        Si no coincide, el contenido queda en '<destino>_NO_VERIFICADO' y se retorna False.
         """
         pwd_to_use = password if password else self.master_password
+        dest_folder = Path(dest_folder)
         
         # Directorio temporal intermedio con ID único para evitar colisiones
         temp_extract_dir = dest_folder.parent / f"temp_extract_{uuid.uuid4().hex[:6]}"
         temp_extract_dir.mkdir(parents=True, exist_ok=True)
+        pool = ThreadPoolExecutor(max_workers=max(1, RESTORE_HASH_WORKERS)) if expected_md5 else None
+        digests: Dict[Path, Future] = {}
 
         try:
             cmd = [
@@ -202,65 +373,260 @@ class SecurityManager:
                 f"-p{pwd_to_use}",             # Password (dinámico)
                 f"-o{temp_extract_dir}",       # Output a temporal
                 "-y",                          # Sobreescribir sin preguntar
+                "-bb1", "-bso1", "-bsp0",      # NUEVO: Nombre de cada archivo al procesarlo, sin barra
                 str(archive_path)
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    text=True, encoding='utf-8', errors='replace')
+            tail = deque(maxlen=20)
+            previous = None
+            for line in proc.stdout:
+                tail.append(line)
+                # Extracción secuencial: cuando 7z anuncia un archivo, el anterior ya está completo
+                if pool and line.startswith("- "):
+                    if previous:
+                        self._submit_digest(pool, digests, temp_extract_dir / previous)
+                    previous = line[2:].strip()
+            proc.wait()
             
-            if result.returncode != 0:
-                if "Wrong password" in result.stderr or "Data Error" in result.stderr:
+            if proc.returncode != 0:
+                output = "".join(tail)
+                if "Wrong password" in output or "Data Error" in output:
                     logger.error("❌ Contraseña incorrecta o archivo corrupto.")
                 else:
-                    logger.error(f"❌ Error extrayendo 7z: {result.stderr}")
-                # Limpieza en caso de error
-                shutil.rmtree(temp_extract_dir, ignore_errors=True)
+                    logger.error(f"❌ Error extrayendo 7z: {output.strip()}")
                 return False
             
             # --- LIMPIEZA POST-EXTRACCIÓN ---
             
             # 1. Eliminar metadatos.json si existe
-            meta_file = temp_extract_dir / "metadatos.json"
-            if meta_file.exists():
-                meta_file.unlink()
-            
-            # 2. Mover contenido real al destino (Aplanar estructura)
+            (temp_extract_dir / "metadatos.json").unlink(missing_ok=True)
+
+            # 2. Verificación contra el índice con los MD5 ya calculados
+            verified = True
+            if pool:
+                if previous:
+                    self._submit_digest(pool, digests, temp_extract_dir / previous)
+                actual = self._folder_md5_from_digests(temp_extract_dir, pool, digests)
+                if actual != expected_md5:
+                    logger.error(f"❌ MD5 del contenido ({actual}) no coincide con el índice ({expected_md5}).")
+                    dest_folder = dest_folder.with_name(f"{dest_folder.name}_NO_VERIFICADO")
+                    verified = False
+
+            # 3. Mover contenido real al destino (Aplanar estructura)
             # El 7z suele contener la carpeta original: temp/GAM/archivos...
             # Nosotros queremos: dest_folder/archivos...
-            
-            # Aseguramos que el destino existe y está limpio (vacío)
-            if dest_folder.exists():
-                shutil.rmtree(dest_folder)
-            dest_folder.mkdir(parents=True, exist_ok=True)
-
-            items = list(temp_extract_dir.iterdir())
-            
-            for item in items:
-                if item.is_dir():
-                    # Si encontramos una carpeta (ej: GAM), movemos SU CONTENIDO al destino
-                    # Esto "aplana" la estructura y quita la carpeta redundante
-                    for subitem in item.iterdir():
-                        shutil.move(str(subitem), str(dest_folder))
-                else:
-                    # Si es un archivo suelto (fuera de carpeta), lo movemos directamente
-                    shutil.move(str(item), str(dest_folder))
-
-            return True
+            self._publish_extracted(temp_extract_dir, dest_folder)
+            return verified
 
         except Exception as e:
             logger.error(f"Excepción en extracción: {e}")
             return False
         finally:
+            if pool:
+                pool.shutdown(wait=True, cancel_futures=True)
             # Limpiar directorio temporal intermedio
             if temp_extract_dir.exists():
                 shutil.rmtree(temp_extract_dir, ignore_errors=True)
 
+    def _submit_digest(self, pool: ThreadPoolExecutor, digests: Dict[Path, Future], path: Path):
+        if path not in digests and path.is_file():
+            digests[path] = pool.submit(self.file_md5, path)
+
+    def _folder_md5_from_digests(self, root: Path, pool: ThreadPoolExecutor, digests: Dict[Path, Future]) -> str:
+        """
+        MD5 de carpeta (mismo orden que hash_folder_files) con los hashes ya en curso.
+        Solo se leen los archivos que 7z no anunció (ej: salida sin '-bb1'); el resto ya está hasheado.
+        """
+        files = sorted(p for p in root.rglob("*") if p.is_file())
+        for path in files:
+            self._submit_digest(pool, digests, path)
+        return self.folder_md5([{'md5': digests[path].result()} for path in files])
+
+    @staticmethod
+    def _publish_extracted(temp_extract_dir: Path, dest_folder: Path):
+        """Lleva el contenido extraído al destino renombrando (el temporal está en el mismo disco)."""
+        # Aseguramos que el destino existe y está limpio (vacío)
+        if dest_folder.exists():
+            shutil.rmtree(dest_folder)
+
+        items = list(temp_extract_dir.iterdir())
+        if len(items) == 1 and items[0].is_dir():
+            # Caso normal: una carpeta raíz (ej: GAM) -> se renombra completa como destino
+            os.replace(items[0], dest_folder)
+            return
+
+        dest_folder.mkdir(parents=True, exist_ok=True)
+        for item in items:
+            if item.is_dir():
+                # Si encontramos una carpeta, movemos SU CONTENIDO al destino (quita la carpeta redundante)
+                for subitem in item.iterdir():
+                    os.replace(subitem, dest_folder / subitem.name)
+            else:
+                # Si es un archivo suelto (fuera de carpeta), lo movemos directamente
+                os.replace(item, dest_folder / item.name)
+
+    # --- MANIFIESTO POR ARCHIVO (RESTAURACIÓN PARCIAL) ---
+
+    def list_archive_blocks(self, archive_path: Path, password: str = None) -> Optional[List[Dict]]:
+        """
+        Lista el contenido de un .7z ('7z l -slt') con su bloque y el rango de bytes del bloque.
+        Solo lee el encabezado, así que funciona sobre un archivo disperso (sparse) parcial.
+        Retorna [{'path', 'size', 'block', 'offset', 'length', 'is_dir'}] o None si falla.
+        """
+        pwd_to_use = password if password else self.master_password
+        cmd = [self.seven_zip_exe, "l", "-slt", f"-p{pwd_to_use}", str(archive_path)]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='replace')
+        except Exception as e:
+            logger.error(f"Error listando 7z: {e}")
+            return None
+        if result.returncode != 0 or "----------" not in result.stdout:
+            logger.error(f"❌ No se pudo listar el 7z: {result.stderr.strip()}")
+            return None
+
+        # Las entradas vienen después de '----------', separadas por líneas en blanco
+        body = result.stdout.split("----------", 1)[1]
+        entries, current = [], {}
+        for line in body.splitlines() + [""]:
+            if not line.strip():
+                if 'Path' in current:
+                    entries.append(current)
+                current = {}
+                continue
+            if " = " in line:
+                key, value = line.split(" = ", 1)
+                current[key.strip()] = value.strip()
+
+        # Los bloques (packed streams) se guardan en orden justo después del encabezado de inicio.
+        # 'Packed Size' solo aparece en la primera entrada de cada bloque.
+        block_sizes = {}
+        for e in entries:
+            if e.get('Block', '') != '' and e.get('Packed Size', '') != '':
+                block_sizes.setdefault(int(e['Block']), int(e['Packed Size']))
+        block_offsets, cursor = {}, SEVEN_ZIP_START_HEADER_SIZE
+        for block in sorted(block_sizes):
+            block_offsets[block] = cursor
+            cursor += block_sizes[block]
+
+        listing = []
+        for e in entries:
+            block = int(e['Block']) if e.get('Block', '') != '' else None
+            listing.append({
+                'path': e['Path'].replace("\\", "/"),
+                'size': int(e.get('Size') or 0),
+                'is_dir': e.get('Folder') == '+' or 'D' in e.get('Attributes', ''),
+                'block': block,
+                'offset': block_offsets.get(block),
+                'length': block_sizes.get(block, 0),
+            })
+        return listing
+
+    @staticmethod
+    def read_start_header(first_volume: Path) -> Tuple[int, int]:
+        """Lee (offset_absoluto, tamaño) del encabezado final de un .7z desde sus primeros 32 bytes."""
+        with open(first_volume, "rb") as f:
+            start = f.read(SEVEN_ZIP_START_HEADER_SIZE)
+        next_offset, next_size = struct.unpack("<QQ", start[12:28])
+        return SEVEN_ZIP_START_HEADER_SIZE + next_offset, next_size
+
+    def build_archive_manifest(self, archive_path: Path, file_entries: List[Dict], volumes: List[Path] = None) -> Optional[Dict]:
+        """
+        NUEVO: Construye el manifiesto de un .7z recién creado:
+        ruta, tamaño y MD5 de cada archivo + rango de bytes (bloque) dentro del archivo cifrado.
+        """
+        parts = [Path(v) for v in volumes] if volumes else [Path(archive_path)]
+        first = parts[0]
+        listing = self.list_archive_blocks(first)
+        if listing is None:
+            return None
+
+        header_offset, header_size = self.read_start_header(first)
+        blocks = {e['path']: e for e in listing if not e['is_dir']}
+        files = []
+        for entry in file_entries:
+            info = blocks.get(entry['path'], {})
+            files.append({
+                **entry,
+                'block': info.get('block'),
+                'offset': info.get('offset'),
+                'length': info.get('length', 0)
+            })
+
+        return {
+            'version': 1,
+            'archive_size': sum(p.stat().st_size for p in parts),
+            'volume_size': parts[0].stat().st_size if len(parts) > 1 else 0,
+            'volumes': len(parts) if len(parts) > 1 else 0,
+            'header': {'offset': header_offset, 'size': header_size},
+            'files': files
+        }
+
+    def encrypt_manifest(self, manifest: Dict) -> bytes:
+        """Serializa, comprime y cifra (Fernet, clave maestra) un manifiesto."""
+        raw = json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+        return self.cipher.encrypt(zlib.compress(raw))
+
+    def decrypt_manifest(self, blob: bytes) -> Optional[Dict]:
+        try:
+            return json.loads(zlib.decompress(self.cipher.decrypt(blob)).decode('utf-8'))
+        except Exception as e:
+            logger.error(f"Error desencriptando manifiesto: {e}")
+            return None
+
+    def extract_selected_7z(self, archive_path: Path, members: List[str], dest_folder: Path, password: str = None) -> bool:
+        """
+        NUEVO: Extrae solo 'members' (rutas internas) de un .7z hacia dest_folder, aplanando la
+        carpeta raíz como decrypt_extract_7z pero SIN vaciar el destino (restauración parcial).
+        """
+        pwd_to_use = password if password else self.master_password
+        dest_folder = Path(dest_folder)
+        temp_extract_dir = dest_folder.parent / f"temp_partial_{uuid.uuid4().hex[:6]}"
+        temp_extract_dir.mkdir(parents=True, exist_ok=True)
+        list_file = temp_extract_dir.parent / f"{temp_extract_dir.name}.lst"
+
+        try:
+            list_file.write_text("\n".join(members) + "\n", encoding='utf-8')
+            cmd = [
+                self.seven_zip_exe, "x",
+                f"-p{pwd_to_use}",
+                f"-o{temp_extract_dir}",
+                "-y",
+                str(archive_path),
+                f"@{list_file}"                # Solo los archivos pedidos
+            ]
+            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='replace')
+            if result.returncode != 0:
+                logger.error(f"❌ Error extrayendo selección: {result.stderr.strip()}")
+                return False
+
+            for member in members:
+                extracted = temp_extract_dir / member
+                if not extracted.is_file():
+                    logger.error(f"❌ No se extrajo: {member}")
+                    return False
+                # 'Carpeta/sub/a.txt' -> dest_folder/sub/a.txt
+                rel_parts = Path(member).parts[1:] or Path(member).parts
+                target = dest_folder.joinpath(*rel_parts)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(extracted, target)
+            return True
+
+        except Exception as e:
+            logger.error(f"Excepción en extracción parcial: {e}")
+            return False
+        finally:
+            list_file.unlink(missing_ok=True)
+            shutil.rmtree(temp_extract_dir, ignore_errors=True)
+
     def recover_metadata_from_7z(self, archive_path: Path) -> Dict:
         """
         Intenta extraer SOLO el archivo metadatos.json del 7z sin descomprimir todo.
-        Útil para reconstrucción de índice.
+        Útil para reconstrucción de índice (funciona sobre un archivo disperso con el bloque necesario).
+        CORRECCIÓN: Trabaja en data/temp (antes creaba 'temp_meta_*' en el directorio actual).
         """
-        import uuid
-        temp_extract_dir = Path(f"temp_meta_{uuid.uuid4().hex[:8]}")
+        temp_extract_dir = TEMP_DIR / f"temp_meta_{uuid.uuid4().hex[:8]}"
         
         try:
             cmd = [
@@ -291,8 +657,11 @@ class SecurityManager:
 
     def create_password_witness(self, path: Path, password: str) -> bool:
         """Crea un archivo .7z mínimo para validar contraseñas."""
+        # Carpeta única: los testigos 'master' y 'csv' pueden crearse en paralelo
+        work_dir = path.parent / f"witness_{uuid.uuid4().hex[:6]}"
         try:
-            dummy = path.parent / "witness.txt"
+            work_dir.mkdir(parents=True, exist_ok=True)
+            dummy = work_dir / "witness.txt"
             dummy.write_text("VALID")
             
             cmd = [
@@ -302,10 +671,22 @@ class SecurityManager:
                 str(path), str(dummy)
             ]
             subprocess.run(cmd, capture_output=True)
-            dummy.unlink()
             return True
         except:
             return False
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def test_archive(self, archive_path: Path, password: str = None) -> bool:
+        """NUEVO: Verifica la integridad de un .7z ('7z t': CRC de cada archivo con la clave)."""
+        pwd_to_use = password if password else self.master_password
+        try:
+            cmd = [self.seven_zip_exe, "t", f"-p{pwd_to_use}", str(archive_path)]
+            result = subprocess.run(cmd, capture_output=True)
+            return result.returncode == 0
+        except Exception as e:
+            logger.error(f"Error verificando {Path(archive_path).name}: {e}")
+            return False
 
     def verify_password_with_witness(self, witness_path: Path, password: str) -> bool:
         """Intenta abrir el testigo con la contraseña dada."""
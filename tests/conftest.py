@@ -0,0 +1,9 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# config crea carpetas al importarse: los tests usan un DATA_DIR temporal, nunca el real
+os.environ.setdefault("GESTOR_DATA_DIR", tempfile.mkdtemp(prefix="gestor_tests_"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
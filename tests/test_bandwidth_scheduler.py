@@ -0,0 +1,74 @@
+# tests/test_bandwidth_scheduler.py
+import socket
+
+import bandwidth_scheduler
+from bandwidth_scheduler import BandwidthScheduler
+
+
+def _scheduler(monkeypatch, base_port):
+    monkeypatch.setattr(bandwidth_scheduler, "BW_DEFAULT_LIMIT", "4")
+    monkeypatch.setattr(bandwidth_scheduler, "BW_RC_BASE_PORT", base_port)
+    scheduler = BandwidthScheduler("/nonexistent/rclone")
+    scheduler._next_port = base_port
+    return scheduler
+
+
+def _flag(flags, name):
+    return flags[flags.index(name) + 1]
+
+
+def test_register_uses_rc_credentials_and_skips_busy_ports(monkeypatch):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        port = busy.getsockname()[1]
+        scheduler = _scheduler(monkeypatch, port)
+        try:
+            first_id, first = scheduler.register("upload")
+            second_id, second = scheduler.register("upload")
+        finally:
+            scheduler.stop()
+
+    assert "--rc-no-auth" not in first
+    assert _flag(first, "--rc-addr") == f"127.0.0.1:{port + 1}"
+    assert _flag(second, "--rc-addr") == f"127.0.0.1:{port + 2}"
+    assert _flag(first, "--rc-pass") != _flag(second, "--rc-pass")
+    target = scheduler._transfers[first_id]
+    cmd = scheduler._rc_command(target, "core/stats")
+    assert _flag(cmd, "--user") == _flag(first, "--rc-user")
+    assert _flag(cmd, "--pass") == _flag(first, "--rc-pass")
+
+
+def test_settle_feeds_bucket_without_double_counting(monkeypatch):
+    scheduler = _scheduler(monkeypatch, 47000)
+    consumed = []
+    monkeypatch.setattr(scheduler.bucket, "consume", consumed.append)
+    monkeypatch.setattr(scheduler, "_poll_stats", lambda: None)
+    try:
+        transfer_id, _ = scheduler.register("download")
+        scheduler.account(transfer_id, 100)   # Progreso informado por el llamador
+        scheduler.settle(transfer_id, 150)    # core/stats ve más: solo se suma la diferencia
+        scheduler.settle(transfer_id, 120)    # Un total menor no descuenta nada
+        scheduler.unregister(transfer_id, total_bytes=200)
+    finally:
+        scheduler.stop()
+    assert consumed == [100, 50, 50]
+    assert transfer_id not in scheduler._transfers
+
+
+def test_batch_log_bytes_sums_copied_sizes():
+    from cloud_manager import CloudManager
+    output = "\n".join([
+        '{"level":"info","msg":"Copied (new)","object":"DOC/a.7z","size":1024}',
+        '{"level":"info","msg":"Copied (replaced existing)","object":"DOC/b.7z","size":2048}',
+        '{"level":"error","msg":"Failed to copy","object":"DOC/c.7z","size":4096}',
+        'Transferred: 3 KiB / 3 KiB, 100%',
+    ])
+    assert CloudManager._batch_log_bytes(output) == 3072
+
+
+def test_invalid_default_limit_falls_back_to_no_limit(monkeypatch):
+    monkeypatch.setattr(bandwidth_scheduler, "BW_DEFAULT_LIMIT", "4 MB/s")
+    scheduler = BandwidthScheduler("/nonexistent/rclone")
+    assert scheduler.default_limit is None
+    assert scheduler.enabled is False
@@ -0,0 +1,77 @@
+# tests/test_mirror_restore.py
+import hashlib
+
+import pandas as pd
+
+import mirror_restore
+from mirror_restore import MirrorRestorer
+
+
+class FakeSecurity:
+    @staticmethod
+    def file_md5(path):
+        return hashlib.md5(path.read_bytes()).hexdigest()
+
+
+class FakePartial:
+    """Manifiestos en memoria; restore_files escribe el contenido esperado."""
+
+    def __init__(self, manifests, contents):
+        self.security = FakeSecurity()
+        self.manifests = manifests
+        self.contents = contents
+        self.restored = []
+
+    def load_manifest(self, row):
+        return self.manifests.get(row['nombre_encriptado'])
+
+    def restore_files(self, row, paths, dest):
+        for member in paths:
+            local = MirrorRestorer._local_path(dest, member)
+            local.parent.mkdir(parents=True, exist_ok=True)
+            local.write_bytes(self.contents[member])
+        self.restored.append((row['nombre_encriptado'], list(paths)))
+        return True
+
+
+def _entry(path, data):
+    return {'path': path, 'size': len(data), 'md5': hashlib.md5(data).hexdigest()}
+
+
+def test_run_mixes_manifest_and_full_restore(tmp_path, monkeypatch):
+    monkeypatch.setattr(mirror_restore, "DIGEST_CACHE_PATH", tmp_path / "digests.json")
+    contents = {'Unidad/a.txt': b"nuevo", 'Unidad/b.txt': b"igual"}
+    manifests = {'aaa': {'files': [_entry(p, d) for p, d in contents.items()]}}
+    partial = FakePartial(manifests, contents)
+
+    rows = [
+        {'categoria': "Docs", 'nombre_original': "Unidad", 'nombre_encriptado': "aaa"},
+        {'categoria': "Docs", 'nombre_original': "Antigua", 'nombre_encriptado': "bbb"},
+        {'categoria': "Docs", 'nombre_original': "Rota", 'nombre_encriptado': "ccc"},
+    ]
+    output = tmp_path / "out"
+    dest = output / "Docs" / "Unidad"
+    dest.mkdir(parents=True)
+    (dest / "a.txt").write_bytes(b"viejo")
+    (dest / "b.txt").write_bytes(b"igual")
+    (dest / "sobra.txt").write_bytes(b"x")
+
+    received = []
+
+    def full_restore(df):
+        # Igual que AppOrchestrator.restore_rows: necesita un DataFrame
+        assert isinstance(df, pd.DataFrame)
+        received.append(list(df['nombre_encriptado']))
+        records = df.to_dict('records')
+        return {'restored': [{'row': records[0]}], 'failed': [{'row': records[1]}]}
+
+    report = MirrorRestorer(partial, full_restore, output_dir=output).run(rows)
+
+    assert received == [["bbb", "ccc"]]
+    assert partial.restored == [("aaa", ['Unidad/a.txt'])]
+    assert (dest / "a.txt").read_bytes() == b"nuevo"
+    assert not (dest / "sobra.txt").exists()
+    assert report['synced'] == 1 and report['files_same'] == 1
+    assert report['files_restored'] == 1 and report['files_pruned'] == 1
+    assert report['full'] == 1
+    assert [r['nombre_encriptado'] for r in report['failed']] == ["ccc"]
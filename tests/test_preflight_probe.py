@@ -0,0 +1,104 @@
+# tests/test_preflight_probe.py
+import threading
+import time
+from collections import deque
+
+import pytest
+
+import bandwidth_scheduler
+import cloud_manager
+from bandwidth_scheduler import BandwidthScheduler
+from cloud_manager import CloudManager
+from throttle_governor import ThrottleGovernor
+
+
+def _cloud(monkeypatch, limit):
+    monkeypatch.setattr(bandwidth_scheduler, "BW_DEFAULT_LIMIT", limit)
+    cloud = CloudManager.__new__(CloudManager)
+    cloud.rclone_exe = "/nonexistent/rclone"
+    cloud.base_path = "backup"
+    cloud.remote = "remoto"
+    cloud.throughput_history = deque(maxlen=50)
+    cloud._history_lock = threading.Lock()
+    cloud.bandwidth = BandwidthScheduler(cloud.rclone_exe)
+    monkeypatch.setattr(cloud.bandwidth, "_poll_stats", lambda: None)
+    cloud.governor = ThrottleGovernor(scheduler=cloud.bandwidth)
+    monkeypatch.setattr(cloud, "_run_rclone", lambda *a, **k: True)
+    return cloud
+
+
+class FakeStdout:
+    def __init__(self, lines):
+        self._lines = iter(lines)
+
+    def readline(self):
+        return next(self._lines, "")
+
+
+class FakeProcess:
+    def __init__(self, lines, returncode=0):
+        self.stdout = FakeStdout(lines)
+        self.returncode = None
+        self._rc = returncode
+
+    def poll(self):
+        self.returncode = self._rc
+        return self.returncode
+
+    def wait(self, timeout=None):
+        return self.poll()
+
+    def terminate(self):
+        pass
+
+
+def _no_probes(*_args, **_kwargs):
+    raise AssertionError("no debería sondear")
+
+
+def test_cap_below_threshold_skips_probing(monkeypatch):
+    cloud = _cloud(monkeypatch, "4")
+    monkeypatch.setattr(cloud, "_probe_once", _no_probes)
+    assert cloud.preflight_probe() is True
+
+
+def test_recent_fast_uploads_skip_probing(monkeypatch):
+    cloud = _cloud(monkeypatch, "off")
+    monkeypatch.setattr(cloud, "_probe_once", _no_probes)
+    cloud._record_throughput("upload", cloud_manager.SMART_PROBE_MIN_SPEED + 5)
+    assert cloud.preflight_probe() is True
+
+
+def test_stale_or_probe_samples_do_not_skip(monkeypatch):
+    cloud = _cloud(monkeypatch, "off")
+    cloud._record_throughput("probe", 100.0)
+    cloud._record_throughput("upload", 100.0)
+    cloud.throughput_history[-1]['ts'] = time.time() - cloud_manager.SMART_PROBE_FRESH_SECONDS - 1
+    assert cloud.get_recent_throughput(3, source="upload", max_age=cloud_manager.SMART_PROBE_FRESH_SECONDS) == 0.0
+
+
+def test_probe_goes_through_scheduler_and_governor(monkeypatch, tmp_path):
+    cloud = _cloud(monkeypatch, "40")
+    probe = tmp_path / "probe.bin"
+    probe.write_bytes(b"\0" * 1024)
+    launched, throttles = [], []
+    monkeypatch.setattr(cloud.governor, "report_throttle", lambda hint=None: throttles.append(hint))
+
+    def popen(cmd, **kwargs):
+        launched.append(cmd)
+        return FakeProcess([
+            "Transferred:   512 B / 1 KiB, 50%, 1 KiB/s, ETA 1s\n",
+            "NOTICE: probe: HTTP error 429 (Too Many Requests)\n",
+            "Transferred:   1 KiB / 1 KiB, 100%, 1 KiB/s, ETA 0s\n",
+        ])
+
+    monkeypatch.setattr(cloud_manager.subprocess, "Popen", popen)
+    try:
+        result = cloud._probe_once(probe)
+    finally:
+        cloud.bandwidth.stop()
+
+    assert "--bwlimit" in launched[0] and "--rc-user" in launched[0]
+    assert result['ok'] and result['min_speed'] == pytest.approx(cloud_manager.SMART_PROBE_MIN_SPEED)
+    assert throttles == [0.0]
+    assert cloud.bandwidth._transfers == {}
@@ -0,0 +1,50 @@
+# tests/test_reconciler.py
+import time
+
+import pandas as pd
+
+import reconciler
+from reconciler import Reconciler
+
+
+class FakeCloud:
+    """Nube en memoria; list_remote_tree respeta '--max-age' por modtime, como rclone."""
+
+    def __init__(self, objects):
+        self.objects = objects  # path -> modtime (epoch)
+        self.calls = []
+
+    def remote_hash_type(self):
+        return None
+
+    def list_remote_tree(self, remote_dir="", hash_type=None, max_age=None):
+        self.calls.append((remote_dir, max_age))
+        prefix = remote_dir.strip('/')
+        cutoff = time.time() - int(max_age[:-1]) * 60 if max_age else None
+        return [{'path': path, 'size': 10, 'modtime': str(mtime), 'hash': ""}
+                for path, mtime in self.objects.items()
+                if (not prefix or path.startswith(prefix + "/")) and (cutoff is None or mtime >= cutoff)]
+
+
+def _row(name):
+    return {'prefijo': "DOC", 'id_prefix': 1, 'nombre_original': name, 'nombre_encriptado': name,
+            'ruta_relativa': "DOC/", 'volumenes': 0, 'hash_remoto': "size:10"}
+
+
+def test_late_upload_with_old_modtime_is_not_missing(tmp_path, monkeypatch):
+    monkeypatch.setattr(reconciler, "LISTING_CACHE_PATH", tmp_path / "listing.json")
+    monkeypatch.setattr(reconciler, "REPORT_PATH", tmp_path / "report.json")
+    monkeypatch.setattr(reconciler, "RECONCILE_LISTING_TTL", 0)
+    cloud = FakeCloud({"DOC/aaa.7z": time.time()})
+    rec = Reconciler(cloud)
+    assert rec.reconcile(pd.DataFrame([_row("aaa")]))['ok'] == 1
+
+    # Subida terminada después del listado, pero con el ModTime (viejo) del .7z local
+    cloud.objects["DOC/bbb.7z"] = time.time() - 86400
+    rec.listing.taken_at -= 60
+    report = rec.reconcile(pd.DataFrame([_row("aaa"), _row("bbb"), _row("ccc")]))
+
+    assert report['ok'] == 2
+    assert [m['nombre_original'] for m in report['missing']] == ["ccc"]
+    assert ("DOC/", None) in cloud.calls
+    assert "DOC/bbb.7z" in rec.listing.entries
@@ -0,0 +1,45 @@
+# tests/test_resume_job.py
+import os
+
+from main import AppOrchestrator
+
+
+class FakeJobs:
+    def __init__(self):
+        self.resets = []
+
+    def reset(self, job_id):
+        self.resets.append(job_id)
+
+
+def _app():
+    app = AppOrchestrator.__new__(AppOrchestrator)
+    app.jobs = FakeJobs()
+    app.print_info = lambda msg: None
+    return app
+
+
+def test_same_size_edit_invalidates_hashed_job(tmp_path):
+    unit = tmp_path / "Unidad"
+    (unit / "sub").mkdir(parents=True)
+    data = unit / "sub" / "a.txt"
+    data.write_bytes(b"version 1")
+    app = _app()
+    signature = app._folder_signature(unit)
+    job = {'id': 7, 'stage': 'hashed',
+           'payload': {'size_mb': 1.0, 'signature': signature, 'file_entries': [], 'md5': "x"}}
+    assert app._resume_job(job, 1.0, app._folder_signature(unit)) is job['payload']
+
+    # Mismo tamaño, contenido distinto
+    data.write_bytes(b"version 2")
+    st = data.stat()
+    os.utime(data, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert app._resume_job(job, 1.0, app._folder_signature(unit)) is None
+    assert app.jobs.resets == [7]
+
+
+def test_job_without_signature_is_redone(tmp_path):
+    app = _app()
+    job = {'id': 3, 'stage': 'hashed', 'payload': {'size_mb': 1.0, 'file_entries': [], 'md5': "x"}}
+    assert app._resume_job(job, 1.0, app._folder_signature(tmp_path)) is None
+    assert app.jobs.resets == [3]
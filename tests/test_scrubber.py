@@ -0,0 +1,21 @@
+# tests/test_scrubber.py
+from scrubber import Scrubber
+
+
+def _row(fingerprint, volumes=2):
+    return {'nombre_encriptado': "abc", 'volumenes': volumes, 'hash_remoto': fingerprint}
+
+
+def test_check_row_empty_remote_hash_is_unverified():
+    listing = {"abc.7z.001": {'size': 10, 'hash': "aa"}, "abc.7z.002": {'size': 10, 'hash': ""}}
+    assert Scrubber.check_row(_row("md5:aa;bb"), listing, "md5") == 'unverified'
+
+
+def test_check_row_mismatch_wins_over_missing_hash():
+    listing = {"abc.7z.001": {'size': 10, 'hash': ""}, "abc.7z.002": {'size': 10, 'hash': "cc"}}
+    assert Scrubber.check_row(_row("md5:aa;bb"), listing, "md5") == 'mismatch'
+
+
+def test_check_row_matching_hashes_are_ok():
+    listing = {"abc.7z.001": {'size': 10, 'hash': "aa"}, "abc.7z.002": {'size': 10, 'hash': "bb"}}
+    assert Scrubber.check_row(_row("md5:AA;BB"), listing, "md5") == 'ok'
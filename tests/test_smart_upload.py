@@ -0,0 +1,53 @@
+# tests/test_smart_upload.py
+from datetime import datetime
+
+import bandwidth_scheduler
+from bandwidth_scheduler import BandwidthScheduler
+from cloud_manager import CloudManager
+
+
+class OfficeHours(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 1, 5, 10, 0)
+
+
+def _capped_scheduler(monkeypatch):
+    # Ejemplo del README: 4 MB/s en horario de oficina
+    monkeypatch.setattr(bandwidth_scheduler, "BW_SCHEDULE", "08:00-19:00=4;19:00-08:00=off")
+    monkeypatch.setattr(bandwidth_scheduler, "datetime", OfficeHours)
+    scheduler = BandwidthScheduler("/nonexistent/rclone")
+    monkeypatch.setattr(scheduler, "_poll_stats", lambda: None)
+    return scheduler
+
+
+def test_capped_window_does_not_trip_speed_gates(monkeypatch):
+    scheduler = _capped_scheduler(monkeypatch)
+    try:
+        transfer_id, flags = scheduler.register("upload")
+        cap = scheduler.transfer_limit_mb(transfer_id)
+        assert cap == 4
+        # rclone corre al tope de la ventana: ningún corte (T10/T20/T30 ni stall)
+        for elapsed in (11, 21, 31, 200):
+            assert CloudManager._speed_verdict(elapsed, 3.9, 3.9, cap) is None
+        # Muy por debajo de la cuota sigue siendo una mala ruta
+        assert CloudManager._speed_verdict(11, 1.0, 1.0, cap)[1] is False
+        assert CloudManager._speed_verdict(31, 1.0, 1.0, cap)[1] is True
+    finally:
+        scheduler.stop()
+
+
+def test_parallel_volumes_split_the_cap(monkeypatch):
+    scheduler = _capped_scheduler(monkeypatch)
+    try:
+        ids = [scheduler.register("upload")[0] for _ in range(3)]
+        cap = scheduler.transfer_limit_mb(ids[0])
+        assert abs(cap - 4 / 3) < 0.01
+        assert CloudManager._speed_verdict(11, 1.3, 1.3, cap) is None
+    finally:
+        scheduler.stop()
+
+
+def test_uncapped_gates_use_configured_thresholds():
+    assert CloudManager._speed_verdict(11, 3.9, 3.9, None) is not None
+    assert CloudManager._speed_verdict(11, 9.0, 9.0, None) is None
@@ -0,0 +1,39 @@
+# tests/test_throttle_governor.py
+import pytest
+
+from throttle_governor import ThrottleGovernor
+
+
+@pytest.mark.parametrize("line", [
+    "Transferred:   429.125 MiB / 2.991 GiB, 14%, 18.182 MiB/s, ETA 2m21s",
+    "Transferred:   1.503 GiB / 2.991 GiB, 50%, 18.182 MiB/s, ETA 1m22s",
+    " *   VID/abc.7z.001: 42% /1.503Gi, 20.1Mi/s, 45s",
+    "INFO  : DOC/abc.7z: Copied (new) 503 bytes",
+    "ERROR : DOC/factura_429.pdf: Failed to copy: file already closed",
+])
+def test_detect_ignores_sizes_and_counts(line):
+    assert ThrottleGovernor().detect(line) is None
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("Failed to copy: HTTP error 429 (429 Too Many Requests)", 0.0),
+    ("googleapi: Error 429: Rate Limit Exceeded", 0.0),
+    ("upload failed: status code: 503, Retry-After: 30", 30.0),
+    ("NOTICE: DOC/abc.7z: 503 returned, trying again in 2 seconds", 2.0),
+    ("ERROR : DOC/abc.7z: Failed to copy: userRateLimitExceeded", 0.0),
+])
+def test_detect_status_codes_in_error_context(line, expected):
+    assert ThrottleGovernor().detect(line) == expected
+
+
+@pytest.mark.parametrize("output", [
+    "ERROR : DOC/abc.7z: Failed to copy: dial tcp: lookup graph.microsoft.com: no such host",
+    "ERROR : DOC/abc.7z: Failed to copy: read tcp 10.0.0.2:51234: connection reset by peer",
+])
+def test_detect_ignores_generic_temporary_errors(output):
+    # rclone sale con código 5 en ambos casos: no es throttling del proveedor
+    assert ThrottleGovernor().detect(output) is None
+
+
+def test_detect_bare_retry_after():
+    assert ThrottleGovernor().detect("NOTICE: pacer: Retry-After: 12s") == 12.0
@@ -0,0 +1,122 @@
+# throttle_governor.py
+import re
+import random
+import threading
+import time
+from typing import Optional
+
+from config import logger, GOV_BASE_DELAY, GOV_MAX_DELAY
+
+# Señales de limitación del proveedor en la salida de rclone
+THROTTLE_PATTERN = re.compile(
+    r'(too many requests|service unavailable|throttl|rate ?limit|'
+    r'activitylimitreached|userratelimitexceeded|slow ?down)',
+    re.IGNORECASE
+)
+# CORRECCIÓN: 429/503 solo cuentan como código HTTP ("HTTP error 429", "status code: 503",
+# "Error 429: ...", "429 Too Many Requests"); un número suelto puede ser un tamaño o un conteo
+STATUS_PATTERN = re.compile(
+    r'(?:http|status|code|error)[^\d\n]{0,12}(?<![\w.])(?:429|503)(?![\w.])|'
+    r'(?<![\w.])(?:429|503)\s+(?:too many requests|service unavailable)',
+    re.IGNORECASE
+)
+# ... o dentro de una línea de log ERROR/NOTICE de rclone (niveles en mayúsculas)
+LOG_LEVEL_PATTERN = re.compile(r'\b(?:ERROR|NOTICE)\b')
+BARE_STATUS_PATTERN = re.compile(r'(?<![\w./-])(?:429|503)(?![\w./-])')
+# Líneas de progreso/estadísticas: "Transferred: 429.125 MiB / 2.991 GiB, ..., ETA 5s"
+PROGRESS_LINE_PATTERN = re.compile(r'^\s*(?:Transferred:|Transferring:|Checks:|Elapsed time:|\*\s)|\bETA\b')
+# "Retry-After: 30" / "retry after 30s" / "Trying again in 30 seconds"
+RETRY_AFTER_PATTERN = re.compile(
+    r'(?:retry[- ]after|trying again in)\D{0,3}(\d+(?:\.\d+)?)\s*(ms|s|sec|seconds?)?',
+    re.IGNORECASE
+)
+
+
+class ThrottleGovernor:
+    """
+    GOBERNADOR CENTRAL DE THROTTLING
+    Un único estado de pausa compartido por todos los procesos rclone:
+    - Detecta 429/503/Retry-After en la salida de rclone. El código de salida 5 ("error temporal")
+      por sí solo no cuenta: también lo producen un fallo de DNS o una conexión reiniciada.
+    - Aplica backoff exponencial con jitter (un escalón por episodio, no por worker).
+    - Respeta Retry-After cuando el proveedor lo informa.
+    - Avisa al planificador de ancho de banda para que no lance transferencias durante la pausa.
+    """
+
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler
+        self._lock = threading.Lock()
+        self._pause_until = 0.0
+        self._level = 0
+
+    # --- DETECCIÓN ---
+
+    def detect(self, text: str) -> Optional[float]:
+        """
+        Analiza la salida de rclone.
+        Retorna None si no hay throttling, o los segundos de Retry-After (0.0 si no se informó).
+        """
+        if text and self._is_throttle(text):
+            match = RETRY_AFTER_PATTERN.search(text)
+            if match:
+                value = float(match.group(1))
+                unit = (match.group(2) or "s").lower()
+                return value / 1000 if unit == "ms" else value
+            return 0.0
+        return None
+
+    @staticmethod
+    def _is_throttle(text: str) -> bool:
+        """Busca señales de throttling línea por línea, ignorando las de progreso."""
+        for line in text.splitlines():
+            if PROGRESS_LINE_PATTERN.search(line):
+                continue
+            if THROTTLE_PATTERN.search(line) or STATUS_PATTERN.search(line) or RETRY_AFTER_PATTERN.search(line):
+                return True
+            if LOG_LEVEL_PATTERN.search(line) and BARE_STATUS_PATTERN.search(line):
+                return True
+        return False
+
+    # --- ESTADO COMPARTIDO ---
+
+    def report_throttle(self, retry_after: Optional[float] = None) -> float:
+        """
+        Registra un episodio de throttling y devuelve la pausa vigente (segundos).
+        Reportes simultáneos de varios workers dentro de la misma pausa no escalan el nivel.
+        """
+        with self._lock:
+            now = time.time()
+            if now >= self._pause_until:
+                self._level += 1
+                ceiling = min(GOV_MAX_DELAY, GOV_BASE_DELAY * (2 ** (self._level - 1)))
+                delay = random.uniform(ceiling / 2, ceiling)  # Equal jitter: desincroniza workers
+            else:
+                delay = self._pause_until - now
+            if retry_after:
+                delay = max(delay, min(retry_after, GOV_MAX_DELAY))
+            self._pause_until = max(self._pause_until, now + delay)
+            pause_until = self._pause_until
+            level = self._level
+
+        logger.warning(f"🚦 Throttling del proveedor (nivel {level}). Pausa global de {pause_until - time.time():.1f}s.")
+        if self.scheduler:
+            self.scheduler.hold(pause_until)
+        return pause_until - time.time()
+
+    def report_success(self):
+        """Una transferencia terminó bien: el nivel de backoff se relaja un escalón."""
+        with self._lock:
+            if self._level > 0:
+                self._level -= 1
+
+    def remaining(self) -> float:
+        with self._lock:
+            return max(0.0, self._pause_until - time.time())
+
+    def wait(self):
+        """Bloquea mientras haya una pausa global vigente (puede extenderse mientras esperamos)."""
+        while True:
+            pending = self.remaining()
+            if pending <= 0:
+                return
+            time.sleep(min(pending, 1.0))